@@ -0,0 +1,33 @@
+"""cache outbox
+
+Revision ID: 3c9a51d2e7b4
+Revises: 6f723ad59539
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '3c9a51d2e7b4'
+down_revision = '6f723ad59539'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('cache_outbox',
+    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('key', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # events are dispatched in order of creation
+    op.create_index('ix_cache_outbox_created_at', 'cache_outbox', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_cache_outbox_created_at', table_name='cache_outbox')
+    op.drop_table('cache_outbox')
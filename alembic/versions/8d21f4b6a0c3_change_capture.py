@@ -0,0 +1,94 @@
+"""change capture
+
+Revision ID: 8d21f4b6a0c3
+Revises: 3c9a51d2e7b4
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '8d21f4b6a0c3'
+down_revision = '3c9a51d2e7b4'
+branch_labels = None
+depends_on = None
+
+TABLES = ('menus', 'submenus', 'dishes', 'dishes_discount')
+
+# Changes are notified on commit as {"e": entity, "o": operation, "m": menu_id, "s": submenu_id, "d": dish_id,
+# "x": txid}, the ID of the transaction makes every notification unique, so a single listener applies it.
+# A discount changes the price of its dish, so it is notified as an update of the dish.
+# Parents of rows deleted by cascade are not found, their changes are covered by the change of the parent.
+CREATE_FUNCTION = """
+CREATE OR REPLACE FUNCTION notify_menu_change() RETURNS trigger AS $$
+DECLARE
+    rec record;
+    v_entity text := 'dish';
+    v_operation text := lower(TG_OP);
+    v_menu_id uuid;
+    v_submenu_id uuid;
+    v_dish_id uuid;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        rec := OLD;
+    ELSE
+        rec := NEW;
+    END IF;
+    IF TG_OP = 'UPDATE' AND NEW IS NOT DISTINCT FROM OLD THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'INSERT' THEN
+        v_operation := 'create';
+    END IF;
+
+    IF TG_TABLE_NAME = 'menus' THEN
+        v_entity := 'menu';
+        v_menu_id := rec.id;
+    ELSIF TG_TABLE_NAME = 'submenus' THEN
+        v_entity := 'submenu';
+        v_menu_id := rec.menu_id;
+        v_submenu_id := rec.id;
+    ELSE
+        IF TG_TABLE_NAME = 'dishes_discount' THEN
+            v_operation := 'update';
+            v_dish_id := rec.dish_id;
+            SELECT d.submenu_id INTO v_submenu_id FROM dishes d WHERE d.id = v_dish_id;
+        ELSE
+            v_dish_id := rec.id;
+            v_submenu_id := rec.submenu_id;
+        END IF;
+        SELECT s.menu_id INTO v_menu_id FROM submenus s WHERE s.id = v_submenu_id;
+    END IF;
+
+    PERFORM pg_notify(
+        'menu_changes',
+        json_build_object(
+            'e', v_entity, 'o', v_operation, 'm', v_menu_id, 's', v_submenu_id, 'd', v_dish_id, 'x', txid_current()
+        )::text
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+CREATE_TRIGGER = """
+CREATE TRIGGER {table}_notify_change
+AFTER INSERT OR UPDATE OR DELETE ON {table}
+FOR EACH ROW EXECUTE FUNCTION notify_menu_change()
+"""
+
+DROP_TRIGGER = 'DROP TRIGGER IF EXISTS {table}_notify_change ON {table}'
+
+DROP_FUNCTION = 'DROP FUNCTION IF EXISTS notify_menu_change()'
+
+
+def upgrade() -> None:
+    op.execute(CREATE_FUNCTION)
+    for table in TABLES:
+        op.execute(CREATE_TRIGGER.format(table=table))
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.execute(DROP_TRIGGER.format(table=table))
+    op.execute(DROP_FUNCTION)
@@ -0,0 +1,167 @@
+"""counters
+
+Revision ID: b5e07c19d2a8
+Revises: 8d21f4b6a0c3
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'b5e07c19d2a8'
+down_revision = '8d21f4b6a0c3'
+branch_labels = None
+depends_on = None
+
+# Counts of submenus and dishes are kept in rows of menus and submenus by triggers.
+CREATE_FUNCTIONS = (
+    """
+CREATE OR REPLACE FUNCTION count_submenu_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE menus SET submenus_count = submenus_count - 1, dishes_count = dishes_count - OLD.dishes_count
+        WHERE id = OLD.menu_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE menus SET submenus_count = submenus_count + 1, dishes_count = dishes_count + NEW.dishes_count
+        WHERE id = NEW.menu_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""",
+    """
+CREATE OR REPLACE FUNCTION count_dish_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        WITH submenu AS (
+            UPDATE submenus SET dishes_count = dishes_count - 1 WHERE id = OLD.submenu_id RETURNING menu_id
+        )
+        UPDATE menus SET dishes_count = dishes_count - 1 FROM submenu WHERE menus.id = submenu.menu_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        WITH submenu AS (
+            UPDATE submenus SET dishes_count = dishes_count + 1 WHERE id = NEW.submenu_id RETURNING menu_id
+        )
+        UPDATE menus SET dishes_count = dishes_count + 1 FROM submenu WHERE menus.id = submenu.menu_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""",
+)
+
+CREATE_TRIGGERS = (
+    """
+CREATE TRIGGER submenus_count_change
+AFTER INSERT OR DELETE OR UPDATE OF menu_id ON submenus
+FOR EACH ROW EXECUTE FUNCTION count_submenu_change()
+""",
+    """
+CREATE TRIGGER dishes_count_change
+AFTER INSERT OR DELETE OR UPDATE OF submenu_id ON dishes
+FOR EACH ROW EXECUTE FUNCTION count_dish_change()
+""",
+)
+
+# tables are locked, so rows changed during the backfill are not counted twice or missed
+BACKFILL = (
+    'LOCK TABLE menus, submenus, dishes IN SHARE ROW EXCLUSIVE MODE',
+    """
+UPDATE submenus SET dishes_count = counts.dishes_count
+FROM (SELECT submenu_id, count(*) AS dishes_count FROM dishes GROUP BY submenu_id) AS counts
+WHERE submenus.id = counts.submenu_id
+""",
+    """
+UPDATE menus SET submenus_count = counts.submenus_count, dishes_count = counts.dishes_count
+FROM (
+    SELECT menu_id, count(*) AS submenus_count, sum(dishes_count) AS dishes_count FROM submenus GROUP BY menu_id
+) AS counts
+WHERE menus.id = counts.menu_id
+""",
+)
+
+# The change capture function of the previous revision with updates of counters only skipped,
+# otherwise every dish would notify changes of its submenu and menu too.
+# It is compatible with tables without counters, so it is kept on downgrade.
+NOTIFY_FUNCTION = """
+CREATE OR REPLACE FUNCTION notify_menu_change() RETURNS trigger AS $$
+DECLARE
+    rec record;
+    v_entity text := 'dish';
+    v_operation text := lower(TG_OP);
+    v_menu_id uuid;
+    v_submenu_id uuid;
+    v_dish_id uuid;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        rec := OLD;
+    ELSE
+        rec := NEW;
+    END IF;
+    IF TG_OP = 'UPDATE'
+        AND to_jsonb(NEW) - 'submenus_count' - 'dishes_count' = to_jsonb(OLD) - 'submenus_count' - 'dishes_count'
+    THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'INSERT' THEN
+        v_operation := 'create';
+    END IF;
+
+    IF TG_TABLE_NAME = 'menus' THEN
+        v_entity := 'menu';
+        v_menu_id := rec.id;
+    ELSIF TG_TABLE_NAME = 'submenus' THEN
+        v_entity := 'submenu';
+        v_menu_id := rec.menu_id;
+        v_submenu_id := rec.id;
+    ELSE
+        IF TG_TABLE_NAME = 'dishes_discount' THEN
+            v_operation := 'update';
+            v_dish_id := rec.dish_id;
+            SELECT d.submenu_id INTO v_submenu_id FROM dishes d WHERE d.id = v_dish_id;
+        ELSE
+            v_dish_id := rec.id;
+            v_submenu_id := rec.submenu_id;
+        END IF;
+        SELECT s.menu_id INTO v_menu_id FROM submenus s WHERE s.id = v_submenu_id;
+    END IF;
+
+    PERFORM pg_notify(
+        'menu_changes',
+        json_build_object(
+            'e', v_entity, 'o', v_operation, 'm', v_menu_id, 's', v_submenu_id, 'd', v_dish_id, 'x', txid_current()
+        )::text
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+DROP_TRIGGERS = (
+    'DROP TRIGGER IF EXISTS submenus_count_change ON submenus',
+    'DROP TRIGGER IF EXISTS dishes_count_change ON dishes',
+)
+
+DROP_FUNCTIONS = (
+    'DROP FUNCTION IF EXISTS count_submenu_change()',
+    'DROP FUNCTION IF EXISTS count_dish_change()',
+)
+
+
+def upgrade() -> None:
+    op.add_column('menus', sa.Column('submenus_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('menus', sa.Column('dishes_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('submenus', sa.Column('dishes_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute(NOTIFY_FUNCTION)
+    for statement in (*CREATE_FUNCTIONS, *BACKFILL, *CREATE_TRIGGERS):
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    for statement in (*DROP_TRIGGERS, *DROP_FUNCTIONS):
+        op.execute(statement)
+    op.drop_column('submenus', 'dishes_count')
+    op.drop_column('menus', 'dishes_count')
+    op.drop_column('menus', 'submenus_count')
@@ -0,0 +1,46 @@
+"""indexes
+
+Revision ID: e2a4c6f81b3d
+Revises: b5e07c19d2a8
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'e2a4c6f81b3d'
+down_revision = 'b5e07c19d2a8'
+branch_labels = None
+depends_on = None
+
+# indexes of IDs duplicate indexes of primary keys
+ID_INDEXES = (
+    ('ix_menus_id', 'menus'),
+    ('ix_submenus_id', 'submenus'),
+    ('ix_dishes_id', 'dishes'),
+    ('ix_dishes_discount_id', 'dishes_discount'),
+)
+
+# children of a parent are listed by pages ordered by IDs, the prefix of the parent serves cascade deletes too;
+# discounts are looked up by the unique constraint of dish_id
+INDEXES = (
+    ('ix_submenus_menu_id_id', 'submenus', ['menu_id', 'id']),
+    ('ix_dishes_submenu_id_id', 'dishes', ['submenu_id', 'id']),
+)
+
+
+def upgrade() -> None:
+    # indexes are built without locking writes, it is not possible in a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+        for name, table in ID_INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table in ID_INDEXES:
+            op.create_index(name, table, ['id'], unique=False, postgresql_concurrently=True)
+        for name, table, _ in INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
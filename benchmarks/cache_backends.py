@@ -0,0 +1,77 @@
+"""Benchmark of cache backends.
+
+Compares latency of hits and misses of the cached dish detail for the memory
+backend, redis, the in-process tier and the shared memory tier in front of redis.
+
+Run with the configured redis:
+
+    python -m benchmarks.cache_backends
+"""
+import asyncio
+import statistics
+import tempfile
+import time
+import uuid
+
+from benchmarks.cache_serialization import make_dishes
+from core import schemas
+from core.services.base import BaseCacheService
+from core.services.local_cache import LocalCacheService
+from core.services.memory import MemoryCacheService
+from core.services.redis import redis_service
+from core.services.shared_memory import SharedMemoryCacheService
+from core.settings import settings
+
+REPEATS: int = 10_000
+PREFIX: str = 'bench_'
+
+
+async def measure(cache: BaseCacheService, key: str) -> float:
+    """Median latency of getting by key in microseconds"""
+    timings: list[float] = []
+    for _ in range(REPEATS):
+        start: float = time.perf_counter()
+        await cache.get(key)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1_000_000
+
+
+async def main() -> None:
+    segment_file = tempfile.NamedTemporaryFile(prefix=PREFIX)
+    backends: dict[str, BaseCacheService] = {
+        'memory': MemoryCacheService(max_size=settings.CACHE_MEMORY_MAX_SIZE),
+        'redis': redis_service,
+        'local + redis': LocalCacheService(
+            backend=redis_service,
+            max_size=settings.CACHE_LOCAL_MAX_SIZE,
+            lifetime=settings.CACHE_LOCAL_LIFETIME,
+            channel=f'{PREFIX}{settings.CACHE_INVALIDATION_CHANNEL}',
+        ),
+        'shared + redis': SharedMemoryCacheService(
+            backend=redis_service,
+            path=segment_file.name,
+            sets=settings.CACHE_SHARED_SETS,
+            slot_size=settings.CACHE_SHARED_SLOT_SIZE,
+            lifetime=settings.CACHE_SHARED_LIFETIME,
+            channel=f'{PREFIX}{settings.CACHE_INVALIDATION_CHANNEL}',
+        ),
+    }
+    dish: schemas.ResponseDishSchema = make_dishes(1)[0]
+    key: str = f'{PREFIX}dish_{uuid.uuid4()}'
+
+    print(f'{"backend":<14} | {"hit, us":>8} | {"miss, us":>8}')
+    try:
+        for name, cache in backends.items():
+            await cache.startup()
+            await cache.set(key, dish)
+            hit_us: float = await measure(cache, key)
+            miss_us: float = await measure(cache, f'{key}_missing')
+            print(f'{name:<14} | {hit_us:>8.1f} | {miss_us:>8.1f}')
+            await cache.shutdown()
+    finally:
+        await redis_service.delete(key)
+        segment_file.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""Benchmark of cache invalidation latency against keyspace size.
+
+Compares invalidation of a menu's subtree by KEYS patterns with invalidation by
+the generation counter of the menu's namespace.
+
+Run with the configured redis:
+
+    python -m benchmarks.cache_invalidation
+"""
+import asyncio
+import statistics
+import time
+import uuid
+
+from core import constants
+from core.services.redis import redis_service
+
+KEYSPACE_SIZES: tuple[int, ...] = (1_000, 10_000, 100_000, 500_000)
+SUBTREE_SIZE: int = 100
+REPEATS: int = 20
+PREFIX: str = 'bench_'
+
+
+async def fill_keyspace(size: int) -> None:
+    """Fill redis with keys of dishes from other menus."""
+    async with redis_service.client.pipeline(transaction=False) as pipe:
+        for i in range(size):
+            pipe.set(f'{PREFIX}dish_{uuid.uuid4()}_{i}', b'x', ex=600)
+            if i % 10_000 == 0:
+                await pipe.execute()
+        await pipe.execute()
+
+
+async def fill_subtree(menu_id: uuid.UUID, generation: int = 0) -> None:
+    """Fill redis with keys of the menu's dishes."""
+    async with redis_service.client.pipeline(transaction=False) as pipe:
+        for i in range(SUBTREE_SIZE):
+            pipe.set(f'{PREFIX}dish_{menu_id}.{generation}_{i}', b'x', ex=600)
+        await pipe.execute()
+
+
+async def invalidate_by_patterns(menu_id: uuid.UUID) -> None:
+    """Previous scheme: KEYS by pattern and delete found keys one by one."""
+    keys: list[bytes] = await redis_service.client.keys(f'{PREFIX}dish_{menu_id}.*')
+    for key in keys:
+        await redis_service.client.delete(key)
+
+
+async def invalidate_by_namespace(menu_id: uuid.UUID) -> None:
+    """Current scheme: increment the generation of the menu's namespace."""
+    await redis_service.invalidate(PREFIX + redis_service.namespace_key(constants.MENU, menu_id))
+
+
+async def measure(size: int) -> tuple[float, float]:
+    patterns_timings: list[float] = []
+    namespace_timings: list[float] = []
+    for _ in range(REPEATS):
+        menu_id: uuid.UUID = uuid.uuid4()
+
+        await fill_subtree(menu_id)
+        start: float = time.perf_counter()
+        await invalidate_by_patterns(menu_id)
+        patterns_timings.append(time.perf_counter() - start)
+
+        await fill_subtree(menu_id)
+        start = time.perf_counter()
+        await invalidate_by_namespace(menu_id)
+        namespace_timings.append(time.perf_counter() - start)
+
+    return statistics.median(patterns_timings) * 1000, statistics.median(namespace_timings) * 1000
+
+
+async def clear() -> None:
+    async for key in redis_service.client.scan_iter(match=f'{PREFIX}*', count=10_000):
+        await redis_service.client.delete(key)
+
+
+async def main() -> None:
+    print(f'{"keyspace":>10} | {"KEYS, ms":>10} | {"INCR, ms":>10}')
+    filled: int = 0
+    try:
+        for size in KEYSPACE_SIZES:
+            await fill_keyspace(size - filled)
+            filled = size
+            patterns_ms, namespace_ms = await measure(size)
+            print(f'{size:>10} | {patterns_ms:>10.3f} | {namespace_ms:>10.3f}')
+    finally:
+        await clear()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
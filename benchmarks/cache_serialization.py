@@ -0,0 +1,59 @@
+"""Benchmark of serializers of cached values.
+
+Compares bytes per entry and dump/load time of lists of dishes for the previous
+pickle format and the serializers of the cache.
+
+    python -m benchmarks.cache_serialization
+"""
+import pickle
+import timeit
+import uuid
+from decimal import Decimal
+from typing import Any, Callable
+
+from core import schemas
+from core.services import serializers
+
+SIZES: tuple[int, ...] = (10, 100, 1_000)
+
+
+def make_dishes(count: int) -> list[schemas.ResponseDishSchema]:
+    submenu_id: uuid.UUID = uuid.uuid4()
+    return [
+        schemas.ResponseDishSchema(
+            id=uuid.uuid4(),
+            submenu_id=submenu_id,
+            title=f'Dish {i}',
+            description=f'Description of dish {i}',
+            price=Decimal('12.34'),
+        )
+        for i in range(count)
+    ]
+
+
+def timing_us(func: Callable[[], Any], number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1_000_000
+
+
+def main() -> None:
+    formats: dict[str, tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+        'pickle (previous)': (pickle.dumps, pickle.loads),
+        **{
+            name: (serializer.dumps, serializers.loads)
+            for name, serializer in serializers.serializers.items()
+        },
+    }
+    print(f'{"dishes":>6} | {"format":<18} | {"bytes/entry":>11} | {"dump, us":>10} | {"load, us":>10}')
+    for size in SIZES:
+        dishes: list[schemas.ResponseDishSchema] = make_dishes(size)
+        number: int = max(10, 10_000 // size)
+        for name, (dumps, loads) in formats.items():
+            data: bytes = dumps(dishes)
+            assert loads(data) == dishes
+            dump_us: float = timing_us(lambda: dumps(dishes), number)
+            load_us: float = timing_us(lambda: loads(data), number)
+            print(f'{size:>6} | {name:<18} | {len(data) / size:>11.1f} | {dump_us:>10.1f} | {load_us:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Benchmark of cache hits of list endpoints.
+
+Compares time of building the response of the list of dishes from the cached value
+through `response_model` of the endpoint and from the cached JSON body of the response.
+
+    python -m benchmarks.response_bytes
+"""
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+
+from benchmarks.cache_serialization import SIZES, make_dishes
+from core import schemas
+from core.main import app
+from core.services import serializers
+from core.services.base import response_adapter
+from core.settings import settings
+
+
+def get_route(name: str) -> APIRoute:
+    return next(route for route in app.routes if isinstance(route, APIRoute) and route.name == name)
+
+
+async def timing_us(func: Callable[[], Awaitable[Any]], number: int) -> float:
+    best: float = float('inf')
+    for _ in range(5):
+        start: float = time.perf_counter()
+        for _ in range(number):
+            await func()
+        best = min(best, time.perf_counter() - start)
+    return best / number * 1_000_000
+
+
+async def main() -> None:
+    route: APIRoute = get_route('get_dish_list')
+    serializer: serializers.BaseSerializer = serializers.serializers[settings.CACHE_SERIALIZER]
+
+    print(f'{"dishes":>6} | {"response_model, us":>18} | {"cached body, us":>15} | {"speedup":>7}')
+    for size in SIZES:
+        dishes: list[schemas.ResponseDishSchema] = make_dishes(size)
+        value: bytes = serializer.dumps(dishes)
+        body: bytes = serializers.raw_serializer.dumps(response_adapter(route.response_model).dump_json(dishes))
+
+        async def validated() -> bytes:
+            content: Any = await serialize_response(
+                field=route.response_field, response_content=serializers.loads(value), is_coroutine=True
+            )
+            return JSONResponse(content=content).body
+
+        async def cached() -> bytes:
+            return Response(content=serializers.loads(body), media_type='application/json').body
+
+        assert json.loads(await validated()) == json.loads(await cached())
+
+        number: int = max(10, 10_000 // size)
+        validated_us: float = await timing_us(validated, number)
+        cached_us: float = await timing_us(cached, number)
+        print(f'{size:>6} | {validated_us:>18.1f} | {cached_us:>15.1f} | {validated_us / cached_us:>6.1f}x')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -10,6 +10,12 @@ DISH: str = 'dish'
 
 ENTITIES = (MENU, SUBMENU, DISH)
 
+# a list of entities
+LIST: str = 'list'
+
+# the tree of menus with submenus and dishes
+ALL_IN_ONE: str = 'all_in_one'
+
 # mapping
 mapping_menu = ('id', 'title', 'description')
 mapping_submenu = ('id', 'title', 'description')
@@ -38,3 +44,19 @@ entity_parents = {
 # ordering operations for sync xls
 order_operation = (DELETE, UPDATE, CREATE)
 order_entity = (MENU, SUBMENU, DISH)
+
+# channel of changes notified by triggers in database, see the change_capture migration
+CHANGE_CAPTURE_CHANNEL: str = 'menu_changes'
+
+# prefix of keys for generation counters of cache namespaces
+CACHE_NAMESPACE_PREFIX: str = 'gen_'
+
+# namespace bumped by write-through writes, loaded values are fenced by its generation
+CACHE_WRITES_NAMESPACE: str = 'writes'
+
+# suffix of keys for rendered responses of cached values
+CACHE_RESPONSE_SUFFIX: str = '_json'
+
+# ETags are hex digests of bodies of responses
+ETAG_DIGEST_SIZE: int = 16
+ETAG_LENGTH: int = ETAG_DIGEST_SIZE * 2
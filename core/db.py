@@ -1,21 +1,90 @@
 import contextlib
 from typing import AsyncGenerator
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from core.settings import settings
 
-async_engine = create_async_engine(settings.SQLALCHEMY_DATABASE_URL, future=True)
+
+class MonitoredQueuePool(AsyncAdaptedQueuePool):
+    """Pool of connections which counts requests waiting for a connection and timed out requests"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waiting: int = 0
+        self.timeouts: int = 0
+
+    def _do_get(self):
+        self.waiting += 1
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.waiting -= 1
+
+    def recreate(self) -> 'MonitoredQueuePool':
+        pool: MonitoredQueuePool = super().recreate()
+        pool.timeouts = self.timeouts
+        return pool
+
+
+def create_engine() -> AsyncEngine:
+    """Create the engine with the pool of connections configured by settings.
+
+    Prepared statements are cached per connection by asyncpg, pre-ping drops connections closed by the server.
+    """
+    return create_async_engine(
+        settings.SQLALCHEMY_DATABASE_URL,
+        future=True,
+        poolclass=MonitoredQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_POOL_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args={
+            'prepared_statement_cache_size': settings.DB_STATEMENT_CACHE_SIZE,
+            'timeout': settings.DB_CONNECT_TIMEOUT,
+            'command_timeout': settings.DB_COMMAND_TIMEOUT,
+        },
+    )
+
+
+async_engine: AsyncEngine = create_engine()
+
+async_session_factory: sessionmaker = sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
 
 
 @contextlib.asynccontextmanager
 async def session_generator() -> AsyncGenerator[AsyncSession, None]:
-    async_session = sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
-    async with async_session() as session:
+    async with async_session_factory() as session:
         yield session
 
 
 async def get_session() -> AsyncSession:
     async with session_generator() as session:
         yield session
+
+
+def get_pool_stats() -> dict[str, int]:
+    """Get live statistics of the pool of connections"""
+    pool: MonitoredQueuePool = async_engine.pool  # type: ignore[assignment]
+    return {
+        'size': pool.size(),
+        'max_overflow': settings.DB_POOL_MAX_OVERFLOW,
+        'checked_in': pool.checkedin(),
+        'checked_out': pool.checkedout(),
+        'overflow': max(pool.overflow(), 0),
+        'waiting': pool.waiting,
+        'timeouts': pool.timeouts,
+    }
+
+
+async def shutdown() -> None:
+    """Close connections of the pool"""
+    await async_engine.dispose()
@@ -1,7 +1,7 @@
 from uuid import UUID
 
 from celery.result import AsyncResult
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core import schemas, services
@@ -50,8 +50,16 @@ async def task_status(task_id: UUID) -> dict[str, str]:
     status_code=200,
     response_model=list[schemas.ResponseMenuWitSubmenusSchema],
     name='get_all_in_one',
+    responses={304: {'description': 'Not Modified'}},
 )
-async def get_all_in_one(db: AsyncSession = Depends(get_session)) -> list[schemas.ResponseMenuWitSubmenusSchema]:
+async def get_all_in_one(
+    response: Response,
+    db: AsyncSession = Depends(get_session),
+    if_none_match: str | None = Header(default=None),
+    accept_encoding: str | None = Header(default=None),
+) -> list[schemas.ResponseMenuWitSubmenusSchema]:
     """Get all menus with menus' submenus with submenus' dishes."""
 
-    return await services.menus_service.get_all_in_one(db=db)
+    return await services.menus_service.render_all_in_one(
+        db=db, if_none_match=if_none_match, accept_encoding=accept_encoding, response=response
+    )
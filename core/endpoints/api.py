@@ -3,6 +3,7 @@ from fastapi import APIRouter
 from core.endpoints.all_in_one import router as all_in_one_router
 from core.endpoints.dishes import router as dishes_router
 from core.endpoints.menus import router as menus_router
+from core.endpoints.status import router as status_router
 from core.endpoints.submenus import router as submenus_router
 
 router: APIRouter = APIRouter()
@@ -11,6 +12,7 @@ router.include_router(dishes_router, prefix='/menus', tags=['dishes'])
 router.include_router(menus_router, prefix='/menus', tags=['menus'])
 router.include_router(submenus_router, prefix='/menus', tags=['submenus'])
 router.include_router(all_in_one_router, prefix='/celery', tags=['celery'])
+router.include_router(status_router, prefix='/status', tags=['status'])
 
 tags_metadata = [
     {
@@ -29,4 +31,8 @@ tags_metadata = [
         'name': 'submenus',
         'description': 'Operations with **submenus** of menu.',
     },
+    {
+        'name': 'status',
+        'description': 'State of resources of the process.',
+    },
 ]
@@ -1,10 +1,11 @@
 from uuid import UUID
 
-from fastapi import APIRouter, BackgroundTasks, Depends
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core import schemas, services
 from core.db import get_session
+from core.services.pagination import Page, get_page, page_response
 
 router = APIRouter()
 
@@ -14,15 +15,34 @@ router = APIRouter()
     status_code=200,
     response_model=list[schemas.ResponseDishSchema],
     name='get_dish_list',
-    responses={404: {'model': schemas.NotFoundSchema, 'description': 'Not Found Error'}},
+    responses={
+        200: page_response,
+        304: {'description': 'Not Modified'},
+        404: {'model': schemas.NotFoundSchema, 'description': 'Not Found Error'},
+    },
 )
 async def get_dish_list(
-    menu_id: UUID, submenu_id: UUID, db: AsyncSession = Depends(get_session)
+    response: Response,
+    menu_id: UUID,
+    submenu_id: UUID,
+    db: AsyncSession = Depends(get_session),
+    if_none_match: str | None = Header(default=None),
+    accept_encoding: str | None = Header(default=None),
+    page: Page = Depends(get_page),
 ) -> list[schemas.ResponseDishSchema]:
-    """Get submenu's dishes."""
+    """Get submenu's dishes.
+
+    A page is returned by limit or cursor with the cursor of the next page in X-Next-Cursor header.
+    """
 
     dish_list: list[schemas.ResponseDishSchema] = await services.dishes_service.get_dish_list(
-        db=db, menu_id=menu_id, submenu_id=submenu_id
+        db=db,
+        menu_id=menu_id,
+        submenu_id=submenu_id,
+        if_none_match=if_none_match,
+        accept_encoding=accept_encoding,
+        response=response,
+        page=page,
     )
     return dish_list
 
@@ -54,15 +74,30 @@ async def create_dish(
     status_code=200,
     response_model=schemas.ResponseDishSchema,
     name='get_dish',
-    responses={404: {'model': schemas.NotFoundSchema, 'description': 'Not Found Error'}},
+    responses={
+        304: {'description': 'Not Modified'},
+        404: {'model': schemas.NotFoundSchema, 'description': 'Not Found Error'},
+    },
 )
 async def detail_dish(
-    menu_id: UUID, submenu_id: UUID, dish_id: UUID, db: AsyncSession = Depends(get_session)
+    response: Response,
+    menu_id: UUID,
+    submenu_id: UUID,
+    dish_id: UUID,
+    db: AsyncSession = Depends(get_session),
+    if_none_match: str | None = Header(default=None),
+    accept_encoding: str | None = Header(default=None),
 ) -> schemas.ResponseDishSchema:
     """Get dish's detail."""
 
     dish: schemas.ResponseDishSchema = await services.dishes_service.get_dish(
-        db=db, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id
+        db=db,
+        menu_id=menu_id,
+        submenu_id=submenu_id,
+        dish_id=dish_id,
+        if_none_match=if_none_match,
+        accept_encoding=accept_encoding,
+        response=response,
     )
     return dish
 
@@ -1,19 +1,37 @@
 from uuid import UUID
 
-from fastapi import APIRouter, BackgroundTasks, Depends
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core import schemas, services
 from core.db import get_session
+from core.services.pagination import Page, get_page, page_response
 
 router = APIRouter()
 
 
-@router.get('', status_code=200, response_model=list[schemas.ResponseMenuSchema], name='get_menu_list')
-async def get_menu_list(db: AsyncSession = Depends(get_session)) -> list[schemas.ResponseMenuSchema]:
-    """Get menus."""
+@router.get(
+    '',
+    status_code=200,
+    response_model=list[schemas.ResponseMenuSchema],
+    name='get_menu_list',
+    responses={200: page_response, 304: {'description': 'Not Modified'}},
+)
+async def get_menu_list(
+    response: Response,
+    db: AsyncSession = Depends(get_session),
+    if_none_match: str | None = Header(default=None),
+    accept_encoding: str | None = Header(default=None),
+    page: Page = Depends(get_page),
+) -> list[schemas.ResponseMenuSchema]:
+    """Get menus.
+
+    A page is returned by limit or cursor with the cursor of the next page in X-Next-Cursor header.
+    """
 
-    menu_list: list[schemas.ResponseMenuSchema] = await services.menus_service.get_menu_list(db=db)
+    menu_list: list[schemas.ResponseMenuSchema] = await services.menus_service.get_menu_list(
+        db=db, if_none_match=if_none_match, accept_encoding=accept_encoding, page=page, response=response
+    )
     return menu_list
 
 
@@ -32,12 +50,23 @@ async def create_menu(
     status_code=200,
     response_model=schemas.ResponseMenuWithCountSchema,
     name='get_menu',
-    responses={404: {'model': schemas.NotFoundSchema, 'description': 'Not Found Error'}},
+    responses={
+        304: {'description': 'Not Modified'},
+        404: {'model': schemas.NotFoundSchema, 'description': 'Not Found Error'},
+    },
 )
-async def detail_menu(menu_id: UUID, db: AsyncSession = Depends(get_session)) -> schemas.ResponseMenuWithCountSchema:
+async def detail_menu(
+    response: Response,
+    menu_id: UUID,
+    db: AsyncSession = Depends(get_session),
+    if_none_match: str | None = Header(default=None),
+    accept_encoding: str | None = Header(default=None),
+) -> schemas.ResponseMenuWithCountSchema:
     """Get menu's detail."""
 
-    menu: schemas.ResponseMenuWithCountSchema = await services.menus_service.get_menu(db=db, menu_id=menu_id)
+    menu: schemas.ResponseMenuWithCountSchema = await services.menus_service.get_menu(
+        db=db, menu_id=menu_id, if_none_match=if_none_match, accept_encoding=accept_encoding, response=response
+    )
     return menu
 
 
@@ -0,0 +1,21 @@
+from fastapi import APIRouter
+
+from core import db, schemas
+
+router = APIRouter()
+
+
+@router.get(
+    '/db_pool',
+    status_code=200,
+    response_model=schemas.DBPoolStatsSchema,
+    name='get_db_pool_stats',
+)
+async def get_db_pool_stats() -> schemas.DBPoolStatsSchema:
+    """Get statistics of the pool of database connections of the process.
+
+    Checked out connections are in use, waiting requests wait for a free connection,
+    timeouts count requests failed by waiting longer than the pool timeout.
+    """
+
+    return schemas.DBPoolStatsSchema(**db.get_pool_stats())
@@ -1,10 +1,11 @@
 from uuid import UUID
 
-from fastapi import APIRouter, BackgroundTasks, Depends
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core import schemas, services
 from core.db import get_session
+from core.services.pagination import Page, get_page, page_response
 
 router = APIRouter()
 
@@ -14,15 +15,32 @@ router = APIRouter()
     status_code=200,
     response_model=list[schemas.ResponseSubmenuSchema],
     name='get_submenu_list',
-    responses={404: {'model': schemas.NotFoundSchema, 'description': 'Not Found Error'}},
+    responses={
+        200: page_response,
+        304: {'description': 'Not Modified'},
+        404: {'model': schemas.NotFoundSchema, 'description': 'Not Found Error'},
+    },
 )
 async def get_submenu_list(
-    menu_id: UUID, db: AsyncSession = Depends(get_session)
+    response: Response,
+    menu_id: UUID,
+    db: AsyncSession = Depends(get_session),
+    if_none_match: str | None = Header(default=None),
+    accept_encoding: str | None = Header(default=None),
+    page: Page = Depends(get_page),
 ) -> list[schemas.ResponseSubmenuSchema]:
-    """Get menu's submenu."""
+    """Get menu's submenu.
+
+    A page is returned by limit or cursor with the cursor of the next page in X-Next-Cursor header.
+    """
 
     submenu_list: list[schemas.ResponseSubmenuSchema] = await services.submenus_service.get_submenu_list(
-        db=db, menu_id=menu_id
+        db=db,
+        menu_id=menu_id,
+        if_none_match=if_none_match,
+        accept_encoding=accept_encoding,
+        page=page,
+        response=response,
     )
     return submenu_list
 
@@ -50,15 +68,28 @@ async def create_submenu(
     status_code=200,
     response_model=schemas.ResponseSubmenuWithCountSchema,
     name='get_submenu',
-    responses={404: {'model': schemas.NotFoundSchema, 'description': 'Not Found Error'}},
+    responses={
+        304: {'description': 'Not Modified'},
+        404: {'model': schemas.NotFoundSchema, 'description': 'Not Found Error'},
+    },
 )
 async def detail_submenu(
-    menu_id: UUID, submenu_id: UUID, db: AsyncSession = Depends(get_session)
+    response: Response,
+    menu_id: UUID,
+    submenu_id: UUID,
+    db: AsyncSession = Depends(get_session),
+    if_none_match: str | None = Header(default=None),
+    accept_encoding: str | None = Header(default=None),
 ) -> schemas.ResponseSubmenuWithCountSchema:
     """Get submenu's detail."""
 
     submenu: schemas.ResponseSubmenuWithCountSchema = await services.submenus_service.get_submenu(
-        db=db, menu_id=menu_id, submenu_id=submenu_id
+        db=db,
+        menu_id=menu_id,
+        submenu_id=submenu_id,
+        if_none_match=if_none_match,
+        accept_encoding=accept_encoding,
+        response=response,
     )
     return submenu
 
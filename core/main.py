@@ -1,9 +1,26 @@
+import contextlib
+from typing import AsyncIterator
+
 from fastapi import FastAPI
 
+from core import db, services
 from core.docs.project_description import description
 from core.endpoints import api
 from core.settings import settings
 
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    await services.cache_service.startup()
+    await services.read_model.startup()
+    await services.change_listener.startup()
+    yield
+    await services.change_listener.shutdown()
+    await services.read_model.shutdown()
+    await services.cache_service.shutdown()
+    await db.shutdown()
+
+
 app: FastAPI = FastAPI(
     docs_url=settings.DOCS_URL,
     openapi_url=f'{settings.API_PREFIX}/openapi.json',
@@ -14,5 +31,6 @@ app: FastAPI = FastAPI(
     description=description,
     redoc_url=None,
     openapi_tags=api.tags_metadata,
+    lifespan=lifespan,
 )
 app.include_router(api.router, prefix=settings.API_PREFIX)
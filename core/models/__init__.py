@@ -1 +1,2 @@
-from core.models.models import DishDBModel, MenuDBModel, SubmenuDBModel, DiscountDBModel
+from core.models.models import DishDBModel, MenuDBModel, SubmenuDBModel, DiscountDBModel, CacheOutboxDBModel
+from core.models import counters
@@ -9,7 +9,7 @@ from sqlalchemy.sql import func
 @as_declarative()
 class BaseDBModel:
     # flake8: noqa: A003
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     __name__: str
 
     created_at = Column(DateTime(timezone=True), default=func.now())
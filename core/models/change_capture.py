@@ -0,0 +1,74 @@
+# Changes of rows are captured by triggers and notified on commit to the listener of cache, see `ChangeListener`.
+# The triggers are created by migrations, tables created by metadata are not captured; migrations keep their own
+# copies of the SQL, so this is the current version of it, e.g. for tests, and changes here need a new revision.
+TABLES: tuple[str, ...] = ('menus', 'submenus', 'dishes', 'dishes_discount')
+
+# Changes are notified as {"e": entity, "o": operation, "m": menu_id, "s": submenu_id, "d": dish_id, "x": txid},
+# the ID of the transaction makes every notification unique, so a single listener applies it.
+# A discount changes the price of its dish, so it is notified as an update of the dish.
+# Parents of rows deleted by cascade are not found, their changes are covered by the change of the parent.
+# Updates of counters only are skipped, otherwise every dish would notify changes of its submenu and menu too;
+# the function is compatible with tables without counters.
+NOTIFY_FUNCTION: str = """
+CREATE OR REPLACE FUNCTION notify_menu_change() RETURNS trigger AS $$
+DECLARE
+    rec record;
+    v_entity text := 'dish';
+    v_operation text := lower(TG_OP);
+    v_menu_id uuid;
+    v_submenu_id uuid;
+    v_dish_id uuid;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        rec := OLD;
+    ELSE
+        rec := NEW;
+    END IF;
+    IF TG_OP = 'UPDATE'
+        AND to_jsonb(NEW) - 'submenus_count' - 'dishes_count' = to_jsonb(OLD) - 'submenus_count' - 'dishes_count'
+    THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'INSERT' THEN
+        v_operation := 'create';
+    END IF;
+
+    IF TG_TABLE_NAME = 'menus' THEN
+        v_entity := 'menu';
+        v_menu_id := rec.id;
+    ELSIF TG_TABLE_NAME = 'submenus' THEN
+        v_entity := 'submenu';
+        v_menu_id := rec.menu_id;
+        v_submenu_id := rec.id;
+    ELSE
+        IF TG_TABLE_NAME = 'dishes_discount' THEN
+            v_operation := 'update';
+            v_dish_id := rec.dish_id;
+            SELECT d.submenu_id INTO v_submenu_id FROM dishes d WHERE d.id = v_dish_id;
+        ELSE
+            v_dish_id := rec.id;
+            v_submenu_id := rec.submenu_id;
+        END IF;
+        SELECT s.menu_id INTO v_menu_id FROM submenus s WHERE s.id = v_submenu_id;
+    END IF;
+
+    PERFORM pg_notify(
+        'menu_changes',
+        json_build_object(
+            'e', v_entity, 'o', v_operation, 'm', v_menu_id, 's', v_submenu_id, 'd', v_dish_id, 'x', txid_current()
+        )::text
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+CREATE_TRIGGER: str = """
+CREATE TRIGGER {table}_notify_change
+AFTER INSERT OR UPDATE OR DELETE ON {table}
+FOR EACH ROW EXECUTE FUNCTION notify_menu_change()
+"""
+
+DROP_TRIGGER: str = 'DROP TRIGGER IF EXISTS {table}_notify_change ON {table}'
+
+DROP_FUNCTION: str = 'DROP FUNCTION IF EXISTS notify_menu_change()'
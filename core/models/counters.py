@@ -0,0 +1,62 @@
+from sqlalchemy import DDL, event, inspect
+
+from core.models.models import DishDBModel, SubmenuDBModel
+
+# Counts of submenus and dishes are kept in rows of menus and submenus by triggers, so inserts and deletes
+# of any code, bulk sync with the source and cascade deletes are counted in the same transaction.
+# Rows of parents deleted by cascade are not found, their counts are gone with them.
+# The triggers are created with tables by metadata, databases of migrations get them by the counters migration,
+# which keeps its own copy of the SQL, so later changes here do not change what the revision applies.
+COUNT_SUBMENUS_FUNCTION: str = """
+CREATE OR REPLACE FUNCTION count_submenu_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE menus SET submenus_count = submenus_count - 1, dishes_count = dishes_count - OLD.dishes_count
+        WHERE id = OLD.menu_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE menus SET submenus_count = submenus_count + 1, dishes_count = dishes_count + NEW.dishes_count
+        WHERE id = NEW.menu_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+COUNT_DISHES_FUNCTION: str = """
+CREATE OR REPLACE FUNCTION count_dish_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        WITH submenu AS (
+            UPDATE submenus SET dishes_count = dishes_count - 1 WHERE id = OLD.submenu_id RETURNING menu_id
+        )
+        UPDATE menus SET dishes_count = dishes_count - 1 FROM submenu WHERE menus.id = submenu.menu_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        WITH submenu AS (
+            UPDATE submenus SET dishes_count = dishes_count + 1 WHERE id = NEW.submenu_id RETURNING menu_id
+        )
+        UPDATE menus SET dishes_count = dishes_count + 1 FROM submenu WHERE menus.id = submenu.menu_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+# moves of rows to other parents are counted too, updates of other columns do not fire the triggers
+COUNT_SUBMENUS_TRIGGER: str = """
+CREATE TRIGGER submenus_count_change
+AFTER INSERT OR DELETE OR UPDATE OF menu_id ON submenus
+FOR EACH ROW EXECUTE FUNCTION count_submenu_change()
+"""
+
+COUNT_DISHES_TRIGGER: str = """
+CREATE TRIGGER dishes_count_change
+AFTER INSERT OR DELETE OR UPDATE OF submenu_id ON dishes
+FOR EACH ROW EXECUTE FUNCTION count_dish_change()
+"""
+
+event.listen(inspect(SubmenuDBModel).local_table, 'after_create', DDL(COUNT_SUBMENUS_FUNCTION))
+event.listen(inspect(SubmenuDBModel).local_table, 'after_create', DDL(COUNT_SUBMENUS_TRIGGER))
+event.listen(inspect(DishDBModel).local_table, 'after_create', DDL(COUNT_DISHES_FUNCTION))
+event.listen(inspect(DishDBModel).local_table, 'after_create', DDL(COUNT_DISHES_TRIGGER))
@@ -1,4 +1,4 @@
-from sqlalchemy import DECIMAL, Column, ForeignKey, String
+from sqlalchemy import DECIMAL, Column, ForeignKey, Index, Integer, String
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -10,16 +10,23 @@ class MenuDBModel(BaseDBModel):
 
     title = Column(String)
     description = Column(String)
+    # kept by triggers, see `core.models.counters`
+    submenus_count = Column(Integer, nullable=False, default=0, server_default='0')
+    dishes_count = Column(Integer, nullable=False, default=0, server_default='0')
 
     submenus = relationship('SubmenuDBModel', back_populates='menu', cascade='all, delete')
 
 
 class SubmenuDBModel(BaseDBModel):
     __tablename__ = 'submenus'
+    # submenus of a menu ordered by IDs for pages, the menu_id prefix serves cascade deletes too
+    __table_args__ = (Index('ix_submenus_menu_id_id', 'menu_id', 'id'),)
 
     title = Column(String)
     description = Column(String)
     menu_id = Column(UUID(as_uuid=True), ForeignKey('menus.id', ondelete='CASCADE'), nullable=False)
+    # kept by triggers, see `core.models.counters`
+    dishes_count = Column(Integer, nullable=False, default=0, server_default='0')
 
     menu = relationship('MenuDBModel', foreign_keys=[menu_id], back_populates='submenus')
     dishes = relationship('DishDBModel', back_populates='submenu', cascade='all, delete')
@@ -27,6 +34,8 @@ class SubmenuDBModel(BaseDBModel):
 
 class DishDBModel(BaseDBModel):
     __tablename__ = 'dishes'
+    # dishes of a submenu ordered by IDs for pages, the submenu_id prefix serves cascade deletes too
+    __table_args__ = (Index('ix_dishes_submenu_id_id', 'submenu_id', 'id'),)
 
     title = Column(String)
     description = Column(String)
@@ -44,3 +53,11 @@ class DiscountDBModel(BaseDBModel):
     dish_id = Column(UUID(as_uuid=True), ForeignKey('dishes.id', ondelete='CASCADE'), unique=True)
 
     dish = relationship('DishDBModel', back_populates='discount')
+
+
+class CacheOutboxDBModel(BaseDBModel):
+    """Keys of cache to invalidate, written in the same transaction as changes of objects"""
+    __tablename__ = 'cache_outbox'
+    __table_args__ = (Index('ix_cache_outbox_created_at', 'created_at'),)
+
+    key = Column(String, nullable=False)
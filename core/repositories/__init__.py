@@ -1,3 +1,4 @@
 from core.repositories.dishes import dishes, discount
 from core.repositories.menus import menus
 from core.repositories.submenus import submenus
+from core.repositories.outbox import cache_outbox
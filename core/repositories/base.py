@@ -1,16 +1,18 @@
-from typing import Any, Generic, TypeVar
+from typing import Any, Generic, TypeVar, overload
 from uuid import UUID
 
 from pydantic import BaseModel
-from sqlalchemy import delete
+from sqlalchemy import delete, insert, inspect, literal, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.sql import ColumnElement, Delete, Insert, Select, Update
 
 from core.models.base import BaseDBModel
 
 ModelType = TypeVar('ModelType', bound=BaseDBModel)
 CreateSchemaType = TypeVar('CreateSchemaType', bound=BaseModel)
 UpdateSchemaType = TypeVar('UpdateSchemaType', bound=BaseModel)
+ReturningQuery = TypeVar('ReturningQuery', Insert, Update, Delete)
 
 
 class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
@@ -19,15 +21,28 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def __init__(self, model: type[ModelType]):
         self.model: type[ModelType] = model
 
+    def query_page(self, query: Select, after: UUID | None = None, limit: int | None = None) -> Select:
+        """Order the query by IDs and take objects following the ID.
+
+        Keyset pagination seeks to the ID by the index instead of scanning skipped rows, without limit all objects
+        are taken.
+        """
+        query = query.order_by(self.model.id)
+        if after is not None:
+            query = query.filter(self.model.id > after)
+        if limit is not None:
+            query = query.limit(limit)
+        return query
+
     async def get_all(
         self,
         db: AsyncSession,
         *,
-        skip: int = 0,
-        limit: int = 100,
+        after: UUID | None = None,
+        limit: int | None = None,
     ) -> list[ModelType]:
-        """Select all objects in database."""
-        return (await db.execute(select(self.model).offset(skip).limit(limit))).scalars().all()
+        """Select all objects in database ordered by IDs."""
+        return (await db.execute(self.query_page(select(self.model), after=after, limit=limit))).scalars().all()
 
     async def get_by_id(self, db: AsyncSession, *, obj_id: UUID) -> ModelType | None:
         """Select an object in database by ID."""
@@ -49,14 +64,22 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         return (await db.execute(self.query_by_field(fields))).scalar_one_or_none()
 
     async def get_mul_by_fields(
-        self, db: AsyncSession, *, fields: dict, skip: int = 0, limit: int = 100
+        self, db: AsyncSession, *, fields: dict, after: UUID | None = None, limit: int | None = None
     ) -> list[ModelType]:
-        """Select objects in database by fields value."""
+        """Select objects in database by fields value ordered by IDs."""
 
-        return (await db.execute(self.query_by_field(fields).offset(skip).limit(limit))).scalars().all()
+        return (
+            await db.execute(self.query_page(self.query_by_field(fields), after=after, limit=limit))
+        ).scalars().all()
 
     async def get_all_by_fields(
-        self, db: AsyncSession, *, fields: dict, only_one: bool = False, skip: int = 0, limit: int = 100
+        self,
+        db: AsyncSession,
+        *,
+        fields: dict,
+        only_one: bool = False,
+        after: UUID | None = None,
+        limit: int | None = None,
     ) -> ModelType | None | list[ModelType]:
         """Select objects in database by fields value.
 
@@ -70,57 +93,104 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         if only_one:
             return (await db.execute(query)).scalar_one_or_none()
         else:
-            return (await db.execute(query.offset(skip).limit(limit))).scalars().all()
+            return (await db.execute(self.query_page(query, after=after, limit=limit))).scalars().all()
 
-    async def create(self, db: AsyncSession, *, obj_in: CreateSchemaType | dict):
-        """Create an object in database."""
+    def query_returning(self, query: ReturningQuery) -> Select:
+        """Query for objects of rows returned by the write statement.
+
+        Objects already in the session are refreshed by returned rows.
+        """
+        return (
+            select(self.model)
+            .from_statement(query.returning(self.model))
+            .execution_options(populate_existing=True)
+        )
+
+    def filter_by_fields(self, fields: dict | None) -> list[ColumnElement]:
+        """Conditions of objects by fields value."""
+        return [getattr(self.model, field_name) == value for field_name, value in (fields or {}).items()]
+
+    @overload
+    async def create(self, db: AsyncSession, *, obj_in: CreateSchemaType | dict, condition: None = None) -> ModelType:
+        ...
+
+    @overload
+    async def create(
+        self, db: AsyncSession, *, obj_in: CreateSchemaType | dict, condition: ColumnElement
+    ) -> ModelType | None:
+        ...
+
+    async def create(
+        self, db: AsyncSession, *, obj_in: CreateSchemaType | dict, condition: ColumnElement | None = None
+    ) -> ModelType | None:
+        """Create an object in database by a single statement without commit.
+
+        With the condition, e.g. an existence of the parent, the object is created only if it holds,
+        otherwise None is returned.
+        """
         obj_dict: dict = dict(obj_in)
 
-        db_obj = self.model(**obj_dict)
-        db.add(db_obj)
-        await db.flush()
-        await db.commit()
-        await db.refresh(db_obj)
+        query: Insert = insert(self.model)
+        if condition is None:
+            query = query.values(**obj_dict)
+        else:
+            columns = inspect(self.model).columns
+            query = query.from_select(
+                list(obj_dict),
+                select(*(literal(value, columns[name].type) for name, value in obj_dict.items())).where(condition),
+            )
+
+        return (await db.execute(self.query_returning(query))).scalar_one_or_none()
 
-        return db_obj
+    async def delete_by_id(self, db: AsyncSession, *, obj_id: UUID, fields: dict | None = None) -> bool:
+        """Delete an object in database by ID and fields value without commit.
 
-    async def delete_by_id(self, db: AsyncSession, *, obj_id: UUID):
-        """Delete an object in database by ID."""
-        query = delete(self.model).where(self.model.id == obj_id)
+        Return False if there is no such object.
+        """
+        query = (
+            delete(self.model)
+            .where(self.model.id == obj_id, *self.filter_by_fields(fields))
+            .returning(self.model.id)
+            .execution_options(synchronize_session=False)
+        )
+
+        return (await db.execute(query)).scalar_one_or_none() is not None
+
+    def query_update(
+        self, obj_id: UUID, obj_in: UpdateSchemaType | dict[str, Any], fields: dict | None = None
+    ) -> Update:
+        """Statement of update of an object by ID and fields value."""
+        if isinstance(obj_in, dict):
+            update_data = obj_in
+        else:
+            update_data = obj_in.model_dump(exclude_unset=True)
 
-        await db.execute(query)
-        await db.commit()
+        columns = inspect(self.model).columns
+        return (
+            update(self.model)
+            .where(self.model.id == obj_id, *self.filter_by_fields(fields))
+            .values(**{field: value for field, value in update_data.items() if field in columns})
+            .execution_options(synchronize_session=False)
+        )
 
     async def update(
         self,
         db: AsyncSession,
         *,
-        db_obj: ModelType,
+        obj_id: UUID,
         obj_in: UpdateSchemaType | dict[str, Any],
-    ) -> ModelType:
-        """Update an object in database.
+        fields: dict | None = None,
+    ) -> ModelType | None:
+        """Update an object in database by a single statement without commit.
 
-        :param db_obj: Modifiable object
+        :param obj_id: ID of modifiable object
         :param obj_in: Updated data
-        :return:
+        :param fields: Values of fields the object must have, e.g. ID of the parent
+        :return: Updated object or None if there is no such object
         """
-        obj_data = dict(db_obj.__dict__)
-        obj_data.pop('_sa_instance_state')
-
-        if isinstance(obj_in, dict):
-            update_data = obj_in
-        else:
-            update_data = obj_in.model_dump(exclude_unset=True)
-
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
+        query = self.query_update(obj_id, obj_in, fields)
 
-        db.add(db_obj)
-        await db.flush()
-        await db.commit()
-        await db.refresh(db_obj)
-        return db_obj
+        return (await db.execute(self.query_returning(query))).scalar_one_or_none()
 
 
 RepositoryType = TypeVar('RepositoryType', bound=BaseRepository)
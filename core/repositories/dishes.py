@@ -1,3 +1,4 @@
+from decimal import Decimal
 from uuid import UUID
 
 from sqlalchemy import select
@@ -20,13 +21,53 @@ class DishesRepository(BaseRepository[models.DishDBModel, schemas.DishWithSubmen
         )
         return (await db.execute(query)).scalar_one_or_none()
 
-    async def get_dish_list_by_submenu_id(self, db: AsyncSession, submenu_id: UUID) -> list[models.DishDBModel]:
+    async def create_in_submenu(
+        self, db: AsyncSession, *, obj_in: schemas.DishWithSubmenuIdSchema, menu_id: UUID, submenu_id: UUID
+    ) -> models.DishDBModel | None:
+        """Create dish in submenu of menu without commit, return None if there is no such submenu in menu."""
+        return await self.create(
+            db=db,
+            obj_in=obj_in,
+            condition=(
+                select(models.SubmenuDBModel.id)
+                .filter(models.SubmenuDBModel.id == submenu_id, models.SubmenuDBModel.menu_id == menu_id)
+                .exists()
+            ),
+        )
+
+    async def update_dish(
+        self, db: AsyncSession, *, dish_id: UUID, submenu_id: UUID, obj_in: schemas.UpdateDishSchema
+    ) -> tuple[models.DishDBModel, Decimal | None] | None:
+        """Update dish in submenu without commit.
+
+        Return updated dish with value of its discount or None if there is no such dish in submenu.
+        """
+        discount = (
+            select(models.DiscountDBModel.value)
+            .filter(models.DiscountDBModel.dish_id == self.model.id)
+            .scalar_subquery()
+            .label('discount')
+        )
         query = (
+            select(self.model, discount)
+            .from_statement(
+                self.query_update(dish_id, obj_in, fields={'submenu_id': submenu_id}).returning(self.model, discount)
+            )
+            .execution_options(populate_existing=True)
+        )
+        return (await db.execute(query)).one_or_none()
+
+    async def get_dish_list_by_submenu_id(
+        self, db: AsyncSession, submenu_id: UUID, after: UUID | None = None, limit: int | None = None
+    ) -> list[models.DishDBModel]:
+        query = self.query_page(
             select(self.model)
             .filter(self.model.submenu_id == submenu_id)
             .options(
                 selectinload(models.DishDBModel.discount)
-            )
+            ),
+            after=after,
+            limit=limit,
         )
 
         return (await db.execute(query)).scalars().all()
@@ -1,33 +1,93 @@
 from uuid import UUID
 
-from sqlalchemy import distinct, func, select
+from sqlalchemy import distinct, func, or_, select, text, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
+from sqlalchemy.sql import Select
 
 from core import models, schemas
 from core.repositories.base import BaseRepository
 
 
 class MenuRepository(BaseRepository[models.MenuDBModel, schemas.MenuSchema, schemas.UpdateMenuSchema]):
-    async def get_menu_with_counts(
-        self, db: AsyncSession, menu_id: UUID
-    ) -> tuple[models.MenuDBModel, int, int] | None:
-        """Get menu with counts of dishes and submenus in menu from database."""
+    async def get_menu_with_counts(self, db: AsyncSession, menu_id: UUID) -> models.MenuDBModel | None:
+        """Get menu with counts of dishes and submenus in menu from database.
 
+        Counts are columns of the menu kept by triggers, they are refreshed if the menu is in the session.
+        """
+        query = select(self.model).filter(self.model.id == menu_id).execution_options(populate_existing=True)
+        return (await db.execute(query)).scalar_one_or_none()
+
+    async def get_count_mismatches(self, db: AsyncSession) -> list[tuple[UUID, int, int, int, int]]:
+        """Get IDs of menus with kept and actual counts of submenus and dishes which differ."""
+        actual = self.query_actual_counts().subquery()
         query = (
             select(
-                self.model, func.count(distinct(models.SubmenuDBModel.id)), func.count(distinct(models.DishDBModel.id))
+                self.model.id,
+                self.model.submenus_count,
+                self.model.dishes_count,
+                actual.c.submenus_count,
+                actual.c.dishes_count,
+            )
+            .join(actual, actual.c.id == self.model.id)
+            .filter(
+                or_(
+                    self.model.submenus_count != actual.c.submenus_count,
+                    self.model.dishes_count != actual.c.dishes_count,
+                )
             )
-            .select_from(self.model, models.SubmenuDBModel)
-            .filter(self.model.id == menu_id)
-            .join(models.SubmenuDBModel, isouter=True)
+            .order_by(self.model.id)
+        )
+        return (await db.execute(query)).all()
+
+    async def lock_counted(self, db: AsyncSession) -> None:
+        """Lock tables of submenus and dishes against changes until the commit.
+
+        Tables are locked at once before repairs of counts update any of them: the lock blocks writes of others
+        and conflicts with itself, so concurrent repairs wait instead of escalating their locks into a deadlock.
+        """
+        await db.execute(text('LOCK TABLE submenus, dishes IN SHARE ROW EXCLUSIVE MODE'))
+
+    async def repair_counts(self, db: AsyncSession) -> list[UUID]:
+        """Set counts of submenus and dishes of menus to actual ones and return IDs of repaired menus.
+
+        Counted tables have to be locked by `lock_counted` before, so counts are not changed meanwhile.
+        """
+        actual = self.query_actual_counts().subquery()
+        query = (
+            update(self.model)
+            .where(self.model.id == actual.c.id)
+            .where(
+                or_(
+                    self.model.submenus_count != actual.c.submenus_count,
+                    self.model.dishes_count != actual.c.dishes_count,
+                )
+            )
+            .values(submenus_count=actual.c.submenus_count, dishes_count=actual.c.dishes_count)
+            .returning(self.model.id)
+            .execution_options(synchronize_session=False)
+        )
+        return (await db.execute(query)).scalars().all()
+
+    def query_actual_counts(self) -> Select:
+        """Query for IDs of menus with counts of submenus and dishes in menus"""
+        return (
+            select(
+                self.model.id,
+                func.count(distinct(models.SubmenuDBModel.id)).label('submenus_count'),
+                func.count(distinct(models.DishDBModel.id)).label('dishes_count'),
+            )
+            .join(models.SubmenuDBModel, models.SubmenuDBModel.menu_id == self.model.id, isouter=True)
             .join(models.DishDBModel, models.SubmenuDBModel.id == models.DishDBModel.submenu_id, isouter=True)
-            .group_by(self.model)
+            .group_by(self.model.id)
         )
-        return (await db.execute(query)).first()
+
+    async def get_all_ids(self, db: AsyncSession) -> list[UUID]:
+        """Get IDs of all menus in order of the all_in_one tree from database."""
+        return (await db.execute(select(self.model.id).order_by(self.model.id))).scalars().all()
 
     async def get_all_in_one(
-            self, db: AsyncSession
+            self, db: AsyncSession, menu_ids: list[UUID] | None = None
     ) -> list[tuple[models.MenuDBModel, models.SubmenuDBModel | None, models.DishDBModel | None]]:
 
         query = (
@@ -39,6 +99,8 @@ class MenuRepository(BaseRepository[models.MenuDBModel, schemas.MenuSchema, sche
             )
             .order_by(models.MenuDBModel.id, models.SubmenuDBModel.id, models.DishDBModel.id)
         )
+        if menu_ids is not None:
+            query = query.filter(models.MenuDBModel.id.in_(menu_ids))
 
         return (await db.execute(query)).all()
 
@@ -0,0 +1,33 @@
+from collections.abc import Iterable
+from uuid import UUID
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core import models, schemas
+from core.repositories.base import BaseRepository
+
+
+class CacheOutboxRepository(
+    BaseRepository[models.CacheOutboxDBModel, schemas.CacheOutboxSchema, schemas.CacheOutboxSchema]
+):
+    def add_keys(self, db: AsyncSession, keys: Iterable[str]) -> None:
+        """Add keys of cache to invalidate to the session, they are committed with the following changes."""
+        db.add_all(self.model(**schemas.CacheOutboxSchema(key=key).model_dump()) for key in dict.fromkeys(keys))
+
+    async def lock_batch(self, db: AsyncSession, limit: int) -> list[models.CacheOutboxDBModel]:
+        """Select the oldest events and lock them, events locked by other dispatchers are skipped."""
+        query = (
+            select(self.model)
+            .order_by(self.model.created_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        return (await db.execute(query)).scalars().all()
+
+    async def delete_batch(self, db: AsyncSession, obj_ids: list[UUID]) -> None:
+        """Delete dispatched events without commit."""
+        await db.execute(delete(self.model).where(self.model.id.in_(obj_ids)))
+
+
+cache_outbox: CacheOutboxRepository = CacheOutboxRepository(models.CacheOutboxDBModel)
@@ -1,7 +1,8 @@
 from uuid import UUID
 
-from sqlalchemy import distinct, func, select
+from sqlalchemy import func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
 
 from core import models, schemas
 from core.repositories.base import BaseRepository
@@ -12,15 +13,61 @@ class SubmenuRepository(
 ):
     async def get_submenu_with_dish_count(
         self, db: AsyncSession, submenu_id: UUID, menu_id: UUID
-    ) -> tuple[models.SubmenuDBModel, int] | None:
-        """Get submenu with counts of dishes in submenu from database."""
+    ) -> models.SubmenuDBModel | None:
+        """Get submenu with counts of dishes in submenu from database.
+
+        The count is a column of the submenu kept by triggers, it is refreshed if the submenu is in the session.
+        """
+        query = (
+            select(self.model)
+            .filter(self.model.id == submenu_id, self.model.menu_id == menu_id)
+            .execution_options(populate_existing=True)
+        )
+        return (await db.execute(query)).scalar_one_or_none()
+
+    async def create_in_menu(
+        self, db: AsyncSession, *, obj_in: schemas.SubmenuWithMenuIdSchema, menu_id: UUID
+    ) -> models.SubmenuDBModel | None:
+        """Create submenu in menu without commit, return None if there is no such menu."""
+        return await self.create(
+            db=db,
+            obj_in=obj_in,
+            condition=select(models.MenuDBModel.id).filter(models.MenuDBModel.id == menu_id).exists(),
+        )
+
+    async def get_count_mismatches(self, db: AsyncSession) -> list[tuple[UUID, int, int]]:
+        """Get IDs of submenus with kept and actual counts of dishes which differ."""
+        actual = self.query_actual_counts().subquery()
         query = (
-            select(models.SubmenuDBModel, func.count(distinct(models.DishDBModel.id)))
-            .filter(models.SubmenuDBModel.id == submenu_id, models.SubmenuDBModel.menu_id == menu_id)
-            .join(models.DishDBModel, isouter=True)
-            .group_by(models.SubmenuDBModel)
+            select(self.model.id, self.model.dishes_count, actual.c.dishes_count)
+            .join(actual, actual.c.id == self.model.id)
+            .filter(self.model.dishes_count != actual.c.dishes_count)
+            .order_by(self.model.id)
+        )
+        return (await db.execute(query)).all()
+
+    async def repair_counts(self, db: AsyncSession) -> list[tuple[UUID, UUID]]:
+        """Set counts of dishes of submenus to actual ones and return IDs of repaired submenus with their menus.
+
+        Counted tables have to be locked by `MenuRepository.lock_counted` before, so counts are not changed meanwhile.
+        """
+        actual = self.query_actual_counts().subquery()
+        query = (
+            update(self.model)
+            .where(self.model.id == actual.c.id, self.model.dishes_count != actual.c.dishes_count)
+            .values(dishes_count=actual.c.dishes_count)
+            .returning(self.model.id, self.model.menu_id)
+            .execution_options(synchronize_session=False)
+        )
+        return (await db.execute(query)).all()
+
+    def query_actual_counts(self) -> Select:
+        """Query for IDs of submenus with counts of dishes in submenus"""
+        return (
+            select(self.model.id, func.count(models.DishDBModel.id).label('dishes_count'))
+            .join(models.DishDBModel, models.DishDBModel.submenu_id == self.model.id, isouter=True)
+            .group_by(self.model.id)
         )
-        return (await db.execute(query)).first()
 
 
 submenus: SubmenuRepository = SubmenuRepository(models.SubmenuDBModel)
@@ -28,3 +28,7 @@ from core.schemas.all_in_one import (
 )
 
 from core.schemas.base import NotFoundSchema
+
+from core.schemas.outbox import CacheOutboxSchema
+
+from core.schemas.status import DBPoolStatsSchema
@@ -0,0 +1,6 @@
+from core.schemas.base import APISchema
+
+
+class CacheOutboxSchema(APISchema):
+    """Key of cache to invalidate after the changes are committed"""
+    key: str
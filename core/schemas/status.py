@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+
+
+class DBPoolStatsSchema(BaseModel):
+    """ Model a state of the pool of database connections of the process"""
+    size: int
+    max_overflow: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    waiting: int
+    timeouts: int
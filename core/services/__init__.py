@@ -2,3 +2,7 @@ from core.services.dishes import dishes_service
 from core.services.menus import menus_service
 from core.services.submenus import submenus_service
 from core.services.redis import redis_service
+from core.services.cache import cache_service
+from core.services.outbox import outbox_dispatcher
+from core.services.read_model import read_model
+from core.services.change_capture import change_listener
@@ -1,4 +1,5 @@
 import contextlib
+import copy
 import logging
 import os
 from decimal import Decimal, InvalidOperation
@@ -16,9 +17,11 @@ from core import constants as const
 from core import models, repositories, schemas, services
 from core.db import session_generator
 from core.repositories.base import BaseRepository, ModelType
+from core.services.cache_policy import CachePolicy, get_policy
 from core.services.dishes import DishesService
 from core.services.menus import MenusService
 from core.services.submenus import SubmenusService
+from core.settings import settings
 
 ParsingSchemaType = TypeVar('ParsingSchemaType', bound=BaseModel)
 
@@ -61,6 +64,7 @@ class XLSAdminService(Generic[ParsingSchemaType, ModelType]):
         self.__to_db: list[tuple[str, str, UUID, dict[str, str] | None, Any, dict[str, UUID]]] = []
         self.__file_discount: dict[UUID, Decimal] = {}
         self.__DB_discount: dict[UUID, models.DiscountDBModel] = {}
+        self.__dish_ids: dict[UUID, dict[str, UUID]] = {}
         self.logger: logging.Logger = logger if logger is not None else logging.getLogger(__name__)
 
     async def run(self):
@@ -75,9 +79,13 @@ class XLSAdminService(Generic[ParsingSchemaType, ModelType]):
         except ParsingXLSError:
             return False
 
+        # comparison pops entities from the data of the source
+        data_to_cache = copy.deepcopy(data_in_file) if settings.CACHE_WARM_UP_AFTER_SYNC else None
         data_in_db = await self.get_db_data()
         await self.__compare_process(in_db=data_in_db, in_file=data_in_file)
         await self.apply_changes_process()
+        if data_to_cache is not None:
+            await self.warm_up_cache(data_to_cache)
         self.logger.info('Check for update DB finished')
         return True
 
@@ -85,6 +93,7 @@ class XLSAdminService(Generic[ParsingSchemaType, ModelType]):
         self.__to_db: list[tuple[str, str, UUID, dict[str, str] | None, Any, dict[str, UUID]]] = []
         self.__file_discount: dict[UUID, Decimal] = {}
         self.__DB_discount: dict[UUID, models.DiscountDBModel] = {}
+        self.__dish_ids: dict[UUID, dict[str, UUID]] = {}
 
     async def read_from_source(self) -> pd.DataFrame | None:
         """Read data from source to pandas DataFrame"""
@@ -162,6 +171,96 @@ class XLSAdminService(Generic[ParsingSchemaType, ModelType]):
             await self.__apply_changes_process(db=db)
             await self.__apply_discount(db=db)
 
+    async def warm_up_cache(self, data: dict[UUID, dict[str, Any]]) -> None:
+        """Write cache entries of menus, submenus, dishes and their lists from data of the source
+
+        Data in DB is equal to the source after applying changes, so entries are built without requests to DB.
+        """
+        self.logger.info('Warming up cache started')
+        cache = services.cache_service
+        entities: tuple[str, ...] = (*const.ENTITIES, const.ALL_IN_ONE)
+        policies: dict[str, CachePolicy] = {entity: get_policy(entity) for entity in entities}
+        list_policies: dict[str, CachePolicy] = {entity: get_policy(entity, many=True) for entity in entities}
+        menus_service: MenusService = services.menus_service
+        submenus_service: SubmenusService = services.submenus_service
+        dishes_service: DishesService = services.dishes_service
+
+        namespaces: list[str] = [cache.namespace_key(const.MENU, menu_id) for menu_id in data] + [
+            cache.namespace_key(const.SUBMENU, submenu_id) for menu in data.values() for submenu_id in menu['child']
+        ]
+        generations: dict[str, int] = dict(zip(namespaces, await cache.get_generations(*namespaces)))
+
+        items: list[tuple[str, Any, CachePolicy]] = []
+        fragments: list[schemas.ResponseMenuWitSubmenusSchema] = []
+        for menu_id, menu in sorted(data.items()):
+            menu_generation: int = generations[cache.namespace_key(const.MENU, menu_id)]
+            submenus: list[schemas.ResponseSubmenuWithDishesSchema] = []
+            for submenu_id, submenu in sorted(menu['child'].items()):
+                submenu_generation: int = generations[cache.namespace_key(const.SUBMENU, submenu_id)]
+                dishes: list[schemas.ResponseDishSchema] = [
+                    schemas.ResponseDishSchema(**dict(dish, price=self.__price_with_discount(dish_id, dish['price'])))
+                    for dish_id, dish in sorted(submenu['child'].items())
+                ]
+                items.extend(
+                    (
+                        dishes_service.build_key(menu_id, menu_generation, submenu_id, submenu_generation, dish.id),
+                        dish,
+                        policies[const.DISH],
+                    )
+                    for dish in dishes
+                )
+                items.append((
+                    dishes_service.build_key(menu_id, menu_generation, submenu_id, submenu_generation, many=True),
+                    dishes,
+                    list_policies[const.DISH],
+                ))
+                items.append((
+                    submenus_service.build_key(menu_id, menu_generation, submenu_id=submenu_id),
+                    schemas.ResponseSubmenuWithCountSchema(**submenu, dishes_count=len(dishes)),
+                    policies[const.SUBMENU],
+                ))
+                submenus.append(schemas.ResponseSubmenuWithDishesSchema(**submenu, dishes=dishes))
+
+            items.append((
+                submenus_service.build_key(menu_id, menu_generation, many=True),
+                [schemas.ResponseSubmenuSchema(**submenu) for _, submenu in sorted(menu['child'].items())],
+                list_policies[const.SUBMENU],
+            ))
+            items.append((
+                menus_service.gen_key(menu_id=menu_id),
+                schemas.ResponseMenuWithCountSchema(
+                    **menu,
+                    submenus_count=len(submenus),
+                    dishes_count=sum(len(submenu.dishes) for submenu in submenus),
+                ),
+                policies[const.MENU],
+            ))
+            fragments.append(schemas.ResponseMenuWitSubmenusSchema(**menu, submenus=submenus))
+
+        items.append((
+            menus_service.gen_key(many=True),
+            [schemas.ResponseMenuSchema(**menu) for _, menu in sorted(data.items())],
+            list_policies[const.MENU],
+        ))
+        items.extend(
+            (menus_service.gen_tree_key(menu_id=fragment.id), fragment, policies[const.ALL_IN_ONE])
+            for fragment in fragments
+        )
+        items.append((
+            menus_service.gen_tree_key(many=True),
+            [str(fragment.id) for fragment in fragments],
+            list_policies[const.ALL_IN_ONE],
+        ))
+
+        await cache.set_many(*items)
+        self.logger.info('Warming up cache finished: %s entries', len(items))
+
+    def __price_with_discount(self, dish_id: UUID, price: Decimal) -> Decimal:
+        """Price of dish with discount from the source"""
+        if dish_id not in self.__file_discount:
+            return price
+        return DishesService.apply_discount(price, self.__file_discount[dish_id])
+
     async def __apply_changes_process(self, db: AsyncSession) -> None:
         """Apply changes to DB"""
         if not self.__to_db:
@@ -170,20 +269,43 @@ class XLSAdminService(Generic[ParsingSchemaType, ModelType]):
         self.logger.info('Apply changes started')
         patterns = set()
         for entity, operation, obj_id, data, db_obj, ids in self.__to_db:
+            keys: list[str] = await self.services[entity].clearing_cache_patterns(operation, **ids)
+            self.__record_invalidation(db, keys)
             if operation == const.DELETE:
                 await self.repositories[entity].delete_by_id(db=db, obj_id=obj_id)
 
             if operation == const.UPDATE:
-                await self.repositories[entity].update(db=db, db_obj=db_obj, obj_in=data)
+                await self.repositories[entity].update(db=db, obj_id=obj_id, obj_in=data)
             if operation == const.CREATE:
                 await self.repositories[entity].create(db=db, obj_in=data)
             self.logger.info('Applied %s %s[%s]', operation, entity, obj_id)
-            patterns.update(await self.services[entity].clearing_cache_patterns(operation, **ids))
+            patterns.update(keys)
+        await db.commit()
         if patterns:
             self.logger.info('Clearing cache')
-            await services.redis_service.del_by_pattens(*patterns)
+            await self.__invalidate(patterns)
         self.logger.info('Apply changes finished')
 
+    @staticmethod
+    def __record_invalidation(db: AsyncSession, keys: list[str]) -> None:
+        """Record keys to invalidate to the outbox, they are committed with the following changes"""
+        if settings.CACHE_OUTBOX_ENABLED:
+            repositories.cache_outbox.add_keys(db, keys)
+
+    @staticmethod
+    async def __invalidate(patterns: set[str]) -> None:
+        """Invalidate cache by keys or drain the outbox with recorded keys, the read model is reloaded
+
+        With change capture it is done by the listener of database changes.
+        """
+        if settings.CACHE_CHANGE_CAPTURE:
+            return
+        await services.read_model.notify()
+        if settings.CACHE_OUTBOX_ENABLED:
+            await services.outbox_dispatcher.dispatch()
+        else:
+            await services.cache_service.invalidate(*patterns)
+
     async def __compare_process(self, in_db, in_file):
         """Compare DB and file objects to find differences."""
         self.logger.info('Comparison process started')
@@ -276,6 +398,7 @@ class XLSAdminService(Generic[ParsingSchemaType, ModelType]):
             result[menu_id]['child'][dish.submenu_id]['child'][dish_id] = {
                 'db_obj': dish,
             }
+            self.__dish_ids[dish_id] = {'menu_id': menu_id, 'submenu_id': submenu_id, 'dish_id': dish_id}
             if dish.discount is not None:
                 self.__DB_discount[dish_id] = dish.discount
 
@@ -371,6 +494,9 @@ class XLSAdminService(Generic[ParsingSchemaType, ModelType]):
                         'Discount value can be only between 0 and 100.'
                     )
                 all_data[current_menu_id]['child'][current_submenu_id]['child'][dish_id] = entity_obj
+                self.__dish_ids[dish_id] = {
+                    'menu_id': current_menu_id, 'submenu_id': current_submenu_id, 'dish_id': dish_id
+                }
 
         if skip_rows:
             logging.warning('PARSE FILE: missed rows: %s', ', '.join(skip_rows))
@@ -392,8 +518,11 @@ class XLSAdminService(Generic[ParsingSchemaType, ModelType]):
 
     async def __apply_discount(self, db: AsyncSession):
         """Apply discount changes to DB"""
+        # prices of dishes with changed discounts are cached with the discount applied
+        patterns: set[str] = set()
         for dish_id, value in self.__file_discount.items():
             if dish_id not in self.__DB_discount:
+                patterns.update(await self.__discount_patterns(db, dish_id))
                 await repositories.discount.create(
                     db=db,
                     obj_in={
@@ -409,10 +538,26 @@ class XLSAdminService(Generic[ParsingSchemaType, ModelType]):
                 self.logger.info(
                     'Updated discount from %s fo %s percent for dish[%s]', db_obj.value, value, dish_id
                 )
-                await repositories.discount.update(db=db, db_obj=db_obj, obj_in={'value': value})
+                patterns.update(await self.__discount_patterns(db, dish_id))
+                await repositories.discount.update(db=db, obj_id=db_obj.id, obj_in={'value': value})
 
         for db_obj in self.__DB_discount.values():
+            patterns.update(await self.__discount_patterns(db, db_obj.dish_id))
             await repositories.discount.delete_by_id(db=db, obj_id=db_obj.id)
             self.logger.info(
                 'Deleted discount %s percent for dish[%s]', db_obj.value, db_obj.id
             )
+
+        await db.commit()
+        if patterns:
+            await self.__invalidate(patterns)
+
+    async def __discount_patterns(self, db: AsyncSession, dish_id: UUID) -> list[str]:
+        """Keys of the dish with changed discount, recorded to the outbox before the change"""
+        if dish_id not in self.__dish_ids:
+            return []
+        keys: list[str] = await self.services[const.DISH].clearing_cache_patterns(
+            const.UPDATE, **self.__dish_ids[dish_id]
+        )
+        self.__record_invalidation(db, keys)
+        return keys
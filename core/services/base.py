@@ -1,30 +1,506 @@
+import contextlib
+import functools
+import hashlib
+import logging
 from abc import ABC, abstractmethod
-from typing import Any, Generic, TypeVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Generic, TypeVar
+from uuid import UUID
 
-from pydantic import BaseModel
+from fastapi import HTTPException, Response
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from core import constants, repositories, schemas, services
+from core.db import session_generator
 from core.repositories.base import RepositoryType
+from core.schemas.base import APISchema, BaseIdSchema
+from core.services import encodings
+from core.services.cache_policy import CachePolicy, get_policy, not_found_policy
+from core.services.cached import (
+    generate_entity_key,
+    get_writes_namespace,
+    invalidation_keys,
+)
+from core.services.single_flight import SingleFlight
+from core.settings import settings
 
 SchemaType = TypeVar('SchemaType', bound=BaseModel)
 
+logger: logging.Logger = logging.getLogger(__name__)
+
 
 class BaseCacheService(ABC):
     @abstractmethod
-    async def get(self, key: str) -> SchemaType:
+    async def get(self, key: str, refresh: Callable[[], Awaitable[None]] | None = None) -> SchemaType:
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, policy: CachePolicy | None = None):
         pass
 
     @abstractmethod
-    async def set(self, key: str, value: Any):
+    async def get_many(self, *keys: str) -> list[Any]:
+        pass
+
+    @abstractmethod
+    async def set_many(self, *items: tuple[str, Any, CachePolicy]) -> list[str]:
+        pass
+
+    @abstractmethod
+    async def replace(self, key: str, value: Any, policy: CachePolicy | None = None) -> None:
         pass
 
     @abstractmethod
     async def delete(self, key: str):
         pass
 
+    @abstractmethod
+    async def find_keys(self, pattern: str) -> list[str]:
+        pass
+
+    @abstractmethod
+    async def del_by_pattens(self, *patterns: str):
+        pass
+
+    @abstractmethod
+    async def get_generations(self, *namespaces: str) -> list[int]:
+        pass
+
+    @abstractmethod
+    async def invalidate(self, *keys: str):
+        pass
+
+    @contextlib.asynccontextmanager
+    async def lock(self, key: str) -> AsyncIterator[None]:
+        """Lock loading of the value by key between processes"""
+        yield
+
+    async def claim(self, *keys: str) -> list[str]:
+        """Claim keys once between processes, only claimed keys are returned"""
+        return list(keys)
+
+    async def set_list_item(self, key: str, item: BaseIdSchema, policy: CachePolicy | None = None) -> None:
+        """Add or replace the item in the cached list by key, missing lists are left for loading"""
+        items: Any = await self.get(key)
+        if isinstance(items, list):
+            await self.replace(key, add_item(items, item), policy=policy)
+        elif items is not None:
+            await self.invalidate(key)
+
+    async def delete_list_item(self, key: str, item_id: UUID, policy: CachePolicy | None = None) -> None:
+        """Delete the item by ID from the cached list by key"""
+        items: Any = await self.get(key)
+        if isinstance(items, list):
+            await self.replace(key, remove_item(items, item_id), policy=policy)
+        elif items is not None:
+            await self.invalidate(key)
+
+    async def startup(self) -> None:
+        """Run background work of the cache service"""
+        pass
+
+    async def shutdown(self) -> None:
+        """Stop background work of the cache service"""
+        pass
+
+    @staticmethod
+    def namespace_key(entity: str, obj_id: UUID | str) -> str:
+        """Generate a key of the generation counter for the entity's namespace"""
+        return f'{constants.CACHE_NAMESPACE_PREFIX}{entity}_{obj_id}'
+
+    @staticmethod
+    def is_namespace_key(key: str) -> bool:
+        return key.startswith(constants.CACHE_NAMESPACE_PREFIX)
+
+    @staticmethod
+    def is_list_key(key: str) -> bool:
+        return key.endswith(f'_{constants.LIST}')
+
+    @staticmethod
+    def response_key(key: str) -> str:
+        """Generate a key of the rendered response of the value by key"""
+        return f'{key}{constants.CACHE_RESPONSE_SUFFIX}'
+
 
 CacheServiceType = TypeVar('CacheServiceType', bound=BaseCacheService)
 
 
+def add_item(items: list[BaseIdSchema], obj: BaseIdSchema) -> list[BaseIdSchema]:
+    """Insert the object to the cached list ordered by IDs if it is not there"""
+    if any(item.id == obj.id for item in items):
+        return replace_item(items, obj)
+    return sorted([*items, obj], key=lambda item: item.id)
+
+
+def replace_item(items: list[BaseIdSchema], obj: BaseIdSchema) -> list[BaseIdSchema]:
+    """Replace the object with the same ID in the cached list"""
+    return [obj if item.id == obj.id else item for item in items]
+
+
+def remove_item(items: list[BaseIdSchema], obj_id: UUID) -> list[BaseIdSchema]:
+    """Remove the object by ID from the cached list"""
+    return [item for item in items if item.id != obj_id]
+
+
+def change_counts(**deltas: int) -> Callable[[APISchema], APISchema]:
+    """Make a patch of the cached object changing its count fields by deltas"""
+    return lambda obj: obj.model_copy(update={field: getattr(obj, field) + delta for field, delta in deltas.items()})
+
+
+def update_fields(data: APISchema) -> Callable[[APISchema], APISchema]:
+    """Make a patch of the cached object setting fields of data"""
+    return lambda obj: obj.model_copy(update=data.model_dump())
+
+
+@functools.lru_cache
+def response_adapter(response_type: Any) -> TypeAdapter:
+    return TypeAdapter(response_type)
+
+
+def make_etag(body: bytes) -> str:
+    """Make a strong ETag of the body of the response"""
+    return hashlib.blake2b(body, digest_size=constants.ETAG_DIGEST_SIZE).hexdigest()
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Check the ETag against values of If-None-Match header"""
+    for value in if_none_match.split(','):
+        value = value.strip().removeprefix('W/').strip('"')
+        if value in ('*', etag):
+            return True
+    return False
+
+
+def response_headers(
+    etag: str | None,
+    encoding: str = encodings.IDENTITY,
+    vary: bool = False,
+    extra_headers: dict[str, str] | None = None,
+) -> dict[str, str]:
+    """Make headers of the response with Cache-Control and ETag of the body.
+
+    Compressed bodies are returned with Content-Encoding, their ETags differ by encoding.
+    """
+    headers: dict[str, str] = dict(extra_headers or {})
+    if settings.HTTP_CACHE_CONTROL:
+        headers['Cache-Control'] = settings.HTTP_CACHE_CONTROL
+    if vary:
+        headers['Vary'] = 'Accept-Encoding'
+    if encoding != encodings.IDENTITY:
+        headers['Content-Encoding'] = encoding
+        etag = etag and f'{etag}-{encoding}'
+    if settings.HTTP_ETAG_ENABLED and etag is not None:
+        headers['ETag'] = f'"{etag}"'
+    return headers
+
+
+def not_modified(headers: dict[str, str], if_none_match: str | None) -> Response | None:
+    """Make 304 Not Modified with headers of the response if the client has the body with its ETag"""
+    etag: str | None = headers.get('ETag')
+    if etag is None or if_none_match is None or not etag_matches(if_none_match, etag.strip('"')):
+        return None
+    return Response(status_code=304, headers=headers)
+
+
+def make_response(
+    body: bytes,
+    etag: str,
+    if_none_match: str | None = None,
+    encoding: str = encodings.IDENTITY,
+    vary: bool = False,
+    extra_headers: dict[str, str] | None = None,
+) -> Response:
+    """Make the JSON response of the rendered body or 304 Not Modified if the client has the body with the same ETag"""
+    headers: dict[str, str] = response_headers(etag, encoding=encoding, vary=vary, extra_headers=extra_headers)
+    return not_modified(headers, if_none_match) or Response(
+        content=body, media_type='application/json', headers=headers
+    )
+
+
+def render(
+    value: Any,
+    etag: str | None,
+    if_none_match: str | None = None,
+    response: Response | None = None,
+    headers: dict[str, str] | None = None,
+) -> Any:
+    """Return the value rendered by the response model of the endpoint with ETag and headers set to the response.
+
+    The ETag is made from the version of the value, not from its body,
+    so 304 Not Modified is returned without rendering.
+    """
+    if not settings.HTTP_ETAG_ENABLED and not headers:
+        return value
+    headers = response_headers(etag, extra_headers=headers)
+    not_modified_response: Response | None = not_modified(headers, if_none_match)
+    if not_modified_response is not None:
+        return not_modified_response
+    if response is not None:
+        response.headers.update(headers)
+    return value
+
+
 class BaseObjectService(Generic[RepositoryType]):
+    # entity of cached reads of the service, see `core.services.cached`
+    entity: str
+
     def __init__(self, repository: RepositoryType):
         self.repository: RepositoryType = repository
+        self.single_flight: SingleFlight = SingleFlight()
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[AsyncSession], Awaitable[Any]],
+        policy: CachePolicy | None = None,
+    ) -> Any:
+        """Get value from cache or load it from database.
+
+        Concurrent misses of the key in the process wait for a single loading in its own session,
+        so the loading outlives the request which started it.
+        A stale value is returned immediately and refreshed in background.
+        """
+        value: Any = await services.cache_service.get(
+            key, refresh=functools.partial(self.refresh, key=key, loader=loader, policy=policy)
+        )
+        if value is None:
+            value = await self.single_flight.do(
+                key, functools.partial(self.load_in_session, key=key, loader=loader, policy=policy)
+            )
+        if isinstance(value, schemas.NotFoundSchema):
+            raise HTTPException(status_code=404, detail=value.detail)
+        return value
+
+    async def get_or_render(
+        self,
+        key: str,
+        loader: Callable[[AsyncSession], Awaitable[Any]],
+        response_type: Any,
+        policy: CachePolicy | None = None,
+        if_none_match: str | None = None,
+        accept_encoding: str | None = None,
+        make_headers: Callable[[Any], dict[str, str]] | None = None,
+        response: Response | None = None,
+    ) -> Any:
+        """Get the cached JSON body of the response and return it without validation.
+
+        On miss the value is got from cache or database, rendered by the type of the response
+        and compressed by configured encodings once. Bodies of all encodings are cached in a single entry
+        with the ETag and headers made from the value, so the body acceptable by the client is returned as is.
+        Without caching of responses only the ETag is cached in the entry, it is compared before the value is got,
+        and the value is rendered by the response model of the endpoint.
+        A stale entry is returned as is, and the value is refreshed in background, which drops the entry.
+        """
+        if not settings.CACHE_RESPONSE_BYTES:
+            return await self.get_or_revalidate(
+                key=key,
+                loader=loader,
+                response_type=response_type,
+                policy=policy,
+                if_none_match=if_none_match,
+                make_headers=make_headers,
+                response=response,
+            )
+
+        response_key: str = services.cache_service.response_key(key)
+        data: bytes | None = await services.cache_service.get(
+            response_key, refresh=functools.partial(self.refresh, key=key, loader=loader, policy=policy)
+        )
+        etag, variants, headers = encodings.unpack(data) if data is not None else ('', {}, {})
+        # entries without bodies keep only ETags of values
+        if not variants:
+            fence: list[int] = await self.read_fence()
+            value: Any = await self.get_or_load(key=key, loader=loader, policy=policy)
+            body: bytes = response_adapter(response_type).dump_json(value)
+            etag, variants = make_etag(body), encodings.make_variants(body)
+            headers = make_headers(value) if make_headers else {}
+            await self.set_fenced(
+                response_key, encodings.pack(etag, variants, headers=headers), fence, policy=policy
+            )
+        available: list[str] = encodings.get_encodings()
+        encoding, body = encodings.select_variant(variants, encodings.choose_encoding(accept_encoding, available))
+        return make_response(
+            body, etag, if_none_match=if_none_match, encoding=encoding, vary=bool(available), extra_headers=headers
+        )
+
+    async def get_or_revalidate(
+        self,
+        key: str,
+        loader: Callable[[AsyncSession], Awaitable[Any]],
+        response_type: Any,
+        policy: CachePolicy | None = None,
+        if_none_match: str | None = None,
+        make_headers: Callable[[Any], dict[str, str]] | None = None,
+        response: Response | None = None,
+    ) -> Any:
+        """Get the value from cache or database with the ETag cached apart from it.
+
+        The ETag is compared before the value is got, so 304 Not Modified is returned without loading and rendering.
+        On miss of the ETag the value is rendered once to make it.
+        """
+        if not settings.HTTP_ETAG_ENABLED:
+            value: Any = await self.get_or_load(key=key, loader=loader, policy=policy)
+            return render(value, None, response=response, headers=make_headers and make_headers(value))
+
+        response_key: str = services.cache_service.response_key(key)
+        data: bytes | None = await services.cache_service.get(
+            response_key, refresh=functools.partial(self.refresh, key=key, loader=loader, policy=policy)
+        )
+        etag: str | None = None if data is None else encodings.unpack_etag(data)
+        if etag is not None:
+            not_modified_response: Response | None = not_modified(response_headers(etag), if_none_match)
+            if not_modified_response is not None:
+                return not_modified_response
+        fence: list[int] = await self.read_fence()
+        value = await self.get_or_load(key=key, loader=loader, policy=policy)
+        if etag is None:
+            etag = make_etag(response_adapter(response_type).dump_json(value))
+            await self.set_fenced(response_key, encodings.pack(etag, {}), fence, policy=policy)
+        return render(value, etag, if_none_match, response=response, headers=make_headers and make_headers(value))
+
+    async def load_in_session(
+        self,
+        key: str,
+        loader: Callable[[AsyncSession], Awaitable[Any]],
+        policy: CachePolicy | None = None,
+    ) -> Any:
+        """Load value from database in its own session and set it to cache"""
+        async with session_generator() as db:
+            return await self.load(db=db, key=key, loader=loader, policy=policy)
+
+    async def load(
+        self,
+        db: AsyncSession,
+        key: str,
+        loader: Callable[[AsyncSession], Awaitable[Any]],
+        policy: CachePolicy | None = None,
+    ) -> Any:
+        """Load value from database and set it to cache.
+
+        With distributed lock concurrent misses of the key in other processes wait for the value in cache.
+        """
+        if not settings.CACHE_DISTRIBUTED_LOCK:
+            return await self.fetch(db=db, key=key, loader=loader, policy=policy)
+
+        async with services.cache_service.lock(key):
+            value: Any = await services.cache_service.get(key)
+            if value is None:
+                value = await self.fetch(db=db, key=key, loader=loader, policy=policy)
+        return value
+
+    async def fetch(
+        self,
+        db: AsyncSession,
+        key: str,
+        loader: Callable[[AsyncSession], Awaitable[Any]],
+        policy: CachePolicy | None = None,
+    ) -> Any:
+        """Load value from database and set it to cache.
+
+        Not found objects are cached for a short lifetime, create operations clear them.
+        """
+        fence: list[int] = await self.read_fence()
+        try:
+            value: Any = await loader(db)
+        except HTTPException as e:
+            if e.status_code != 404 or not settings.CACHE_NOT_FOUND_LIFETIME:
+                raise
+            value = schemas.NotFoundSchema(detail=e.detail)
+            await self.set_fenced(key, value, fence, policy=not_found_policy())
+            return value
+        await self.set_fenced(key, value, fence, policy=policy)
+        return value
+
+    @staticmethod
+    async def read_fence() -> list[int]:
+        """Read the generation of the namespace of writes in write-through mode"""
+        if not settings.CACHE_WRITE_THROUGH:
+            return []
+        return await services.cache_service.get_generations(get_writes_namespace())
+
+    async def set_fenced(self, key: str, value: Any, fence: list[int], policy: CachePolicy | None = None) -> None:
+        """Set the value loaded after the fence was read and drop it if a write-through write ran since then.
+
+        Writes bump the namespace of writes before they patch cached values, so either the write patches
+        the value set before the bump, or the value loaded before the write is dropped.
+        """
+        await services.cache_service.set(key, value, policy=policy)
+        if fence and await self.read_fence() != fence:
+            await services.cache_service.invalidate(key)
+
+    @staticmethod
+    async def fence_writes() -> None:
+        """Bump the namespace of writes before cached values are patched by a write-through write"""
+        await services.cache_service.invalidate(get_writes_namespace())
+
+    async def clearing_cache_patterns(self, operation: str, **ids: UUID | None) -> list[str]:
+        """Generate keys to invalidate by operation type (create, update, delete) and IDs of the entity"""
+        return await invalidation_keys(self.entity, operation, **ids)
+
+    async def write_list_item(
+        self, keys: list[str], operation: str, obj: BaseIdSchema | None, **ids: UUID | None
+    ) -> list[str]:
+        """Write the changed object to its cached list instead of invalidating the list with the hash layout.
+
+        Return keys which still have to be invalidated.
+        """
+        if settings.CACHE_LIST_LAYOUT != 'hash':
+            return keys
+        list_key: str = await generate_entity_key(self.entity, many=True, **ids)
+        obj_id: UUID | None = ids.get(f'{self.entity}_id')
+        if list_key not in keys:
+            return keys
+        if operation == constants.DELETE and obj_id is not None:
+            await services.cache_service.delete_list_item(list_key, obj_id)
+        elif operation in (constants.CREATE, constants.UPDATE) and obj is not None:
+            await services.cache_service.set_list_item(list_key, obj, policy=get_policy(self.entity, many=True))
+        else:
+            return keys
+        return [key for key in keys if key != list_key]
+
+    async def record_invalidation(self, db: AsyncSession, **kwargs: Any) -> None:
+        """Record keys to invalidate by operation to the outbox, they are committed with the following changes.
+
+        IDs of created objects are unknown yet, not found results by random IDs are not cached anyway.
+        """
+        if settings.CACHE_OUTBOX_ENABLED:
+            repositories.cache_outbox.add_keys(db, await self.clearing_cache_patterns(**kwargs))
+
+    async def patch_cache(self, key: str, patch: Callable[[Any], Any], policy: CachePolicy | None = None) -> None:
+        """Patch the cached value by key in place.
+
+        Missing values are left for loading, cached not found results are invalidated.
+        Writes are not locked: if another write bumped the namespace of writes meanwhile, the patch could be lost,
+        so the value is invalidated with the namespace, and concurrent patches and loads are dropped too.
+        """
+        fence: list[int] = await self.read_fence()
+        value: Any = await services.cache_service.get(key)
+        if value is None:
+            return
+        if isinstance(value, schemas.NotFoundSchema):
+            await services.cache_service.invalidate(key)
+            return
+        await services.cache_service.replace(key, patch(value), policy=policy)
+        if await self.read_fence() != fence:
+            await services.cache_service.invalidate(get_writes_namespace(), key)
+
+    async def refresh(
+        self, key: str, loader: Callable[[AsyncSession], Awaitable[Any]], policy: CachePolicy | None
+    ) -> None:
+        """Reload the stale value from database in its own session.
+
+        The rendered response of the old value is dropped, so it is rendered again from the new one.
+        """
+        fence: list[int] = await self.read_fence()
+        try:
+            async with session_generator() as db:
+                value: Any = await loader(db)
+        except HTTPException:
+            # the object does not exist anymore
+            await services.cache_service.invalidate(key)
+            return
+        except Exception:
+            logger.exception('Failure to refresh cache by key %s', key)
+            return
+        await self.set_fenced(key, value, fence, policy=policy)
+        await services.cache_service.invalidate(services.cache_service.response_key(key))
@@ -0,0 +1,27 @@
+from core.services.base import BaseCacheService
+from core.services.local_cache import LocalCacheService
+from core.services.memory import MemoryCacheService
+from core.services.redis import redis_service
+from core.services.shared_memory import SharedMemoryCacheService
+from core.settings import settings
+
+cache_service: BaseCacheService = redis_service
+
+if settings.CACHE_BACKEND == 'memory':
+    cache_service = MemoryCacheService(max_size=settings.CACHE_MEMORY_MAX_SIZE)
+elif settings.CACHE_SHARED_ENABLED:
+    cache_service = SharedMemoryCacheService(
+        backend=redis_service,
+        path=settings.CACHE_SHARED_PATH,
+        sets=settings.CACHE_SHARED_SETS,
+        slot_size=settings.CACHE_SHARED_SLOT_SIZE,
+        lifetime=settings.CACHE_SHARED_LIFETIME,
+        channel=settings.CACHE_INVALIDATION_CHANNEL,
+    )
+elif settings.CACHE_LOCAL_ENABLED:
+    cache_service = LocalCacheService(
+        backend=redis_service,
+        max_size=settings.CACHE_LOCAL_MAX_SIZE,
+        lifetime=settings.CACHE_LOCAL_LIFETIME,
+        channel=settings.CACHE_INVALIDATION_CHANNEL,
+    )
@@ -0,0 +1,60 @@
+import random
+from dataclasses import dataclass
+
+from core import constants
+from core.settings import settings
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """Policy of cached values: lifetime with random jitter, stale lifetime and max serialized size.
+
+    Values larger than max size are not cached, 0 disables the limit.
+    Values of the policy without lifetime and stale lifetime are not cached either.
+    """
+
+    lifetime: int
+    jitter: int = 0
+    stale_lifetime: int = 0
+    max_size: int = 0
+
+    def __post_init__(self) -> None:
+        for name in ('lifetime', 'jitter', 'stale_lifetime', 'max_size'):
+            if getattr(self, name) < 0:
+                raise ValueError(f'{name} of the cache policy must not be negative')
+
+    def ttl(self) -> int:
+        """Lifetime with random jitter, so values cached together do not expire together"""
+        return self.lifetime + random.randint(0, self.jitter) if self.jitter else self.lifetime
+
+    def admits(self, size: int) -> bool:
+        """Check that the value of the serialized size may be cached"""
+        return not self.max_size or size <= self.max_size
+
+
+def policy_name(entity: str, many: bool = False) -> str:
+    """Generate a name of the policy by entity and key type like keys of cache"""
+    return f'{entity}_{constants.LIST}' if many else entity
+
+
+def get_policy(entity: str, many: bool = False) -> CachePolicy:
+    """Get the policy of cached values by entity and key type.
+
+    Fields missing in CACHE_POLICIES fall back to the defaults of cache settings.
+    """
+    return CachePolicy(**{
+        'lifetime': settings.CACHE_LIFETIME,
+        'jitter': settings.CACHE_LIFETIME_JITTER,
+        'max_size': settings.CACHE_MAX_VALUE_SIZE,
+        **settings.CACHE_POLICIES.get(policy_name(entity, many=many), {}),
+    })
+
+
+def default_policy() -> CachePolicy:
+    """Get the policy of values cached without their own policy"""
+    return CachePolicy(lifetime=settings.CACHE_LIFETIME)
+
+
+def not_found_policy() -> CachePolicy:
+    """Get the policy of cached not found results"""
+    return CachePolicy(lifetime=settings.CACHE_NOT_FOUND_LIFETIME)
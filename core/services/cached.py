@@ -0,0 +1,164 @@
+import functools
+from typing import Any, Awaitable, Callable, Mapping, Sequence
+from uuid import UUID
+
+from fastapi import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core import constants, services
+from core.services.cache_policy import get_policy
+from core.services.pagination import Page, page_headers
+from core.settings import settings
+
+
+@functools.lru_cache
+def get_parents(entity: str) -> tuple[str, ...]:
+    """Get parents of the entity from the root by `constants.entity_parents`"""
+    parent: str | None = constants.entity_parents[entity]
+    return () if parent is None else (*get_parents(parent), parent)
+
+
+def get_parent_id(parent: str, ids: Mapping[str, UUID | None]) -> UUID:
+    """Get the ID of the parent, keys of children are always generated by IDs of all their parents"""
+    parent_id: UUID | None = ids[f'{parent}_id']
+    if parent_id is None:
+        raise ValueError(f'{parent}_id is required for keys of its children')
+    return parent_id
+
+
+def build_entity_key(
+    entity: str, generations: Sequence[int], ids: Mapping[str, UUID | None], many: bool = False
+) -> str:
+    """Build a key of cache for the entity and a list of entities by known generations of parents' namespaces
+
+    IDs are tags of the value: the key contains IDs of parents with generations of their namespaces,
+    so invalidation of the namespace by tag makes values of all its descendants unreachable.
+    """
+    tags: str = ''.join(
+        f'_{ids[f"{parent}_id"]}.{generation}' for parent, generation in zip(get_parents(entity), generations)
+    )
+    return f'{entity}{tags}_{constants.LIST if many else ids.get(f"{entity}_id")}'
+
+
+def get_namespaces(entity: str, ids: Mapping[str, UUID | None]) -> list[str]:
+    """Get keys of namespaces of parents of the entity"""
+    return [services.cache_service.namespace_key(parent, get_parent_id(parent, ids)) for parent in get_parents(entity)]
+
+
+async def generate_entity_key(entity: str, many: bool = False, **ids: UUID | None) -> str:
+    """Generate a key of cache for the entity and a list of entities with generations of parents' namespaces"""
+    namespaces: list[str] = get_namespaces(entity, ids)
+    generations: list[int] = await services.cache_service.get_generations(*namespaces) if namespaces else []
+    return build_entity_key(entity, generations, ids, many=many)
+
+
+def get_pages_namespace(entity: str, ids: Mapping[str, UUID | None]) -> str:
+    """Get a key of the namespace of pages of the list of entities, every change of the list invalidates it"""
+    parents: tuple[str, ...] = get_parents(entity)
+    return services.cache_service.namespace_key(
+        f'{entity}_{constants.LIST}', get_parent_id(parents[-1], ids) if parents else constants.LIST
+    )
+
+
+def get_writes_namespace() -> str:
+    """Get a key of the namespace bumped by every write-through write, see `BaseObjectService.set_fenced`"""
+    return services.cache_service.namespace_key(constants.CACHE_WRITES_NAMESPACE, constants.LIST)
+
+
+async def generate_page_key(entity: str, page: Page, **ids: UUID | None) -> str:
+    """Generate a key of cache for the page of the list of entities.
+
+    The key of the list is extended by generation of the namespace of its pages and by the page.
+    """
+    generations: list[int] = await services.cache_service.get_generations(
+        *get_namespaces(entity, ids), get_pages_namespace(entity, ids)
+    )
+    return f'{build_entity_key(entity, generations[:-1], ids, many=True)}.{generations[-1]}_{page.key}'
+
+
+async def invalidation_keys(entity: str, operation: str, **ids: UUID | None) -> list[str]:
+    """Derive keys to invalidate by operation type (create, update, delete) from relationship of entities.
+
+    The list with its pages and the object itself are invalidated on every operation,
+    counts of parents on create and delete.
+    Creating of the object clears cached not found results by its ID and of its children,
+    deleting of the object with children invalidates its namespace with all descendants.
+    The fragment of the all_in_one tree is invalidated with the root menu, the whole tree on every operation.
+    """
+    obj_id: UUID | None = ids.get(f'{entity}_id')
+    if operation not in constants.order_operation or (operation != constants.CREATE and obj_id is None):
+        return []
+
+    parents: tuple[str, ...] = get_parents(entity)
+    child: str | None = constants.entity_child[entity]
+    namespaces: list[str] = get_namespaces(entity, ids)
+    if operation == constants.CREATE and obj_id is not None and child is not None:
+        namespaces.append(services.cache_service.namespace_key(entity, obj_id))
+    generations: list[int] = await services.cache_service.get_generations(*namespaces) if namespaces else []
+
+    keys: list[str] = [build_entity_key(entity, generations, ids, many=True), get_pages_namespace(entity, ids)]
+    if obj_id is not None:
+        keys.append(build_entity_key(entity, generations, ids))
+    if operation in (constants.CREATE, constants.DELETE):
+        keys.extend(build_entity_key(parent, generations, ids) for parent in parents)
+    if obj_id is not None and child is not None:
+        if operation == constants.CREATE:
+            keys.append(build_entity_key(child, generations, ids, many=True))
+            keys.append(get_pages_namespace(child, ids))
+        if operation == constants.DELETE:
+            keys.append(services.cache_service.namespace_key(entity, obj_id))
+
+    root_id: UUID | None = ids.get(f'{(*parents, entity)[0]}_id')
+    if root_id is not None:
+        keys.append(services.menus_service.gen_tree_key(menu_id=root_id))
+    if not parents and operation in (constants.CREATE, constants.DELETE):
+        keys.append(services.menus_service.gen_tree_key(many=True))
+    # the rendered whole tree
+    keys.append(services.menus_service.gen_tree_key())
+    return keys
+
+
+def cached(entity: str, response_type: Any, many: bool = False) -> Callable:
+    """Make the cached read of the entity or a list of entities from the loader method of the service.
+
+    The loader takes the session and IDs of the entity and its parents as keyword arguments `<entity>_id`,
+    the loader of a list also takes the page. The key is generated from IDs and the page, the value is cached
+    by the policy of the entity and rendered by the type of the response, compressed by Accept-Encoding
+    of the client, or by the response model of the endpoint with headers set to its response.
+    Invalidation of the value is derived from the entity by `invalidation_keys`.
+    With the loaded read model the value is got from it without cache and database.
+    """
+    def decorator(load: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        @functools.wraps(load)
+        async def wrapper(
+            self,
+            db: AsyncSession,
+            if_none_match: str | None = None,
+            accept_encoding: str | None = None,
+            page: Page = Page(),
+            response: Response | None = None,
+            **ids: UUID,
+        ) -> Any:
+            if settings.READ_MODEL_ENABLED and services.read_model.loaded:
+                return services.read_model.render(
+                    entity, response_type, many=many, if_none_match=if_none_match, page=page, response=response, **ids
+                )
+            if many and page.limit is not None:
+                key: str = await generate_page_key(entity, page, **ids)
+                loader: Callable[..., Awaitable[Any]] = functools.partial(load, self, page=page, **ids)
+            else:
+                key = await generate_entity_key(entity, many=many, **ids)
+                loader = functools.partial(load, self, **ids)
+            # the session is not shared with concurrent loads of the key, they use their own ones
+            return await self.get_or_render(
+                key=key,
+                loader=loader,
+                response_type=response_type,
+                policy=get_policy(entity, many=many),
+                if_none_match=if_none_match,
+                accept_encoding=accept_encoding,
+                make_headers=functools.partial(page_headers, page=page) if many else None,
+                response=response,
+            )
+        return wrapper
+    return decorator
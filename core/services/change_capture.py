@@ -0,0 +1,150 @@
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+from typing import Any
+from uuid import UUID
+
+import asyncpg
+
+from core import constants, repositories, services
+from core.db import session_generator
+from core.services.cached import get_parents, invalidation_keys
+from core.settings import settings
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+class ChangeListener:
+    """Listener of changes of menus captured by triggers in database.
+
+    Triggers notify changes of rows on commit, so cache is invalidated by every change
+    whatever code made it. Bursts of changes, e.g. sync with the source, are coalesced:
+    keys of all changes received within the delay are invalidated at once.
+    Every process receives every change, the shared cache is invalidated by the process
+    which claimed the change first, local caches of others are evicted by its broadcast.
+    """
+
+    def __init__(self, dsn: str, channel: str, delay: float):
+        self.dsn: str = dsn
+        self.channel: str = channel
+        self.delay: float = delay
+        self.queue: asyncio.Queue[str] = asyncio.Queue()
+        self.tasks: list[asyncio.Task] = []
+
+    def receive(self, connection: asyncpg.Connection, pid: int, channel: str, payload: str) -> None:
+        self.queue.put_nowait(payload)
+
+    @staticmethod
+    def parse(payload: str) -> tuple[str, str, dict[str, UUID]] | None:
+        """Parse the change to entity, operation and IDs of the entity and its parents.
+
+        Changes of rows deleted by cascade have no parents, they are covered by the change of the parent.
+        """
+        change: dict[str, Any] = json.loads(payload)
+        entity: str = change['e']
+        values: dict[str, str | None] = {
+            f'{constants.MENU}_id': change['m'],
+            f'{constants.SUBMENU}_id': change['s'],
+            f'{constants.DISH}_id': change['d'],
+        }
+        ids: dict[str, UUID] = {}
+        for name in (*get_parents(entity), entity):
+            value: str | None = values[f'{name}_id']
+            if value is None:
+                return None
+            ids[f'{name}_id'] = UUID(value)
+        return entity, change['o'], ids
+
+    def claim_key(self, payload: str) -> str:
+        """Generate a key to claim the change, payloads are unique by the ID of the transaction"""
+        return f'{self.channel}_{hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()}'
+
+    async def apply(self, payloads: set[str]) -> None:
+        """Invalidate keys of changes claimed by this process and refresh changed menus in the read model"""
+        claim_keys: dict[str, str] = {self.claim_key(payload): payload for payload in payloads}
+        claimed: set[str] = {claim_keys[key] for key in await services.cache_service.claim(*claim_keys)}
+        keys: dict[str, None] = {}
+        menu_ids: set[UUID] = set()
+        for payload in payloads:
+            change: tuple[str, str, dict[str, UUID]] | None = self.parse(payload)
+            if change is None:
+                continue
+            entity, operation, ids = change
+            if payload in claimed:
+                keys.update(dict.fromkeys(await invalidation_keys(entity, operation, **ids)))
+            menu_ids.add(ids[f'{constants.MENU}_id'])
+        await services.cache_service.invalidate(*keys)
+        if menu_ids and settings.READ_MODEL_ENABLED and services.read_model.loaded:
+            await services.read_model.refresh(*menu_ids)
+
+    async def reset(self) -> None:
+        """Invalidate all menus and reload the read model, changes could be lost while there was no listening.
+
+        Namespaces of menus in database and in the cached tree are invalidated with all descendants,
+        values of other menus deleted meanwhile are evicted by their lifetime.
+        """
+        async with session_generator() as db:
+            menu_ids: set[UUID] = set(await repositories.menus.get_all_ids(db=db))
+        cached_ids: list[str] | None = await services.cache_service.get(services.menus_service.gen_tree_key(many=True))
+        menu_ids.update(UUID(menu_id) for menu_id in cached_ids or ())
+        keys: dict[str, None] = dict.fromkeys(await invalidation_keys(constants.MENU, constants.CREATE))
+        for menu_id in menu_ids:
+            keys.update(dict.fromkeys(await invalidation_keys(constants.MENU, constants.DELETE, menu_id=menu_id)))
+        await services.cache_service.invalidate(*keys)
+        if settings.READ_MODEL_ENABLED and services.read_model.loaded:
+            await services.read_model.refresh()
+
+    async def listen(self) -> None:
+        """Listen to changes and reconnect if the connection is lost"""
+        connected: bool = False
+        while True:
+            try:
+                connection: asyncpg.Connection = await asyncpg.connect(self.dsn)
+            except (OSError, asyncpg.PostgresError) as e:
+                logger.warning('Database changes are unavailable: %s', e)
+                await asyncio.sleep(1)
+                continue
+            terminated: asyncio.Event = asyncio.Event()
+            connection.add_termination_listener(lambda _: terminated.set())
+            try:
+                await connection.add_listener(self.channel, self.receive)
+                if connected:
+                    await self.reset()
+                connected = True
+                await terminated.wait()
+                logger.warning('Connection of database changes is lost')
+            finally:
+                await connection.close()
+
+    async def consume(self) -> None:
+        """Apply received changes coalesced within the delay"""
+        while True:
+            payloads: set[str] = {await self.queue.get()}
+            await asyncio.sleep(self.delay)
+            while not self.queue.empty():
+                payloads.add(self.queue.get_nowait())
+            try:
+                await self.apply(payloads)
+            except Exception:
+                logger.exception('Failure to apply %s database changes', len(payloads))
+
+    async def startup(self) -> None:
+        if not settings.CACHE_CHANGE_CAPTURE:
+            return
+        self.tasks = [asyncio.create_task(self.listen()), asyncio.create_task(self.consume())]
+
+    async def shutdown(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self.tasks = []
+
+
+change_listener: ChangeListener = ChangeListener(
+    dsn=settings.SQLALCHEMY_SYNC_DATABASE_URL,
+    channel=constants.CHANGE_CAPTURE_CHANNEL,
+    delay=settings.CACHE_CHANGE_COALESCE_DELAY,
+)
@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import logging
+from uuid import UUID
+
+from core import constants, repositories, services
+from core.db import session_generator
+from core.repositories.menus import MenuRepository
+from core.repositories.submenus import SubmenuRepository
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+class CountersChecker:
+    """Checker of counts of submenus and dishes kept in rows of menus and submenus.
+
+    Counts are kept by triggers, so they differ from actual ones only after changes made with triggers disabled,
+    e.g. a restore of a dump of data only. Repaired counts are committed at once and cached entries are invalidated.
+    """
+
+    def __init__(self, menus: MenuRepository, submenus: SubmenuRepository):
+        self.menus: MenuRepository = menus
+        self.submenus: SubmenuRepository = submenus
+
+    async def check(self) -> dict[str, list[tuple]]:
+        """Get IDs of menus and submenus with kept and actual counts which differ"""
+        async with session_generator() as db:
+            return {
+                constants.MENU: list(await self.menus.get_count_mismatches(db)),
+                constants.SUBMENU: list(await self.submenus.get_count_mismatches(db)),
+            }
+
+    async def repair(self) -> dict[str, list[UUID]]:
+        """Set counts to actual ones and return IDs of repaired menus and submenus"""
+        async with session_generator() as db:
+            await self.menus.lock_counted(db)
+            submenus: list[tuple[UUID, UUID]] = list(await self.submenus.repair_counts(db))
+            menu_ids: list[UUID] = list(await self.menus.repair_counts(db))
+            await db.commit()
+
+        keys: dict[str, None] = {}
+        for menu_id in menu_ids:
+            keys.update(dict.fromkeys(
+                await services.menus_service.clearing_cache_patterns(constants.UPDATE, menu_id=menu_id)
+            ))
+        for submenu_id, menu_id in submenus:
+            keys.update(dict.fromkeys(
+                await services.submenus_service.clearing_cache_patterns(
+                    constants.UPDATE, menu_id=menu_id, submenu_id=submenu_id
+                )
+            ))
+        await services.cache_service.invalidate(*keys)
+        if menu_ids or submenus:
+            logger.warning('Repaired counts of %s menus and %s submenus', len(menu_ids), len(submenus))
+        return {constants.MENU: menu_ids, constants.SUBMENU: [submenu_id for submenu_id, _ in submenus]}
+
+
+counters_checker: CountersChecker = CountersChecker(menus=repositories.menus, submenus=repositories.submenus)
+
+
+async def main(repair: bool) -> int:
+    mismatches: dict[str, list[tuple]] = await counters_checker.check()
+    for entity, rows in mismatches.items():
+        for obj_id, *counts in rows:
+            half: int = len(counts) // 2
+            print(f'{entity} {obj_id}: kept {counts[:half]}, actual {counts[half:]}')
+    if not any(mismatches.values()):
+        print('Counts are consistent')
+        return 0
+    if not repair:
+        return 1
+    repaired: dict[str, list[UUID]] = await counters_checker.repair()
+    print(f'Repaired counts of {len(repaired[constants.MENU])} menus and {len(repaired[constants.SUBMENU])} submenus')
+    return 0
+
+
+if __name__ == '__main__':
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description='Check counts of submenus and dishes kept in menus and submenus'
+    )
+    parser.add_argument('--repair', action='store_true', help='set counts which differ to actual ones')
+    raise SystemExit(asyncio.run(main(repair=parser.parse_args().repair)))
@@ -1,63 +1,92 @@
+import functools
+from decimal import Decimal
 from uuid import UUID
 
 from fastapi import BackgroundTasks, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core import constants, models, repositories, schemas, services
-from core.services.base import BaseObjectService
+from core.services.base import (
+    BaseObjectService,
+    add_item,
+    change_counts,
+    remove_item,
+    replace_item,
+)
+from core.services.cache_policy import CachePolicy, get_policy
+from core.services.cached import (
+    build_entity_key,
+    cached,
+    generate_entity_key,
+    get_pages_namespace,
+)
+from core.services.pagination import Page
+from core.settings import settings
 
 
 class DishesService(BaseObjectService):
     """Service for dishes data."""
+    entity: str = constants.DISH
+
+    async def gen_key(self, menu_id: UUID, submenu_id: UUID, dish_id: UUID | None = None, many=False) -> str:
+        """Generate a key of cache for dish and a list of dishes
+
+        The key contains generations of the menu's and the submenu's namespaces.
+        """
+        return await generate_entity_key(
+            self.entity, many=many, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id
+        )
+
     @staticmethod
-    def gen_key(menu_id: UUID, submenu_id: UUID | str = '*', dish_id: UUID | str = '*', many=False) -> str:
-        """Generate a key of cache for submenu and a list of submenus"""
-        return f'dish_{menu_id}_{submenu_id}_{"list" if many else dish_id}'
+    def build_key(
+        menu_id: UUID,
+        menu_generation: int,
+        submenu_id: UUID,
+        submenu_generation: int,
+        dish_id: UUID | None = None,
+        many=False,
+    ) -> str:
+        """Build a key of cache for dish and a list of dishes by known generations"""
+        return build_entity_key(
+            constants.DISH,
+            (menu_generation, submenu_generation),
+            {'menu_id': menu_id, 'submenu_id': submenu_id, 'dish_id': dish_id},
+            many=many,
+        )
 
+    @cached(constants.DISH, response_type=list[schemas.ResponseDishSchema], many=True)
     async def get_dish_list(
-        self, db: AsyncSession, menu_id: UUID, submenu_id: UUID
+        self, db: AsyncSession, menu_id: UUID, submenu_id: UUID, page: Page = Page()
     ) -> list[schemas.ResponseDishSchema]:
-        """Get a list of dishes in submenu by IDs of menu and submenu."""
+        """Get a list or a page of dishes in submenu by IDs of menu and submenu ordered by IDs."""
         # Postman tests expect empty list in non-existent submenu...
         # await services.submenus_service.get_submenu_by_id_or_404(db=db, menu_id=menu_id, submenu_id=submenu_id)
-        cache_list_key: str = self.gen_key(menu_id=menu_id, submenu_id=submenu_id, many=True)
-        cache_dish_list: list[schemas.ResponseDishSchema] = await services.redis_service.get(cache_list_key)
-        if cache_dish_list is not None:
-            return cache_dish_list
-
         dish_list: list[models.DishDBModel] = await self.repository.get_dish_list_by_submenu_id(
-            db=db, submenu_id=submenu_id
+            db=db, submenu_id=submenu_id, after=page.after, limit=page.limit
         )
-        response_dish_list: list[schemas.ResponseDishSchema] = [
-            self.to_schema_with_discount(dish) for dish in dish_list
-        ]
-        await services.redis_service.set(cache_list_key, response_dish_list)
-
-        return response_dish_list
+        return [self.to_schema_with_discount(dish) for dish in dish_list]
 
+    @cached(constants.DISH, response_type=schemas.ResponseDishSchema)
     async def get_dish(
         self, db: AsyncSession, menu_id: UUID, submenu_id: UUID, dish_id: UUID
     ) -> schemas.ResponseDishSchema:
         """Get dish data by IDs of dish, menu and submenu."""
-        cache_key: str = self.gen_key(menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id)
-        cache_dish: schemas.ResponseDishSchema = await services.redis_service.get(cache_key)
-
-        if cache_dish is not None:
-            return cache_dish
-
         dish: models.DishDBModel = await self.get_dish_by_id_or_404(
             db=db, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id
         )
-        response_dish: schemas.ResponseDishSchema = self.to_schema_with_discount(dish)
-        await services.redis_service.set(cache_key, response_dish)
-        return response_dish
+        return self.to_schema_with_discount(dish)
 
     def to_schema_with_discount(self, dish: models.DishDBModel) -> schemas.ResponseDishSchema:
         """Apply discount if it exists"""
         if dish.discount is not None:
-            dish.price = round(dish.price * (1 - dish.discount.value / 100), 2)
+            dish.price = self.apply_discount(dish.price, dish.discount.value)
         return schemas.ResponseDishSchema(**dish.to_dict())
 
+    @staticmethod
+    def apply_discount(price: Decimal, discount: Decimal) -> Decimal:
+        """Calculate price of dish with discount in percent"""
+        return round(price * (1 - discount / 100), 2)
+
     async def get_dish_by_id_or_404(
         self, db: AsyncSession, menu_id: UUID, submenu_id: UUID, dish_id: UUID
     ) -> models.DishDBModel:
@@ -75,20 +104,32 @@ class DishesService(BaseObjectService):
         self, db: AsyncSession, menu_id: UUID, submenu_id: UUID, data: schemas.DishSchema, bgtask: BackgroundTasks
     ) -> schemas.ResponseDishSchema:
         """Create dish in menu's submenu."""
-        await services.submenus_service.get_submenu_by_id_or_404(db=db, menu_id=menu_id, submenu_id=submenu_id)
         obj_in: schemas.DishWithSubmenuIdSchema = schemas.DishWithSubmenuIdSchema(
             **data.model_dump(), submenu_id=submenu_id
         )
-        dish: models.DishDBModel = await self.repository.create(db=db, obj_in=obj_in)
+        await self.record_invalidation(
+            db, operation=constants.CREATE, menu_id=menu_id, submenu_id=submenu_id, dish_id=None
+        )
+        dish: models.DishDBModel | None = await self.repository.create_in_submenu(
+            db=db, obj_in=obj_in, menu_id=menu_id, submenu_id=submenu_id
+        )
+
+        if dish is None:
+            raise HTTPException(status_code=404, detail='submenu not found')
+
+        await db.commit()
+        created_dish: schemas.ResponseDishSchema = schemas.ResponseDishSchema(**dish.to_dict())
 
         bgtask.add_task(
             self.clearing_cache_process,
             operation=constants.CREATE,
             menu_id=menu_id,
             submenu_id=submenu_id,
+            dish_id=dish.id,
+            dish=created_dish,
         )
 
-        return schemas.ResponseDishSchema(**dish.to_dict())
+        return created_dish
 
     async def update_dish(
         self,
@@ -100,29 +141,45 @@ class DishesService(BaseObjectService):
         bgtask: BackgroundTasks
     ) -> schemas.ResponseDishSchema:
         """Update dish data."""
-        dish: models.DishDBModel = await self.get_dish_by_id_or_404(
-            db=db, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id
+        await self.record_invalidation(
+            db, operation=constants.UPDATE, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id
+        )
+        updated: tuple[models.DishDBModel, Decimal | None] | None = await self.repository.update_dish(
+            db=db, dish_id=dish_id, submenu_id=submenu_id, obj_in=data
         )
-        updated_dish: models.DishDBModel = await self.repository.update(db=db, db_obj=dish, obj_in=data)
+
+        if updated is None:
+            raise HTTPException(status_code=404, detail='dish not found')
+
+        await db.commit()
+        updated_dish, discount = updated
+        response_dish: schemas.ResponseDishSchema = schemas.ResponseDishSchema(**updated_dish.to_dict())
 
         bgtask.add_task(
             self.clearing_cache_process,
             operation=constants.UPDATE,
             menu_id=menu_id,
             submenu_id=submenu_id,
-            dish_id=dish_id
+            dish_id=dish_id,
+            dish=response_dish if discount is None else response_dish.model_copy(
+                update={'price': self.apply_discount(response_dish.price, discount)}
+            ),
         )
 
-        return schemas.ResponseDishSchema(**updated_dish.to_dict())
+        return response_dish
 
     async def delete_dish(
             self, db: AsyncSession, menu_id: UUID, submenu_id: UUID, dish_id: UUID, bgtask: BackgroundTasks
     ) -> None:
         """Delete dish."""
+        await self.record_invalidation(
+            db, operation=constants.DELETE, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id
+        )
 
-        await self.get_dish_by_id_or_404(db=db, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id)
+        if not await self.repository.delete_by_id(db=db, obj_id=dish_id, fields={'submenu_id': submenu_id}):
+            raise HTTPException(status_code=404, detail='dish not found')
 
-        await self.repository.delete_by_id(db=db, obj_id=dish_id)
+        await db.commit()
 
         bgtask.add_task(
             self.clearing_cache_process,
@@ -133,43 +190,100 @@ class DishesService(BaseObjectService):
         )
 
     async def clearing_cache_process(
-            self, operation: str, menu_id: UUID, submenu_id: UUID, dish_id: UUID | None = None
+            self,
+            operation: str,
+            menu_id: UUID,
+            submenu_id: UUID,
+            dish_id: UUID | None = None,
+            dish: schemas.ResponseDishSchema | None = None,
     ) -> None:
-        """Clear cache after create, update, delete."""
-        patterns: list[str] = await self.clearing_cache_patterns(
+        """Clear cache after create, update, delete.
+
+        With the hash layout of lists the written object is set to its cached list.
+        In write-through mode cached entries are updated by the written dish instead.
+        With the outbox keys are recorded with the changes, so the outbox is drained.
+        The read model refreshes the subtree of the menu.
+        With change capture all of it is done by the listener of database changes.
+        """
+        if settings.CACHE_CHANGE_CAPTURE:
+            return
+        await services.read_model.notify(menu_id)
+        if settings.CACHE_OUTBOX_ENABLED:
+            await services.outbox_dispatcher.dispatch()
+            return
+        if settings.CACHE_WRITE_THROUGH:
+            keys: list[str] = [
+                *await self.write_through(
+                    operation=operation, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id, dish=dish
+                ),
+                get_pages_namespace(self.entity, {'submenu_id': submenu_id}),
+            ]
+        else:
+            keys = await self.write_list_item(
+                await self.clearing_cache_patterns(
+                    operation=operation, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id
+                ),
+                operation,
+                dish,
+                menu_id=menu_id,
+                submenu_id=submenu_id,
+                dish_id=dish_id,
+            )
+        await services.cache_service.invalidate(*keys)
+
+    async def write_through(
+        self,
+        operation: str,
+        menu_id: UUID,
+        submenu_id: UUID,
+        dish_id: UUID | None,
+        dish: schemas.ResponseDishSchema | None,
+    ) -> list[str]:
+        """Write the dish with discount to cached entries and return keys which still have to be invalidated
+
+        Counts of the submenu and the menu are changed only when dishes of the submenu change.
+        """
+        await self.fence_writes()
+        list_key: str = await self.gen_key(menu_id=menu_id, submenu_id=submenu_id, many=True)
+        # the fragment of the menu and the whole rendered tree
+        tree_keys: list[str] = [
+            services.menus_service.gen_tree_key(menu_id=menu_id), services.menus_service.gen_tree_key()
+        ]
+        list_policy: CachePolicy = get_policy(constants.DISH, many=True)
+
+        if operation in (constants.CREATE, constants.UPDATE) and dish is not None:
+            await services.cache_service.replace(
+                await self.gen_key(menu_id=menu_id, submenu_id=submenu_id, dish_id=dish.id),
+                dish,
+                policy=get_policy(constants.DISH),
+            )
+            patch = add_item if operation == constants.CREATE else replace_item
+            await self.patch_cache(list_key, functools.partial(patch, obj=dish), list_policy)
+            if operation == constants.CREATE:
+                await self.change_parents_counts(menu_id=menu_id, submenu_id=submenu_id, delta=1)
+            return tree_keys
+
+        if operation == constants.DELETE and dish_id is not None:
+            await self.patch_cache(list_key, functools.partial(remove_item, obj_id=dish_id), list_policy)
+            await self.change_parents_counts(menu_id=menu_id, submenu_id=submenu_id, delta=-1)
+            return [await self.gen_key(menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id), *tree_keys]
+
+        return await self.clearing_cache_patterns(
             operation=operation, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id
         )
-        await services.redis_service.del_by_pattens(*patterns)
-
-    async def clearing_cache_patterns(
-            self, operation: str, menu_id: UUID, submenu_id: UUID, dish_id: UUID | None
-    ) -> list[str]:
-        """Generate patterns for key by operation type (create, update, delete)"""
-        if operation == constants.CREATE:
-            return [
-                self.gen_key(menu_id=menu_id, submenu_id=submenu_id, many=True),
-                services.submenus_service.gen_key(menu_id=menu_id, submenu_id=submenu_id),
-                services.menus_service.gen_key(menu_id=menu_id),
-            ]
-
-        if dish_id is None:
-            return []
 
-        if operation == constants.UPDATE:
-            return [
-                self.gen_key(menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id),
-                self.gen_key(menu_id=menu_id, submenu_id=submenu_id, many=True),
-            ]
-
-        if operation == constants.DELETE:
-            return [
-                self.gen_key(menu_id=menu_id, submenu_id=submenu_id, many=True),
-                services.submenus_service.gen_key(menu_id=menu_id, submenu_id=submenu_id),
-                services.menus_service.gen_key(menu_id=menu_id),
-                self.gen_key(menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id)
-            ]
-
-        return []
+    async def change_parents_counts(self, menu_id: UUID, submenu_id: UUID, delta: int) -> None:
+        """Change counts of dishes in cached submenu and menu"""
+        await self.patch_cache(
+            await services.submenus_service.gen_key(menu_id=menu_id, submenu_id=submenu_id),
+            change_counts(dishes_count=delta),
+            get_policy(constants.SUBMENU),
+        )
+        await self.patch_cache(
+            services.menus_service.gen_key(menu_id=menu_id),
+            change_counts(dishes_count=delta),
+            get_policy(constants.MENU),
+        )
 
 
 dishes_service = DishesService(repositories.dishes)
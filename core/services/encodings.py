@@ -0,0 +1,113 @@
+import gzip
+import struct
+from typing import Callable
+
+from core import constants
+from core.settings import settings
+
+try:
+    import brotli  # type: ignore[import]
+except ImportError:
+    # brotli is optional, only gzip is available without it
+    brotli = None
+
+IDENTITY: str = 'identity'
+
+compressors: dict[str, Callable[[bytes], bytes]] = {
+    'gzip': lambda body: gzip.compress(body, compresslevel=9, mtime=0),
+}
+decompressors: dict[str, Callable[[bytes], bytes]] = {
+    'gzip': gzip.decompress,
+}
+if brotli is not None:
+    compressors['br'] = lambda body: brotli.compress(body, quality=9)
+    decompressors['br'] = brotli.decompress
+
+# length of the name of encoding and length of the body of the variant
+variant_header: struct.Struct = struct.Struct('>BI')
+# headers of the response are packed as variants by their names with the prefix
+HEADER_PREFIX: str = ':'
+
+
+def get_encodings() -> list[str]:
+    """Get available encodings of cached responses in order of preference"""
+    return [encoding for encoding in settings.CACHE_RESPONSE_ENCODINGS if encoding in compressors]
+
+
+def choose_encoding(accept_encoding: str | None, encodings: list[str]) -> str:
+    """Choose the most preferred encoding acceptable by Accept-Encoding header of the client"""
+    if not accept_encoding or not encodings:
+        return IDENTITY
+    accepted: dict[str, float] = {}
+    for value in accept_encoding.split(','):
+        name, _, params = value.strip().partition(';')
+        quality: float = 1
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0
+        accepted[name.strip().lower()] = quality
+    for encoding in encodings:
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return IDENTITY
+
+
+def make_variants(body: bytes) -> dict[str, bytes]:
+    """Compress the body by available encodings once per filling of cache.
+
+    Small bodies are kept as is. The body as is is kept alongside compressed ones unless it is disabled,
+    then it is decompressed for clients without compression.
+    """
+    encodings: list[str] = get_encodings()
+    if not encodings or len(body) < settings.CACHE_RESPONSE_COMPRESS_MIN_SIZE:
+        return {IDENTITY: body}
+    variants: dict[str, bytes] = {encoding: compressors[encoding](body) for encoding in encodings}
+    if settings.CACHE_RESPONSE_KEEP_IDENTITY:
+        variants[IDENTITY] = body
+    return variants
+
+
+def pack(etag: str, variants: dict[str, bytes], headers: dict[str, str] | None = None) -> bytes:
+    """Pack the ETag of the body, its variants by encodings and headers of the response into a single cached entry"""
+    items: dict[str, bytes] = {
+        **variants, **{f'{HEADER_PREFIX}{name}': value.encode() for name, value in (headers or {}).items()}
+    }
+    return etag.encode() + b''.join(
+        variant_header.pack(len(name.encode()), len(body)) + name.encode() + body for name, body in items.items()
+    )
+
+
+def unpack(data: bytes) -> tuple[str, dict[str, bytes], dict[str, str]]:
+    """Unpack the ETag of the body, its variants by encodings and headers of the response from the cached entry"""
+    variants: dict[str, bytes] = {}
+    headers: dict[str, str] = {}
+    offset: int = constants.ETAG_LENGTH
+    while offset < len(data):
+        name_length, length = variant_header.unpack_from(data, offset)
+        offset += variant_header.size
+        name: str = data[offset:offset + name_length].decode()
+        offset += name_length
+        if name.startswith(HEADER_PREFIX):
+            headers[name.removeprefix(HEADER_PREFIX)] = data[offset:offset + length].decode()
+        else:
+            variants[name] = data[offset:offset + length]
+        offset += length
+    return data[:constants.ETAG_LENGTH].decode(), variants, headers
+
+
+def unpack_etag(data: bytes) -> str:
+    """Unpack only the ETag of the body from the cached entry"""
+    return data[:constants.ETAG_LENGTH].decode()
+
+
+def select_variant(variants: dict[str, bytes], encoding: str) -> tuple[str, bytes]:
+    """Select the variant by the chosen encoding, the body as is is decompressed if it is not kept"""
+    if encoding in variants:
+        return encoding, variants[encoding]
+    if IDENTITY in variants:
+        return IDENTITY, variants[IDENTITY]
+    stored, body = next(iter(variants.items()))
+    return IDENTITY, decompressors[stored](body)
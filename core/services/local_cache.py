@@ -0,0 +1,195 @@
+import asyncio
+import contextlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable
+from uuid import UUID
+
+import aioredis
+
+from core.schemas.base import BaseIdSchema
+from core.services.base import BaseCacheService
+from core.services.cache_policy import CachePolicy
+from core.services.redis import RadisCacheService
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+class LocalCacheService(BaseCacheService):
+    """In-process LRU cache in front of redis.
+
+    Invalidations are broadcast on the redis pub/sub channel, so every process evicts the same keys.
+    Lifetime of local values is short, it limits staleness if a message was lost.
+    """
+
+    def __init__(self, backend: RadisCacheService, max_size: int, lifetime: int, channel: str):
+        self.backend: RadisCacheService = backend
+        self.max_size: int = max_size
+        self.lifetime: int = lifetime
+        self.channel: str = channel
+        self.storage: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.listener: asyncio.Task | None = None
+
+    def get_local(self, key: str) -> Any:
+        """Get value from local storage by key"""
+        item: tuple[float, Any] | None = self.storage.get(key)
+        if item is None:
+            return None
+        expire_at, value = item
+        if expire_at < time.monotonic():
+            del self.storage[key]
+            return None
+        self.storage.move_to_end(key)
+        return value
+
+    def set_local(self, key: str, value: Any, lifetime: int | None = None) -> None:
+        """Set value to local storage by key with eviction of the least recently used values"""
+        lifetime = self.lifetime if lifetime is None else min(lifetime, self.lifetime)
+        self.storage[key] = (time.monotonic() + lifetime, value)
+        self.storage.move_to_end(key)
+        while len(self.storage) > self.max_size:
+            self.storage.popitem(last=False)
+
+    def evict(self, *keys: str) -> None:
+        """Delete values and rendered responses of values from local storage by keys"""
+        for key in keys:
+            self.storage.pop(key, None)
+            self.storage.pop(self.response_key(key), None)
+
+    def clear_local(self, lost_at: float | None = None) -> None:
+        """Delete all values from local storage, the subscription is new or was lost at the given time"""
+        self.storage.clear()
+
+    async def get(self, key: str, refresh: Callable[[], Awaitable[None]] | None = None) -> Any:
+        """Get value from local storage or from redis by key"""
+        value: Any = self.get_local(key)
+        if value is not None:
+            return value
+        value = await self.backend.get(key, refresh=refresh)
+        if value is not None:
+            self.set_local(key, value)
+        return value
+
+    async def get_many(self, *keys: str) -> list[Any]:
+        """Get values from local storage, requesting redis only for missing ones"""
+        values: dict[str, Any] = {key: self.get_local(key) for key in keys}
+        missing: list[str] = [key for key, value in values.items() if value is None]
+        if missing:
+            for key, value in zip(missing, await self.backend.get_many(*missing)):
+                values[key] = value
+                if value is not None:
+                    self.set_local(key, value)
+        return [values[key] for key in keys]
+
+    async def set(self, key: str, value: Any, policy: CachePolicy | None = None) -> None:
+        """Set value to redis and local storage by key
+
+        Values not admitted to redis by the policy are not kept locally either.
+        """
+        if value is None:
+            return
+        if await self.backend.set(key, value, policy=policy):
+            self.set_local(key, value, lifetime=None if policy is None else policy.lifetime)
+
+    async def set_many(self, *items: tuple[str, Any, CachePolicy]) -> list[str]:
+        """Set values to redis and local storage in a single round trip to redis
+
+        Values not admitted to redis by their policies are not kept locally either.
+        """
+        stored: list[str] = await self.backend.set_many(*items)
+        keys: set[str] = set(stored)
+        for key, value, policy in items:
+            if key in keys:
+                self.set_local(key, value, lifetime=policy.lifetime)
+        return stored
+
+    async def replace(self, key: str, value: Any, policy: CachePolicy | None = None) -> None:
+        """Set new value to redis by key and evict the old value in all processes"""
+        await self.backend.replace(key, value, policy=policy)
+        await self.broadcast(key)
+
+    async def set_list_item(self, key: str, item: BaseIdSchema, policy: CachePolicy | None = None) -> None:
+        """Set the item to the list in redis by key and evict the list in all processes"""
+        await self.backend.set_list_item(key, item, policy=policy)
+        await self.broadcast(key)
+
+    async def delete_list_item(self, key: str, item_id: UUID, policy: CachePolicy | None = None) -> None:
+        """Delete the item from the list in redis by key and evict the list in all processes"""
+        await self.backend.delete_list_item(key, item_id, policy=policy)
+        await self.broadcast(key)
+
+    async def delete(self, key: str) -> None:
+        """Delete value by key in all processes"""
+        await self.backend.delete(key)
+        await self.broadcast(key)
+
+    async def find_keys(self, pattern: str) -> list[str]:
+        """Return all found keys in redis by pattern"""
+        return await self.backend.find_keys(pattern)
+
+    async def del_by_pattens(self, *patterns: str) -> None:
+        """Delete all values by patterns of keys in all processes"""
+        keys: set[str] = set()
+        for pattern in patterns:
+            keys.update(await self.backend.find_keys(pattern))
+        if keys:
+            await self.backend.client.delete(*keys)
+            await self.broadcast(*keys)
+
+    @contextlib.asynccontextmanager
+    async def lock(self, key: str) -> AsyncIterator[None]:
+        async with self.backend.lock(key):
+            yield
+
+    async def claim(self, *keys: str) -> list[str]:
+        return await self.backend.claim(*keys)
+
+    async def get_generations(self, *namespaces: str) -> list[int]:
+        """Get generations of namespaces, requesting redis only for missing ones"""
+        generations: dict[str, int | None] = {namespace: self.get_local(namespace) for namespace in namespaces}
+        missing: list[str] = [namespace for namespace, generation in generations.items() if generation is None]
+        if missing:
+            for namespace, generation in zip(missing, await self.backend.get_generations(*missing)):
+                generations[namespace] = generation
+                self.set_local(namespace, generation)
+        return [generations[namespace] for namespace in namespaces]  # type: ignore[misc]
+
+    async def invalidate(self, *keys: str) -> None:
+        """Invalidate cache by keys in redis and in all processes"""
+        if not keys:
+            return
+        await self.backend.invalidate(*keys)
+        await self.broadcast(*keys)
+
+    async def broadcast(self, *keys: str) -> None:
+        """Evict keys locally and publish them for other processes"""
+        self.evict(*keys)
+        await self.backend.client.publish(self.channel, ' '.join(keys))
+
+    async def listen(self) -> None:
+        """Evict keys received from the invalidation channel"""
+        lost_at: float | None = None
+        while True:
+            try:
+                pubsub = self.backend.client.pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(self.channel)
+                # messages could be lost while there was no subscription
+                self.clear_local(lost_at)
+                async for message in pubsub.listen():
+                    self.evict(*message['data'].decode().split())
+            except aioredis.exceptions.ConnectionError as e:
+                logger.warning('Invalidation channel is unavailable: %s', e)
+                lost_at = time.time()
+                await asyncio.sleep(1)
+
+    async def startup(self) -> None:
+        self.listener = asyncio.create_task(self.listen())
+
+    async def shutdown(self) -> None:
+        if self.listener is None:
+            return
+        self.listener.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self.listener
+        self.listener = None
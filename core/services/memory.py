@@ -0,0 +1,132 @@
+import asyncio
+import fnmatch
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from core.services.base import BaseCacheService
+from core.services.cache_policy import CachePolicy, default_policy
+
+
+class MemoryCacheService(BaseCacheService):
+    """In-process cache without redis for single-node deployments.
+
+    Values are kept as is in LRU order with the lifetime and the stale lifetime like in redis.
+    Generations of namespaces are kept apart from values in LRU order of invalidation and are bounded by max size too.
+    Generations are taken from the increasing counter, and namespaces without their own generation get
+    the highest evicted one, so values of evicted namespaces never become reachable again.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size: int = max_size
+        # key: (soft expiry time, expiry time, value)
+        self.storage: OrderedDict[str, tuple[float, float, Any]] = OrderedDict()
+        self.generations: OrderedDict[str, int] = OrderedDict()
+        self.last_generation: int = 0
+        self.evicted_generation: int = 0
+        self.refreshing: dict[str, asyncio.Task] = {}
+
+    def get_item(self, key: str) -> tuple[float, Any] | None:
+        """Get soft expiry time and value by key with dropping of expired values"""
+        item: tuple[float, float, Any] | None = self.storage.get(key)
+        if item is None:
+            return None
+        soft_expire_at, expire_at, value = item
+        if expire_at < time.monotonic():
+            del self.storage[key]
+            return None
+        self.storage.move_to_end(key)
+        return soft_expire_at, value
+
+    async def get(self, key: str, refresh: Callable[[], Awaitable[None]] | None = None) -> Any:
+        """Get value by key
+
+        The stale value is returned as is, and the refresh is scheduled in background.
+        """
+        item: tuple[float, Any] | None = self.get_item(key)
+        if item is None:
+            return None
+        soft_expire_at, value = item
+        if refresh is not None and soft_expire_at < time.monotonic():
+            self.schedule_refresh(key, refresh)
+        return value
+
+    async def get_many(self, *keys: str) -> list[Any]:
+        """Get values by keys"""
+        return [None if (item := self.get_item(key)) is None else item[1] for key in keys]
+
+    async def set(self, key: str, value: Any, policy: CachePolicy | None = None) -> None:
+        """Set value by key with eviction of the least recently used values
+
+        The value stays as stale for stale lifetime after its lifetime with jitter.
+        Values are not serialized, so max size of the policy is not applied.
+        """
+        if value is None:
+            return
+        policy = policy or default_policy()
+        soft_expire_at: float = time.monotonic() + policy.ttl()
+        self.storage[key] = (soft_expire_at, soft_expire_at + policy.stale_lifetime, value)
+        self.storage.move_to_end(key)
+        while len(self.storage) > self.max_size:
+            self.storage.popitem(last=False)
+
+    async def set_many(self, *items: tuple[str, Any, CachePolicy]) -> list[str]:
+        """Set values by keys and return keys of cached values
+
+        Items are tuples of key, value and policy of the value.
+        """
+        for key, value, policy in items:
+            await self.set(key, value, policy=policy)
+        return [key for key, value, _ in items if value is not None]
+
+    def schedule_refresh(self, key: str, refresh: Callable[[], Awaitable[None]]) -> None:
+        """Run refresh of the stale value in background once"""
+        if key in self.refreshing:
+            return
+        self.refreshing[key] = asyncio.create_task(self.run_refresh(refresh))
+        self.refreshing[key].add_done_callback(lambda _: self.refreshing.pop(key, None))
+
+    @staticmethod
+    async def run_refresh(refresh: Callable[[], Awaitable[None]]) -> None:
+        await refresh()
+
+    async def replace(self, key: str, value: Any, policy: CachePolicy | None = None) -> None:
+        """Set new value by key and delete the rendered response of the old value"""
+        await self.set(key, value, policy=policy)
+        self.storage.pop(self.response_key(key), None)
+
+    async def delete(self, key: str) -> None:
+        """Delete value by key"""
+        self.storage.pop(key, None)
+
+    async def find_keys(self, pattern: str) -> list[str]:
+        """Return all found keys by glob-style pattern"""
+        return [key for key in self.storage if fnmatch.fnmatchcase(key, pattern)]
+
+    async def del_by_pattens(self, *patterns: str) -> None:
+        """Delete all values by patterns of keys"""
+        for pattern in patterns:
+            for key in await self.find_keys(pattern):
+                del self.storage[key]
+
+    async def get_generations(self, *namespaces: str) -> list[int]:
+        """Get current generations of namespaces by their keys"""
+        return [self.generations.get(namespace, self.evicted_generation) for namespace in namespaces]
+
+    async def invalidate(self, *keys: str) -> None:
+        """Invalidate cache by keys.
+
+        Keys of namespaces are incremented, so all values in the namespace become unreachable
+        and are evicted by their lifetime or LRU. Other keys are deleted with rendered responses of their values.
+        """
+        for key in keys:
+            if self.is_namespace_key(key):
+                self.last_generation += 1
+                self.generations[key] = self.last_generation
+                self.generations.move_to_end(key)
+                while len(self.generations) > self.max_size:
+                    _, generation = self.generations.popitem(last=False)
+                    self.evicted_generation = max(self.evicted_generation, generation)
+                continue
+            self.storage.pop(key, None)
+            self.storage.pop(self.response_key(key), None)
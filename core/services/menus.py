@@ -1,93 +1,108 @@
+import functools
 import itertools
+from typing import Any
 from uuid import UUID
 
-from fastapi import BackgroundTasks, HTTPException
+from fastapi import BackgroundTasks, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core import constants, models, repositories, schemas, services
-from core.services.base import BaseObjectService
+from core.services.base import (
+    BaseObjectService,
+    add_item,
+    remove_item,
+    replace_item,
+    update_fields,
+)
+from core.services.cache_policy import CachePolicy, get_policy
+from core.services.cached import build_entity_key, cached, get_pages_namespace
+from core.services.pagination import Page
+from core.settings import settings
 
 
 class MenusService(BaseObjectService):
+    entity: str = constants.MENU
+
     @staticmethod
     def gen_key(menu_id: UUID | None = None, many: bool = False) -> str:
         """Generate a key of cache for menu and a list of menus"""
-        return f"menu_{'list' if many else menu_id}"
-
-    async def get_menu_list(self, db: AsyncSession) -> list[schemas.ResponseMenuSchema]:
-        """Get a list of menus."""
-
-        menu_list_key: str = self.gen_key(many=True)
-        menu_list_cache: list[schemas.ResponseMenuSchema] = await services.redis_service.get(menu_list_key)
-        if menu_list_cache is not None:
-            return menu_list_cache
-
-        menu_list: list[models.MenuDBModel] = await self.repository.get_all(db=db)
-        response_menu_list: list[schemas.ResponseMenuSchema] = [
-            schemas.ResponseMenuSchema(**obj.to_dict()) for obj in menu_list
-        ]
-        await services.redis_service.set(menu_list_key, response_menu_list)
-
-        return response_menu_list
+        return build_entity_key(constants.MENU, (), {'menu_id': menu_id}, many=many)
 
+    @staticmethod
+    def gen_tree_key(menu_id: UUID | str | None = None, many: bool = False) -> str:
+        """Generate a key of cache for fragment of the all_in_one tree of menu and a list of IDs of menus
+
+        Without arguments the key is of the whole tree, which is cached only as the rendered response.
+        IDs of menus are cached as strings, so keys of fragments are generated by them as well.
+        """
+        if menu_id is None and not many:
+            return constants.ALL_IN_ONE
+        return f"{constants.ALL_IN_ONE}_{'list' if many else menu_id}"
+
+    @cached(constants.MENU, response_type=list[schemas.ResponseMenuSchema], many=True)
+    async def get_menu_list(self, db: AsyncSession, page: Page = Page()) -> list[schemas.ResponseMenuSchema]:
+        """Get a list or a page of menus ordered by IDs."""
+        menu_list: list[models.MenuDBModel] = await self.repository.get_all(db=db, after=page.after, limit=page.limit)
+        return [schemas.ResponseMenuSchema(**obj.to_dict()) for obj in menu_list]
+
+    @cached(constants.MENU, response_type=schemas.ResponseMenuWithCountSchema)
     async def get_menu(self, db: AsyncSession, menu_id: UUID) -> schemas.ResponseMenuWithCountSchema:
-        """Get menu data by ID."""
-
-        menu_key: str = self.gen_key(menu_id=menu_id)
-        cache_menu: schemas.ResponseMenuWithCountSchema = await services.redis_service.get(menu_key)
-        if cache_menu is not None:
-            return cache_menu
-
-        menu: tuple[models.MenuDBModel, int, int] | None = await self.repository.get_menu_with_counts(
-            db=db, menu_id=menu_id
-        )
+        """Get menu data with counts by ID."""
+        menu: models.MenuDBModel | None = await self.repository.get_menu_with_counts(db=db, menu_id=menu_id)
 
         if menu is None:
             raise HTTPException(status_code=404, detail='menu not found')
 
-        menu_response: schemas.ResponseMenuWithCountSchema = schemas.ResponseMenuWithCountSchema(
-            **menu[0].to_dict(),
-            submenus_count=menu[1] if menu[1] is not None else 0,
-            dishes_count=menu[2] if menu[2] is not None else 0
-        )
-
-        await services.redis_service.set(menu_key, menu_response)
-
-        return menu_response
+        return schemas.ResponseMenuWithCountSchema.model_validate(menu)
 
     async def create_menu(
             self, db: AsyncSession, data: schemas.MenuSchema, bgtask: BackgroundTasks
     ) -> schemas.ResponseMenuSchema:
         """Create menu."""
+        await self.record_invalidation(db, operation=constants.CREATE, menu_id=None)
         menu: models.MenuDBModel = await self.repository.create(db=db, obj_in=data)
+        await db.commit()
+        created_menu: schemas.ResponseMenuSchema = schemas.ResponseMenuSchema(**menu.to_dict())
 
         bgtask.add_task(
             self.clearing_cache_process,
-            operation=constants.CREATE
+            operation=constants.CREATE,
+            menu_id=menu.id,
+            menu=created_menu,
         )
 
-        return schemas.ResponseMenuSchema(**menu.to_dict())
+        return created_menu
 
     async def update_menu(
         self, db: AsyncSession, menu_id: UUID, data: schemas.UpdateMenuSchema, bgtask: BackgroundTasks
     ) -> schemas.ResponseMenuSchema:
         """Update menu data."""
-        menu: models.MenuDBModel = await self.get_menu_by_id_or_404(db=db, menu_id=menu_id)
+        await self.record_invalidation(db, operation=constants.UPDATE, menu_id=menu_id)
+        updated_menu: models.MenuDBModel | None = await self.repository.update(db=db, obj_id=menu_id, obj_in=data)
+
+        if updated_menu is None:
+            raise HTTPException(status_code=404, detail='menu not found')
 
-        updated_menu = await self.repository.update(db=db, obj_in=data, db_obj=menu)
+        await db.commit()
+        response_menu: schemas.ResponseMenuSchema = schemas.ResponseMenuSchema(**updated_menu.to_dict())
 
         bgtask.add_task(
             self.clearing_cache_process,
             operation=constants.UPDATE,
-            menu_id=menu_id
+            menu_id=menu_id,
+            menu=response_menu,
         )
 
-        return schemas.ResponseMenuSchema(**updated_menu.to_dict())
+        return response_menu
 
     async def delete_menu(self, db: AsyncSession, menu_id: UUID, bgtask: BackgroundTasks) -> None:
         """Delete menu."""
-        await self.get_menu_by_id_or_404(db=db, menu_id=menu_id)
-        await self.repository.delete_by_id(db=db, obj_id=menu_id)
+        await self.record_invalidation(db, operation=constants.DELETE, menu_id=menu_id)
+
+        if not await self.repository.delete_by_id(db=db, obj_id=menu_id):
+            raise HTTPException(status_code=404, detail='menu not found')
+
+        await db.commit()
 
         bgtask.add_task(
             self.clearing_cache_process,
@@ -104,37 +119,138 @@ class MenusService(BaseObjectService):
 
         return menu
 
-    async def clearing_cache_process(self, operation: str, menu_id: UUID | None = None) -> None:
-        """Clear cache after create, update, delete."""
-        patterns: list[str] = await self.clearing_cache_patterns(operation=operation, menu_id=menu_id)
-        await services.redis_service.del_by_pattens(*patterns)
-
-    async def clearing_cache_patterns(self, operation: str, menu_id: UUID | None) -> list[str]:
-        """Generate patterns for key by operation type (create, update, delete)"""
-        if operation == constants.CREATE:
-            return [self.gen_key(many=True)]
-
-        if menu_id is None:
-            return []
-
-        if operation == constants.UPDATE:
-            return [
-                self.gen_key(many=True),
-                self.gen_key(menu_id=menu_id),
+    async def clearing_cache_process(
+        self, operation: str, menu_id: UUID | None = None, menu: schemas.ResponseMenuSchema | None = None
+    ) -> None:
+        """Clear cache after create, update, delete.
+
+        With the hash layout of lists the written object is set to its cached list.
+        In write-through mode cached entries are updated by the written menu instead.
+        With the outbox keys are recorded with the changes, so the outbox is drained.
+        The read model refreshes the subtree of the menu.
+        With change capture all of it is done by the listener of database changes.
+        """
+        if settings.CACHE_CHANGE_CAPTURE:
+            return
+        # without the ID of the menu the whole tree is refreshed
+        await services.read_model.notify(*(() if menu_id is None else (menu_id,)))
+        if settings.CACHE_OUTBOX_ENABLED:
+            await services.outbox_dispatcher.dispatch()
+            return
+        if settings.CACHE_WRITE_THROUGH:
+            keys: list[str] = [
+                *await self.write_through(operation=operation, menu_id=menu_id, menu=menu),
+                get_pages_namespace(self.entity, {}),
             ]
-
-        if operation == constants.DELETE:
+        else:
+            keys = await self.write_list_item(
+                await self.clearing_cache_patterns(operation=operation, menu_id=menu_id),
+                operation,
+                menu,
+                menu_id=menu_id,
+            )
+        await services.cache_service.invalidate(*keys)
+
+    async def write_through(
+        self, operation: str, menu_id: UUID | None, menu: schemas.ResponseMenuSchema | None
+    ) -> list[str]:
+        """Write the menu to cached entries and return keys which still have to be invalidated"""
+        await self.fence_writes()
+        list_key: str = self.gen_key(many=True)
+        policy: CachePolicy = get_policy(constants.MENU)
+        list_policy: CachePolicy = get_policy(constants.MENU, many=True)
+
+        if operation == constants.CREATE and menu is not None:
+            await services.cache_service.replace(
+                self.gen_key(menu_id=menu.id),
+                schemas.ResponseMenuWithCountSchema(**menu.model_dump(), submenus_count=0, dishes_count=0),
+                policy=policy,
+            )
+            await services.cache_service.replace(
+                await services.submenus_service.gen_key(menu_id=menu.id, many=True),
+                [],
+                policy=get_policy(constants.SUBMENU, many=True),
+            )
+            await self.patch_cache(list_key, functools.partial(add_item, obj=menu), list_policy)
+            return [self.gen_tree_key(many=True), self.gen_tree_key()]
+
+        if operation == constants.UPDATE and menu is not None:
+            await self.patch_cache(self.gen_key(menu_id=menu.id), update_fields(menu), policy)
+            await self.patch_cache(list_key, functools.partial(replace_item, obj=menu), list_policy)
+            return [self.gen_tree_key(menu_id=menu.id), self.gen_tree_key()]
+
+        if operation == constants.DELETE and menu_id is not None:
+            await self.patch_cache(
+                list_key, functools.partial(remove_item, obj_id=menu_id), list_policy
+            )
             return [
-                self.gen_key(many=True),
-                self.gen_key(menu_id=menu_id),
-                services.dishes_service.gen_key(menu_id=menu_id),
-                services.submenus_service.gen_key(menu_id=menu_id),
+                key for key in await self.clearing_cache_patterns(operation=operation, menu_id=menu_id)
+                if key != list_key
             ]
-        return []
+
+        return await self.clearing_cache_patterns(operation=operation, menu_id=menu_id)
 
     async def get_all_in_one(self, db: AsyncSession) -> list[schemas.ResponseMenuWitSubmenusSchema]:
+        """Get all menus with submenus and dishes.
+
+        The tree is cached by fragments of menus, so a change in the menu rebuilds only its own fragment.
+        """
+        if settings.READ_MODEL_ENABLED and services.read_model.loaded:
+            return services.read_model.get_all_in_one()
+        menu_ids: list[str] | None = await services.cache_service.get(self.gen_tree_key(many=True))
+        if menu_ids is None:
+            menu_ids = [str(menu_id) for menu_id in await self.repository.get_all_ids(db=db)]
+            await services.cache_service.set(
+                self.gen_tree_key(many=True), menu_ids, policy=get_policy(constants.ALL_IN_ONE, many=True)
+            )
+
+        fragments: dict[str, schemas.ResponseMenuWitSubmenusSchema | None] = dict(zip(
+            menu_ids, await services.cache_service.get_many(*(self.gen_tree_key(menu_id=obj_id) for obj_id in menu_ids))
+        ))
+        missing: list[UUID] = [UUID(menu_id) for menu_id, fragment in fragments.items() if fragment is None]
+        if missing:
+            for fragment in await self.load_all_in_one(db=db, menu_ids=missing):
+                fragments[str(fragment.id)] = fragment
+                await services.cache_service.set(
+                    self.gen_tree_key(menu_id=fragment.id), fragment, policy=get_policy(constants.ALL_IN_ONE)
+                )
+
+        return [fragment for fragment in fragments.values() if fragment is not None]
+
+    async def render_all_in_one(
+        self,
+        db: AsyncSession,
+        if_none_match: str | None = None,
+        accept_encoding: str | None = None,
+        response: Response | None = None,
+    ) -> Any:
+        """Get all menus with submenus and dishes rendered with ETag.
+
+        The tree is cached whole with its ETag, with caching of responses it is rendered and compressed once.
+        """
+        if settings.READ_MODEL_ENABLED and services.read_model.loaded:
+            return services.read_model.render(
+                constants.ALL_IN_ONE,
+                list[schemas.ResponseMenuWitSubmenusSchema],
+                if_none_match=if_none_match,
+                response=response,
+            )
+        return await self.get_or_render(
+            key=self.gen_tree_key(),
+            loader=self.get_all_in_one,
+            response_type=list[schemas.ResponseMenuWitSubmenusSchema],
+            policy=get_policy(constants.ALL_IN_ONE),
+            if_none_match=if_none_match,
+            accept_encoding=accept_encoding,
+            response=response,
+        )
+
+    async def load_all_in_one(
+        self, db: AsyncSession, menu_ids: list[UUID] | None = None
+    ) -> list[schemas.ResponseMenuWitSubmenusSchema]:
+        """Load trees of menus with submenus and dishes from database."""
         all_data: list[tuple[models.MenuDBModel, models.SubmenuDBModel | None, models.DishDBModel | None]] = (
-            await self.repository.get_all_in_one(db=db)
+            await self.repository.get_all_in_one(db=db, menu_ids=menu_ids)
         )
         response_data: list[schemas.ResponseMenuWitSubmenusSchema] = []
         for menu, menu_group in itertools.groupby(all_data, key=lambda x: x[0]):
@@ -0,0 +1,42 @@
+import logging
+
+from core import repositories, services
+from core.db import session_generator
+from core.repositories.outbox import CacheOutboxRepository
+from core.settings import settings
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+class CacheOutboxDispatcher:
+    """Dispatcher of keys to invalidate from the outbox table to cache.
+
+    Events are locked with SKIP LOCKED, so concurrent dispatchers drain different batches.
+    Keys of a batch are deduplicated and invalidated at once, events are deleted only after it,
+    so events of a failed batch are dispatched again.
+    """
+
+    def __init__(self, repository: CacheOutboxRepository, batch_size: int):
+        self.repository: CacheOutboxRepository = repository
+        self.batch_size: int = batch_size
+
+    async def dispatch(self) -> int:
+        """Drain the outbox by batches and return a count of dispatched events"""
+        dispatched: int = 0
+        async with session_generator() as db:
+            while True:
+                events = await self.repository.lock_batch(db, limit=self.batch_size)
+                if not events:
+                    break
+                await services.cache_service.invalidate(*dict.fromkeys(event.key for event in events))
+                await self.repository.delete_batch(db, obj_ids=[event.id for event in events])
+                await db.commit()
+                dispatched += len(events)
+        if dispatched:
+            logger.info('Dispatched %s events of cache outbox', dispatched)
+        return dispatched
+
+
+outbox_dispatcher: CacheOutboxDispatcher = CacheOutboxDispatcher(
+    repository=repositories.cache_outbox, batch_size=settings.CACHE_OUTBOX_BATCH_SIZE
+)
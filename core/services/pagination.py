@@ -0,0 +1,77 @@
+import base64
+import binascii
+import bisect
+from dataclasses import dataclass
+from typing import Any, Sequence
+from uuid import UUID
+
+from fastapi import HTTPException, Query
+
+from core.settings import settings
+
+NEXT_CURSOR_HEADER: str = 'X-Next-Cursor'
+
+# OpenAPI description of responses of lists
+page_response: dict[str, Any] = {
+    'description': 'Successful Response',
+    'headers': {
+        NEXT_CURSOR_HEADER: {
+            'description': 'Cursor of the next page, it is omitted on the last page',
+            'schema': {'type': 'string'},
+        },
+    },
+}
+
+
+@dataclass(frozen=True)
+class Page:
+    """Page of a list ordered by IDs: at most `limit` objects following the object by ID `after`.
+
+    Pages are taken by keyset, so fetching of a page does not depend on its depth. Without limit it is the whole list.
+    """
+
+    limit: int | None = None
+    after: UUID | None = None
+
+    @property
+    def key(self) -> str:
+        return f"{self.limit}_{'' if self.after is None else self.after.hex}"
+
+
+def encode_cursor(obj_id: UUID) -> str:
+    """Encode the ID of the last object of the page to the opaque cursor of the next page"""
+    return base64.urlsafe_b64encode(obj_id.bytes).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor: str) -> UUID:
+    try:
+        return UUID(bytes=base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=422, detail='invalid cursor')
+
+
+def get_page(
+    limit: int | None = Query(default=None, ge=1, le=settings.API_PAGE_SIZE_MAX, description='Size of the page'),
+    cursor: str | None = Query(default=None, description=f'Cursor of the page from {NEXT_CURSOR_HEADER} header'),
+) -> Page:
+    """Get the requested page of the list, without limit and cursor the whole list is requested"""
+    if limit is None and cursor is None:
+        return Page()
+    return Page(
+        limit=limit or settings.API_PAGE_SIZE_DEFAULT, after=None if cursor is None else decode_cursor(cursor)
+    )
+
+
+def paginate(items: Sequence[Any], page: Page) -> list[Any]:
+    """Take the page of objects ordered by IDs"""
+    if page.limit is None:
+        return list(items)
+    start: int = 0 if page.after is None else bisect.bisect_right(items, page.after, key=lambda item: item.id)
+    return list(items[start:start + page.limit])
+
+
+def page_headers(items: list[Any], page: Page) -> dict[str, str]:
+    """Make headers of the page: the cursor of the next page if the page is full"""
+    if page.limit is None or len(items) < page.limit:
+        return {}
+    return {NEXT_CURSOR_HEADER: encode_cursor(items[-1].id)}
@@ -0,0 +1,307 @@
+import asyncio
+import contextlib
+import itertools
+import logging
+import uuid
+from decimal import Decimal
+from typing import Any, Iterable
+from uuid import UUID
+
+import aioredis
+from fastapi import HTTPException, Response
+
+from core import constants, models, repositories, schemas
+from core.db import session_generator
+from core.repositories.menus import MenuRepository
+from core.services.base import make_etag, render, response_adapter
+from core.services.dishes import DishesService
+from core.services.pagination import Page, page_headers, paginate
+from core.services.redis import RadisCacheService, redis_service
+from core.settings import settings
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+class DishNode:
+    __slots__ = ('id', 'submenu_id', 'title', 'description', 'price')
+
+    def __init__(self, id: UUID, submenu_id: UUID, title: str, description: str, price: Decimal):  # noqa: A002
+        self.id: UUID = id
+        self.submenu_id: UUID = submenu_id
+        self.title: str = title
+        self.description: str = description
+        # price with discount
+        self.price: Decimal = price
+
+    def to_schema(self) -> schemas.ResponseDishSchema:
+        return schemas.ResponseDishSchema(
+            id=self.id, submenu_id=self.submenu_id, title=self.title, description=self.description, price=self.price
+        )
+
+
+class SubmenuNode:
+    __slots__ = ('id', 'menu_id', 'title', 'description', 'dishes')
+
+    def __init__(
+        self, id: UUID, menu_id: UUID, title: str, description: str, dishes: tuple[DishNode, ...]  # noqa: A002
+    ):
+        self.id: UUID = id
+        self.menu_id: UUID = menu_id
+        self.title: str = title
+        self.description: str = description
+        self.dishes: tuple[DishNode, ...] = dishes
+
+    def to_schema(self) -> schemas.ResponseSubmenuSchema:
+        return schemas.ResponseSubmenuSchema(
+            id=self.id, menu_id=self.menu_id, title=self.title, description=self.description
+        )
+
+
+class MenuNode:
+    __slots__ = ('id', 'title', 'description', 'submenus')
+
+    def __init__(self, id: UUID, title: str, description: str, submenus: tuple[SubmenuNode, ...]):  # noqa: A002
+        self.id: UUID = id
+        self.title: str = title
+        self.description: str = description
+        self.submenus: tuple[SubmenuNode, ...] = submenus
+
+    @property
+    def dishes_count(self) -> int:
+        return sum(len(submenu.dishes) for submenu in self.submenus)
+
+    def to_schema(self) -> schemas.ResponseMenuSchema:
+        return schemas.ResponseMenuSchema(id=self.id, title=self.title, description=self.description)
+
+
+class ReadModel:
+    """Materialized tree of menus in memory of the process.
+
+    The tree is loaded once from the all_in_one query and refreshed by subtrees of changed menus,
+    so reads are served without requests to database and cache. Changes are published on the redis channel
+    by the process that made them, every process refreshes its own tree. A change without IDs of menus,
+    e.g. after sync with the source, reloads the whole tree.
+    """
+
+    def __init__(self, repository: MenuRepository, backend: RadisCacheService, channel: str):
+        self.repository: MenuRepository = repository
+        self.backend: RadisCacheService = backend
+        self.channel: str = channel
+        # messages of the process itself are skipped, it has refreshed its tree already
+        self.token: str = uuid.uuid4().hex
+        self.menus: dict[UUID, MenuNode] = {}
+        # menus ordered by IDs for pages, rebuilt by every refresh instead of every read
+        self.menu_list: tuple[MenuNode, ...] = ()
+        self.submenus: dict[UUID, SubmenuNode] = {}
+        self.dishes: dict[UUID, DishNode] = {}
+        self.loaded: bool = False
+        # ETags of rendered reads by their keys, made from bodies once per refresh of the tree
+        self.etags: dict[str, str] = {}
+        self.refresh_lock: asyncio.Lock = asyncio.Lock()
+        self.listener: asyncio.Task | None = None
+
+    @staticmethod
+    def build(
+        rows: Iterable[tuple[models.MenuDBModel, models.SubmenuDBModel | None, models.DishDBModel | None]]
+    ) -> list[MenuNode]:
+        """Build nodes of menus from rows of the all_in_one query ordered by menus and submenus"""
+        menus: list[MenuNode] = []
+        for menu, menu_group in itertools.groupby(rows, key=lambda x: x[0]):
+            submenus: list[SubmenuNode] = []
+            for submenu, submenu_group in itertools.groupby(menu_group, key=lambda x: x[1]):
+                if submenu is None:
+                    continue
+                dishes: tuple[DishNode, ...] = tuple(
+                    DishNode(
+                        id=dish.id,
+                        submenu_id=dish.submenu_id,
+                        title=dish.title,
+                        description=dish.description,
+                        price=dish.price if dish.discount is None else DishesService.apply_discount(
+                            dish.price, dish.discount.value
+                        ),
+                    )
+                    for _, _, dish in submenu_group if dish is not None
+                )
+                submenus.append(SubmenuNode(
+                    id=submenu.id, menu_id=menu.id, title=submenu.title, description=submenu.description, dishes=dishes
+                ))
+            menus.append(MenuNode(id=menu.id, title=menu.title, description=menu.description, submenus=tuple(submenus)))
+        return menus
+
+    async def refresh(self, *menu_ids: UUID) -> None:
+        """Reload subtrees of menus by IDs or the whole tree without IDs from database"""
+        async with self.refresh_lock:
+            async with session_generator() as db:
+                rows = await self.repository.get_all_in_one(db=db, menu_ids=list(menu_ids) if menu_ids else None)
+                nodes: list[MenuNode] = self.build(rows)
+            # the tree is changed without awaiting, so reads never see it partially changed
+            if not menu_ids:
+                self.menus, self.submenus, self.dishes = {}, {}, {}
+            for menu_id in menu_ids:
+                self.remove(menu_id)
+            for menu in nodes:
+                self.add(menu)
+            if menu_ids:
+                self.menus = dict(sorted(self.menus.items()))
+            self.menu_list = tuple(self.menus.values())
+            self.etags = {}
+            self.loaded = True
+
+    def add(self, menu: MenuNode) -> None:
+        self.menus[menu.id] = menu
+        for submenu in menu.submenus:
+            self.submenus[submenu.id] = submenu
+            for dish in submenu.dishes:
+                self.dishes[dish.id] = dish
+
+    def remove(self, menu_id: UUID) -> None:
+        menu: MenuNode | None = self.menus.pop(menu_id, None)
+        if menu is None:
+            return
+        for submenu in menu.submenus:
+            self.submenus.pop(submenu.id, None)
+            for dish in submenu.dishes:
+                self.dishes.pop(dish.id, None)
+
+    async def notify(self, *menu_ids: UUID) -> None:
+        """Refresh the tree of the process by changed menus and publish them for other processes"""
+        if not settings.READ_MODEL_ENABLED:
+            return
+        if self.loaded:
+            await self.refresh(*menu_ids)
+        await self.backend.client.publish(self.channel, ' '.join((self.token, *(str(obj_id) for obj_id in menu_ids))))
+
+    async def listen(self) -> None:
+        """Refresh the tree by changes received from the channel"""
+        while True:
+            try:
+                pubsub = self.backend.client.pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(self.channel)
+                # messages could be lost while there was no subscription
+                await self.refresh()
+                async for message in pubsub.listen():
+                    token, *menu_ids = message['data'].decode().split()
+                    if token != self.token:
+                        await self.refresh(*(UUID(menu_id) for menu_id in menu_ids))
+            except aioredis.exceptions.ConnectionError as e:
+                logger.warning('Channel of read model changes is unavailable: %s', e)
+                await asyncio.sleep(1)
+
+    async def startup(self) -> None:
+        if not settings.READ_MODEL_ENABLED:
+            return
+        # the tree is loaded by the listener, reads are served from cache until it is loaded
+        self.listener = asyncio.create_task(self.listen())
+
+    async def shutdown(self) -> None:
+        if self.listener is None:
+            return
+        self.listener.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self.listener
+        self.listener = None
+
+    def get_menu_list(self, page: Page = Page()) -> list[schemas.ResponseMenuSchema]:
+        return [menu.to_schema() for menu in paginate(self.menu_list, page)]
+
+    def get_menu(self, menu_id: UUID) -> schemas.ResponseMenuWithCountSchema:
+        menu: MenuNode | None = self.menus.get(menu_id)
+        if menu is None:
+            raise HTTPException(status_code=404, detail='menu not found')
+        return schemas.ResponseMenuWithCountSchema(
+            id=menu.id,
+            title=menu.title,
+            description=menu.description,
+            submenus_count=len(menu.submenus),
+            dishes_count=menu.dishes_count,
+        )
+
+    def get_submenu_list(self, menu_id: UUID, page: Page = Page()) -> list[schemas.ResponseSubmenuSchema]:
+        menu: MenuNode | None = self.menus.get(menu_id)
+        if menu is None:
+            raise HTTPException(status_code=404, detail='menu not found')
+        return [submenu.to_schema() for submenu in paginate(menu.submenus, page)]
+
+    def get_submenu(self, menu_id: UUID, submenu_id: UUID) -> schemas.ResponseSubmenuWithCountSchema:
+        submenu: SubmenuNode | None = self.submenus.get(submenu_id)
+        if submenu is None or submenu.menu_id != menu_id:
+            raise HTTPException(status_code=404, detail='submenu not found')
+        return schemas.ResponseSubmenuWithCountSchema(
+            id=submenu.id,
+            menu_id=submenu.menu_id,
+            title=submenu.title,
+            description=submenu.description,
+            dishes_count=len(submenu.dishes),
+        )
+
+    def get_dish_list(
+        self, menu_id: UUID, submenu_id: UUID, page: Page = Page()
+    ) -> list[schemas.ResponseDishSchema]:
+        # like in database, an empty list is returned for non-existent submenu
+        submenu: SubmenuNode | None = self.submenus.get(submenu_id)
+        return [] if submenu is None else [dish.to_schema() for dish in paginate(submenu.dishes, page)]
+
+    def get_dish(self, menu_id: UUID, submenu_id: UUID, dish_id: UUID) -> schemas.ResponseDishSchema:
+        dish: DishNode | None = self.dishes.get(dish_id)
+        if dish is None or dish.submenu_id != submenu_id:
+            raise HTTPException(status_code=404, detail='dish not found')
+        return dish.to_schema()
+
+    def get_all_in_one(self) -> list[schemas.ResponseMenuWitSubmenusSchema]:
+        return [
+            schemas.ResponseMenuWitSubmenusSchema(
+                id=menu.id,
+                title=menu.title,
+                description=menu.description,
+                submenus=[
+                    schemas.ResponseSubmenuWithDishesSchema(
+                        id=submenu.id,
+                        menu_id=submenu.menu_id,
+                        title=submenu.title,
+                        description=submenu.description,
+                        dishes=[dish.to_schema() for dish in submenu.dishes],
+                    )
+                    for submenu in menu.submenus
+                ],
+            )
+            for menu in self.menus.values()
+        ]
+
+    def get(self, entity: str, many: bool = False, page: Page = Page(), **ids: UUID) -> Any:
+        """Get the entity or a list or a page of entities by IDs like cached reads of services"""
+        if many:
+            return getattr(self, f'get_{entity}_{constants.LIST}')(page=page, **ids)
+        return getattr(self, f'get_{entity}')(**ids)
+
+    def get_etag(self, value: Any, response_type: Any, key: str) -> str:
+        """Get the ETag of the body of the read by its key, the same in every process with the same tree"""
+        etag: str | None = self.etags.get(key)
+        if etag is None:
+            etag = self.etags[key] = make_etag(response_adapter(response_type).dump_json(value))
+        return etag
+
+    def render(
+        self,
+        entity: str,
+        response_type: Any,
+        many: bool = False,
+        if_none_match: str | None = None,
+        page: Page = Page(),
+        response: Response | None = None,
+        **ids: UUID,
+    ) -> Any:
+        """Get the entity or a list or a page of entities with the ETag of its body"""
+        value: Any = self.get(entity, many=many, page=page, **ids)
+        etag: str | None = None
+        if settings.HTTP_ETAG_ENABLED:
+            key: str = '_'.join((entity, str(many), page.key, *(f'{name}_{ids[name].hex}' for name in sorted(ids))))
+            etag = self.get_etag(value, response_type, key)
+        return render(
+            value, etag, if_none_match, response=response, headers=page_headers(value, page) if many else None
+        )
+
+
+read_model: ReadModel = ReadModel(
+    repository=repositories.menus, backend=redis_service, channel=settings.READ_MODEL_CHANNEL
+)
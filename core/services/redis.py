@@ -1,28 +1,266 @@
-import pickle
-from typing import Any
+import asyncio
+import contextlib
+import struct
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable
+from uuid import UUID
 
 import aioredis
+from aioredis.exceptions import LockError
 
+from core.schemas.base import BaseIdSchema
+from core.services import serializers
 from core.services.base import BaseCacheService
+from core.services.cache_policy import CachePolicy, default_policy
+from core.services.serializers import BaseSerializer
 from core.settings import settings
 
+# lists are read by their type: hashes of items or serialized lists, e.g. cached not found results
+GET_LIST_SCRIPT: str = """
+local kind = redis.call('TYPE', KEYS[1])['ok']
+if kind == 'hash' then
+    return {1, redis.call('HGETALL', KEYS[1])}
+elseif kind == 'string' then
+    return {0, redis.call('GET', KEYS[1])}
+end
+return false
+"""
+
+# missing lists are left for loading
+SET_LIST_ITEM_SCRIPT: str = """
+redis.call('DEL', KEYS[2])
+local kind = redis.call('TYPE', KEYS[1])['ok']
+if kind ~= 'hash' then
+    if kind ~= 'none' then
+        redis.call('DEL', KEYS[1])
+    end
+    return 0
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+return 1
+"""
+
+DELETE_LIST_ITEM_SCRIPT: str = """
+redis.call('DEL', KEYS[2])
+local kind = redis.call('TYPE', KEYS[1])['ok']
+if kind == 'hash' then
+    return redis.call('HDEL', KEYS[1], ARGV[1])
+elseif kind ~= 'none' then
+    redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
 
 class RadisCacheService(BaseCacheService):
-    def __init__(self, url: str, password: str, port: int):
+    """Cache in redis.
+
+    With the hash layout lists of objects are stored as hashes with a field per object by its ID,
+    so a changed object is set to or deleted from its list without loading of the whole list.
+    Objects are loaded in order of their IDs like lists from database, the marker field keeps empty lists.
+    """
+
+    # soft expiry time of the value is stored before the value
+    stale_header: struct.Struct = struct.Struct('>d')
+    marker_field: bytes = b'_list'
+
+    def __init__(self, url: str, password: str, port: int, serializer: BaseSerializer):
         self.client: aioredis.client.Redis = aioredis.from_url(url, password=password, port=port)
+        self.serializer: BaseSerializer = serializer
+        self.refreshing: dict[str, asyncio.Task] = {}
+        self.get_list_script = self.client.register_script(GET_LIST_SCRIPT)
+        self.set_list_item_script = self.client.register_script(SET_LIST_ITEM_SCRIPT)
+        self.delete_list_item_script = self.client.register_script(DELETE_LIST_ITEM_SCRIPT)
+
+    def is_hash(self, key: str, value: Any = None) -> bool:
+        """Check that the list by key is stored as a hash, and the value is a list of objects if it is given"""
+        if settings.CACHE_LIST_LAYOUT != 'hash' or not self.is_list_key(key):
+            return False
+        return value is None or isinstance(value, list) and all(isinstance(item, BaseIdSchema) for item in value)
+
+    async def get(self, key: str, refresh: Callable[[], Awaitable[None]] | None = None) -> Any:
+        """Get value from redis by key
 
-    async def get(self, key: str) -> Any:
-        """Get value from redis by key"""
+        The stale value is returned as is, and the refresh is scheduled in background.
+        Lists of the hash layout have no stale time.
+        """
+        if self.is_hash(key):
+            return await self.get_list(key)
         dict_bytes: bytes | None = await self.client.get(key)
         if dict_bytes is None:
             return None
-        return pickle.loads(dict_bytes)
+        soft_expire_at, = self.stale_header.unpack_from(dict_bytes)
+        if refresh is not None and soft_expire_at < time.time():
+            await self.schedule_refresh(key, refresh)
+        return serializers.loads(dict_bytes[self.stale_header.size:])
+
+    async def get_many(self, *keys: str) -> list[Any]:
+        """Get values from redis by keys in a single round trip"""
+        if not keys:
+            return []
+        if any(self.is_hash(key) for key in keys):
+            return [await self.get(key) for key in keys]
+        return [
+            None if dict_bytes is None else serializers.loads(dict_bytes[self.stale_header.size:])
+            for dict_bytes in await self.client.mget(keys)
+        ]
+
+    def dump(self, value: Any, policy: CachePolicy) -> tuple[bytes, int] | None:
+        """Serialize value after its soft expiry time and return it with its expiry in seconds.
+
+        Values larger than max size of the policy or without lifetime are not cached, so None is returned.
+        """
+        serializer: BaseSerializer = serializers.raw_serializer if isinstance(value, bytes) else self.serializer
+        data: bytes = serializer.dumps(value)
+        lifetime: int = policy.ttl()
+        # redis rejects expiry of 0 seconds
+        if not policy.admits(len(data)) or lifetime + policy.stale_lifetime <= 0:
+            return None
+        return self.stale_header.pack(time.time() + lifetime) + data, lifetime + policy.stale_lifetime
+
+    def dump_list(self, items: list[BaseIdSchema], policy: CachePolicy) -> tuple[dict[bytes, bytes], int] | None:
+        """Serialize objects of the list to fields of the hash and return them with expiry of the list in seconds"""
+        fields: dict[bytes, bytes] = {str(item.id).encode(): self.serializer.dumps(item) for item in items}
+        expire: int = policy.ttl() + policy.stale_lifetime
+        if not policy.admits(sum(len(data) for data in fields.values())) or expire <= 0:
+            return None
+        fields[self.marker_field] = b''
+        return fields, expire
+
+    def load_list(self, pairs: list[bytes]) -> list[Any] | None:
+        """Load objects of the list from fields of the hash in order of their IDs"""
+        items: list[Any] = [
+            serializers.loads(data)
+            for field, data in sorted(zip(pairs[::2], pairs[1::2]))
+            if field != self.marker_field
+        ]
+        # objects of another version of schemas
+        return None if any(item is None for item in items) else items
+
+    async def get_list(self, key: str) -> list[Any] | None:
+        """Get the list stored as a hash or as a serialized value by key"""
+        reply: list[Any] | None = await self.get_list_script(keys=[key])
+        if reply is None:
+            return None
+        is_hash, data = reply
+        if is_hash:
+            return self.load_list(data)
+        return serializers.loads(data[self.stale_header.size:])
+
+    @staticmethod
+    def write_list(pipe: aioredis.client.Pipeline, key: str, fields: dict[bytes, bytes], expire: int) -> None:
+        pipe.delete(key)
+        pipe.hset(key, mapping=fields)
+        pipe.expire(key, expire)
 
-    async def set(self, key: str, value: Any) -> None:
-        """Set value to redis by key"""
+    async def set(self, key: str, value: Any, policy: CachePolicy | None = None) -> bool:
+        """Set value to redis by key and return whether it is cached
+
+        The value stays in redis as stale for stale lifetime after its lifetime with jitter.
+        """
         if value is None:
+            return False
+        if self.is_hash(key, value):
+            dumped_list: tuple[dict[bytes, bytes], int] | None = self.dump_list(value, policy or default_policy())
+            if dumped_list is None:
+                return False
+            fields, expire = dumped_list
+            async with self.client.pipeline(transaction=True) as pipe:
+                self.write_list(pipe, key, fields, expire)
+                await pipe.execute()
+            return True
+        item: tuple[bytes, int] | None = self.dump(value, policy or default_policy())
+        if item is None:
+            return False
+        await self.client.set(key, item[0], ex=item[1])
+        return True
+
+    async def set_many(self, *items: tuple[str, Any, CachePolicy]) -> list[str]:
+        """Set values to redis in a single round trip and return keys of cached values
+
+        Items are tuples of key, value and policy of the value.
+        """
+        dumped: list[tuple[str, tuple[bytes, int]]] = [
+            (key, item) for key, value, policy in items
+            if value is not None and not self.is_hash(key, value) and (item := self.dump(value, policy)) is not None
+        ]
+        lists: list[tuple[str, tuple[dict[bytes, bytes], int]]] = [
+            (key, listed) for key, value, policy in items
+            if value is not None and self.is_hash(key, value) and (listed := self.dump_list(value, policy)) is not None
+        ]
+        if not dumped and not lists:
+            return []
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key, (data, expire) in dumped:
+                pipe.set(key, data, ex=expire)
+            for key, (fields, expire) in lists:
+                self.write_list(pipe, key, fields, expire)
+            await pipe.execute()
+        return [key for key, _ in dumped] + [key for key, _ in lists]
+
+    async def schedule_refresh(self, key: str, refresh: Callable[[], Awaitable[None]]) -> None:
+        """Run refresh of the stale value in background once between processes"""
+        if key in self.refreshing:
+            return
+        if not await self.client.set(f'refresh_{key}', 1, nx=True, ex=int(settings.CACHE_LOCK_TIMEOUT)):
+            return
+        self.refreshing[key] = asyncio.create_task(self.run_refresh(refresh))
+        self.refreshing[key].add_done_callback(lambda _: self.refreshing.pop(key, None))
+
+    @staticmethod
+    async def run_refresh(refresh: Callable[[], Awaitable[None]]) -> None:
+        await refresh()
+
+    async def claim(self, *keys: str) -> list[str]:
+        """Claim keys once between processes by setting them only if they do not exist"""
+        if not keys:
+            return []
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.set(f'claim_{key}', 1, nx=True, ex=settings.CACHE_CLAIM_LIFETIME)
+            claimed: list[bool | None] = await pipe.execute()
+        return [key for key, is_claimed in zip(keys, claimed) if is_claimed]
+
+    async def replace(self, key: str, value: Any, policy: CachePolicy | None = None) -> None:
+        """Set new value to redis by key and delete the rendered response of the old value
+
+        The old value is deleted if the new one is too large for the policy.
+        """
+        if self.is_hash(key, value):
+            fields: tuple[dict[bytes, bytes], int] | None = self.dump_list(value, policy or default_policy())
+            async with self.client.pipeline(transaction=True) as pipe:
+                if fields is None:
+                    pipe.delete(key)
+                else:
+                    self.write_list(pipe, key, *fields)
+                pipe.delete(self.response_key(key))
+                await pipe.execute()
+            return
+        item: tuple[bytes, int] | None = self.dump(value, policy or default_policy())
+        async with self.client.pipeline(transaction=True) as pipe:
+            if item is None:
+                pipe.delete(key)
+            else:
+                pipe.set(key, item[0], ex=item[1])
+            pipe.delete(self.response_key(key))
+            await pipe.execute()
+
+    async def set_list_item(self, key: str, item: BaseIdSchema, policy: CachePolicy | None = None) -> None:
+        """Set the object to its field of the list by key and delete the rendered response of the list"""
+        if not self.is_hash(key):
+            await super().set_list_item(key, item, policy=policy)
             return
-        await self.client.set(key, pickle.dumps(value), ex=settings.CACHE_LIFETIME)
+        await self.set_list_item_script(
+            keys=[key, self.response_key(key)],
+            args=[str(item.id), self.serializer.dumps(item)],
+        )
+
+    async def delete_list_item(self, key: str, item_id: UUID, policy: CachePolicy | None = None) -> None:
+        """Delete the field of the object from the list by key and delete the rendered response of the list"""
+        if not self.is_hash(key):
+            await super().delete_list_item(key, item_id, policy=policy)
+            return
+        await self.delete_list_item_script(keys=[key, self.response_key(key)], args=[str(item_id)])
 
     async def delete(self, key: str) -> None:
         """Delete value from redis by key"""
@@ -30,7 +268,7 @@ class RadisCacheService(BaseCacheService):
 
     async def find_keys(self, pattern: str) -> list[str]:
         """Return all found keys in redis by pattern"""
-        return await self.client.keys(pattern)
+        return [key.decode() for key in await self.client.keys(pattern)]
 
     async def del_by_pattens(self, *patterns: str) -> None:
         """Delete all values from redis by patterns of keys"""
@@ -39,10 +277,57 @@ class RadisCacheService(BaseCacheService):
             keys.update(
                 await self.find_keys(pattern)
             )
-        for key in keys:
-            await self.delete(key)
+        if keys:
+            await self.client.delete(*keys)
+
+    @contextlib.asynccontextmanager
+    async def lock(self, key: str) -> AsyncIterator[None]:
+        """Lock loading of the value by key between processes.
+
+        If the lock is not acquired in time, the value is loaded without it.
+        """
+        lock = self.client.lock(
+            f'lock_{key}', timeout=settings.CACHE_LOCK_TIMEOUT, blocking_timeout=settings.CACHE_LOCK_TIMEOUT
+        )
+        acquired: bool = await lock.acquire()
+        try:
+            yield
+        finally:
+            if acquired:
+                with contextlib.suppress(LockError):
+                    await lock.release()
+
+    async def get_generations(self, *namespaces: str) -> list[int]:
+        """Get current generations of namespaces by their keys"""
+        values: list[bytes | None] = await self.client.mget(namespaces)
+        return [int(value) if value is not None else 0 for value in values]
+
+    async def invalidate(self, *keys: str) -> None:
+        """Invalidate cache by keys in a single round trip.
+
+        Keys of namespaces are incremented, so all values in the namespace become unreachable
+        and expire by their lifetime. Other keys are deleted with rendered responses of their values.
+        Counters of namespaces never expire: a counter restarted from 0 would reuse old generations
+        and make values still cached under them reachable again.
+        """
+        values_keys: list[str] = [
+            variant for key in keys if not self.is_namespace_key(key) for variant in (key, self.response_key(key))
+        ]
+        namespaces: list[str] = [key for key in keys if self.is_namespace_key(key)]
+        if not values_keys and not namespaces:
+            return
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            if values_keys:
+                pipe.delete(*values_keys)
+            for namespace in namespaces:
+                pipe.incr(namespace)
+            await pipe.execute()
 
 
 redis_service = RadisCacheService(
-    url=f'redis://{settings.REDIS_CACHE_HOST}', password=settings.REDIS_CACHE_PASSWORD, port=settings.REDIS_CACHE_PORT
+    url=f'redis://{settings.REDIS_CACHE_HOST}',
+    password=settings.REDIS_CACHE_PASSWORD,
+    port=settings.REDIS_CACHE_PORT,
+    serializer=serializers.serializers[settings.CACHE_SERIALIZER],
 )
@@ -0,0 +1,106 @@
+import functools
+import json
+import pickle
+import struct
+from abc import ABC, abstractmethod
+from typing import Any
+
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import to_json
+
+from core import schemas
+from core.settings import settings
+
+
+class BaseSerializer(ABC):
+    """Serializer of cached values.
+
+    Every entry starts with a header: kind of serializer, version of schemas, flag of a list of schemas
+    and length of the schema name. Entries of another version of schemas are not loaded.
+    """
+
+    kind: bytes
+    header: struct.Struct = struct.Struct('>cHBB')
+
+    @abstractmethod
+    def dumps(self, value: Any) -> bytes:
+        pass
+
+    @abstractmethod
+    def loads(self, data: bytes, schema_name: str, many: bool) -> Any:
+        pass
+
+    def pack_header(self, schema_name: str = '', many: bool = False) -> bytes:
+        return self.header.pack(self.kind, settings.CACHE_SCHEMA_VERSION, many, len(schema_name)) + schema_name.encode()
+
+
+class PickleSerializer(BaseSerializer):
+    kind = b'p'
+
+    def dumps(self, value: Any) -> bytes:
+        return self.pack_header() + pickle.dumps(value)
+
+    def loads(self, data: bytes, schema_name: str, many: bool) -> Any:
+        return pickle.loads(data)
+
+
+class JSONSerializer(BaseSerializer):
+    """Serializer of schemas to JSON by pydantic without intermediate dicts"""
+
+    kind = b'j'
+
+    @staticmethod
+    @functools.lru_cache
+    def adapter(schema: type[BaseModel], many: bool) -> TypeAdapter:
+        return TypeAdapter(list[schema] if many else schema)  # type: ignore[valid-type]
+
+    def dumps(self, value: Any) -> bytes:
+        if isinstance(value, BaseModel):
+            return self.pack_header(type(value).__name__) + self.adapter(type(value), False).dump_json(value)
+        if isinstance(value, list) and value and isinstance(value[0], BaseModel):
+            schema: type[BaseModel] = type(value[0])
+            return self.pack_header(schema.__name__, many=True) + self.adapter(schema, True).dump_json(value)
+        return self.pack_header() + to_json(value)
+
+    def loads(self, data: bytes, schema_name: str, many: bool) -> Any:
+        if not schema_name:
+            return json.loads(data)
+        schema: type[BaseModel] | None = getattr(schemas, schema_name, None)
+        if schema is None:
+            return None
+        return self.adapter(schema, many).validate_json(data)
+
+
+class RawSerializer(BaseSerializer):
+    """Serializer of bytes as is, e.g. rendered bodies of responses"""
+
+    kind = b'r'
+
+    def dumps(self, value: bytes) -> bytes:
+        return self.pack_header() + value
+
+    def loads(self, data: bytes, schema_name: str, many: bool) -> bytes:
+        return data
+
+
+raw_serializer: RawSerializer = RawSerializer()
+
+serializers: dict[str, BaseSerializer] = {
+    'pickle': PickleSerializer(),
+    'json': JSONSerializer(),
+}
+
+serializers_by_kind: dict[bytes, BaseSerializer] = {
+    serializer.kind: serializer for serializer in (*serializers.values(), raw_serializer)
+}
+
+
+def loads(data: bytes) -> Any:
+    """Load value by the serializer it was dumped with. Return None for entries of another version"""
+    kind, version, many, name_length = BaseSerializer.header.unpack_from(data)
+    serializer: BaseSerializer | None = serializers_by_kind.get(kind)
+    if serializer is None or version != settings.CACHE_SCHEMA_VERSION:
+        return None
+    offset: int = BaseSerializer.header.size + name_length
+    schema_name: str = data[BaseSerializer.header.size:offset].decode()
+    return serializer.loads(data[offset:], schema_name=schema_name, many=bool(many))
@@ -0,0 +1,250 @@
+import contextlib
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import time
+from typing import Any, Iterator
+
+from core.services import serializers
+from core.services.local_cache import LocalCacheService
+from core.services.redis import RadisCacheService
+from core.services.serializers import BaseSerializer
+
+
+class SharedMemorySegment:
+    """Hash table of bytes by keys in a memory-mapped file shared by processes of the host.
+
+    Keys are hashed to sets of slots, the least recently used slot of the set is replaced.
+    Readers do not lock: the sequence of the slot is odd while the slot is written,
+    so the read is retried if the sequence has changed. Writers are serialized by flock of the file.
+    The file of another layout is replaced by a new one, processes which still map it keep the old file.
+    """
+
+    magic: bytes = b'RMCACHE1'
+    # magic, count of sets, slots in a set, size of a slot
+    header: struct.Struct = struct.Struct('=8sIII')
+    header_size: int = 64
+    # time of the last clear, after the header
+    cleared_at: struct.Struct = struct.Struct('=d')
+    cleared_at_offset: int = 32
+    # sequence, length of value, hash of key, expiry time, last use time, length of key
+    slot_header: struct.Struct = struct.Struct('=IIQdqH')
+    sequence: struct.Struct = struct.Struct('=I')
+    last_used: struct.Struct = struct.Struct('=q')
+    last_used_offset: int = 24
+    ways: int = 8
+    retries: int = 3
+
+    def __init__(self, path: str, sets: int, slot_size: int):
+        self.sets: int = sets
+        self.slot_size: int = slot_size
+        self.capacity: int = slot_size - self.slot_header.size
+        self.size: int = self.header_size + sets * self.ways * slot_size
+        self.fd: int = self.open(path, self.header.pack(self.magic, sets, self.ways, slot_size))
+        self.buffer: mmap.mmap = mmap.mmap(self.fd, self.size)
+
+    @property
+    def layout(self) -> str:
+        """Version of the layout of the file"""
+        return f'{self.magic.decode().lower()}-{self.sets}x{self.ways}x{self.slot_size}'
+
+    def open(self, path: str, header: bytes) -> int:
+        """Open the file of the segment with the header of the layout.
+
+        The live file is never truncated: the file of another layout is replaced by a new one,
+        and the file replaced by another process meanwhile is opened again.
+        """
+        while True:
+            fd: int = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                    if os.fstat(fd).st_size == self.size and os.pread(fd, self.header.size, 0) == header:
+                        return fd
+                    self.create(path, header)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def create(self, path: str, header: bytes) -> None:
+        """Make the file of the layout filled by zeros next to the segment and rename it into place"""
+        new_path: str = f'{path}.{self.layout}'
+        fd: int = os.open(new_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, self.size)
+            os.pwrite(fd, header, 0)
+        finally:
+            os.close(fd)
+        os.rename(new_path, path)
+
+    @contextlib.contextmanager
+    def locked(self) -> Iterator[None]:
+        """Lock the segment for writing between processes"""
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def hash(key: bytes) -> int:
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little')
+
+    def offsets(self, key_hash: int) -> range:
+        """Offsets of slots of the set by hash of key"""
+        start: int = self.header_size + key_hash % self.sets * self.ways * self.slot_size
+        return range(start, start + self.ways * self.slot_size, self.slot_size)
+
+    def get(self, key: str) -> bytes | None:
+        """Get bytes by key without locking"""
+        key_bytes: bytes = key.encode()
+        key_hash: int = self.hash(key_bytes)
+        for offset in self.offsets(key_hash):
+            for _ in range(self.retries):
+                sequence, length, slot_hash, expire_at, _, key_length = self.slot_header.unpack_from(
+                    self.buffer, offset
+                )
+                if sequence % 2 or key_length + length > self.capacity:
+                    # the slot is being written
+                    continue
+                if slot_hash != key_hash or not length:
+                    break
+                start: int = offset + self.slot_header.size
+                found_key: bytes = self.buffer[start:start + key_length]
+                data: bytes = self.buffer[start + key_length:start + key_length + length]
+                if self.sequence.unpack_from(self.buffer, offset)[0] != sequence:
+                    continue
+                if found_key != key_bytes or expire_at < time.time():
+                    break
+                self.last_used.pack_into(self.buffer, offset + self.last_used_offset, time.monotonic_ns())
+                return data
+        return None
+
+    def set(self, key: str, data: bytes, lifetime: float) -> bool:
+        """Set bytes by key and return whether they fit into a slot"""
+        key_bytes: bytes = key.encode()
+        if len(key_bytes) + len(data) > self.capacity:
+            return False
+        key_hash: int = self.hash(key_bytes)
+        with self.locked():
+            self.write(self.find_slot(key_hash, key_bytes), key_hash, key_bytes, data, time.time() + lifetime)
+        return True
+
+    def delete(self, *keys: str) -> None:
+        """Delete bytes by keys"""
+        with self.locked():
+            for key in keys:
+                key_bytes: bytes = key.encode()
+                key_hash: int = self.hash(key_bytes)
+                offset: int = self.find_slot(key_hash, key_bytes)
+                if self.match(offset, key_hash, key_bytes):
+                    self.write(offset, 0, b'', b'', 0)
+
+    def clear(self, since: float | None = None) -> None:
+        """Delete all values unless another process has cleared the segment since the given time"""
+        with self.locked():
+            if since is not None and self.cleared_at.unpack_from(self.buffer, self.cleared_at_offset)[0] >= since:
+                return
+            self.cleared_at.pack_into(self.buffer, self.cleared_at_offset, time.time())
+            for offset in range(self.header_size, self.size, self.slot_size):
+                if self.slot_header.unpack_from(self.buffer, offset)[1]:
+                    self.write(offset, 0, b'', b'', 0)
+
+    def match(self, offset: int, key_hash: int, key: bytes) -> bool:
+        """Check that the slot holds the value by key, the segment must be locked"""
+        _, length, slot_hash, _, _, key_length = self.slot_header.unpack_from(self.buffer, offset)
+        start: int = offset + self.slot_header.size
+        return bool(length) and slot_hash == key_hash and self.buffer[start:start + key_length] == key
+
+    def find_slot(self, key_hash: int, key: bytes) -> int:
+        """Find the slot of the key, or a free slot, or the least recently used slot of the set"""
+        now: float = time.time()
+        victim: int | None = None
+        victim_used: int = 0
+        for offset in self.offsets(key_hash):
+            if self.match(offset, key_hash, key):
+                return offset
+            _, length, _, expire_at, last_used, _ = self.slot_header.unpack_from(self.buffer, offset)
+            if not length or expire_at < now:
+                last_used = -1
+            if victim is None or last_used < victim_used:
+                victim, victim_used = offset, last_used
+        return victim  # type: ignore[return-value]
+
+    def write(self, offset: int, key_hash: int, key: bytes, data: bytes, expire_at: float) -> None:
+        """Write the slot between odd and even sequences, the segment must be locked"""
+        sequence: int = self.sequence.unpack_from(self.buffer, offset)[0]
+        self.sequence.pack_into(self.buffer, offset, (sequence + 1) % 2 ** 32)
+        self.slot_header.pack_into(
+            self.buffer, offset, (sequence + 1) % 2 ** 32, len(data), key_hash, expire_at, time.monotonic_ns(), len(key)
+        )
+        start: int = offset + self.slot_header.size
+        self.buffer[start:start + len(key) + len(data)] = key + data
+        self.sequence.pack_into(self.buffer, offset, (sequence + 2) % 2 ** 32)
+
+    def close(self) -> None:
+        self.buffer.close()
+        os.close(self.fd)
+
+
+class SharedMemoryCacheService(LocalCacheService):
+    """Cache in shared memory of the host in front of redis.
+
+    Worker processes of the host read the same serialized values from the memory-mapped segment
+    without requests to redis. Evictions are seen by all processes of the host at once,
+    invalidations are also broadcast on the redis pub/sub channel for other hosts.
+    Values larger than a slot are kept only in redis.
+    The segment is mapped on startup, values are requested from redis until then.
+    """
+
+    def __init__(
+        self, backend: RadisCacheService, path: str, sets: int, slot_size: int, lifetime: int, channel: str
+    ):
+        super().__init__(backend=backend, max_size=0, lifetime=lifetime, channel=channel)
+        self.path: str = path
+        self.sets: int = sets
+        self.slot_size: int = slot_size
+        self.segment: SharedMemorySegment | None = None
+
+    def get_local(self, key: str) -> Any:
+        """Get value from shared memory by key"""
+        if self.segment is None:
+            return None
+        data: bytes | None = self.segment.get(key)
+        return None if data is None else serializers.loads(data)
+
+    def set_local(self, key: str, value: Any, lifetime: int | None = None) -> None:
+        """Set value to shared memory by key with eviction of the least recently used value of its set"""
+        if self.segment is None:
+            return
+        lifetime = self.lifetime if lifetime is None else min(lifetime, self.lifetime)
+        serializer: BaseSerializer = serializers.raw_serializer if isinstance(value, bytes) else self.backend.serializer
+        self.segment.set(key, serializer.dumps(value), lifetime)
+
+    def evict(self, *keys: str) -> None:
+        """Delete values and rendered responses of values from shared memory by keys"""
+        if self.segment is not None:
+            self.segment.delete(*keys, *(self.response_key(key) for key in keys))
+
+    def clear_local(self, lost_at: float | None = None) -> None:
+        """Delete all values from shared memory if messages could be lost by all processes of the host
+
+        The first subscription of the process keeps values: the segment is kept up to date
+        by other processes of the host, and values left by a previous run expire by lifetime.
+        After a lost subscription the segment is cleared once, unless another process
+        has already cleared it after this one lost its subscription.
+        """
+        if self.segment is not None and lost_at is not None:
+            self.segment.clear(since=lost_at)
+
+    async def startup(self) -> None:
+        self.segment = SharedMemorySegment(path=self.path, sets=self.sets, slot_size=self.slot_size)
+        await super().startup()
+
+    async def shutdown(self) -> None:
+        await super().shutdown()
+        if self.segment is not None:
+            self.segment.close()
+            self.segment = None
@@ -0,0 +1,26 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+
+class SingleFlight:
+    """Coalescing of concurrent calls with the same key into a single call.
+
+    Callers of the key wait for the call in flight and get its result or exception.
+    """
+
+    def __init__(self):
+        self.calls: dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Call func or wait for the call in flight by key"""
+        call: asyncio.Future | None = self.calls.get(key)
+        if call is None:
+            call = asyncio.ensure_future(func())
+            self.calls[key] = call
+            call.add_done_callback(lambda done: self.forget(key, done))
+        # cancelling of a caller must not cancel the call for other callers
+        return await asyncio.shield(call)
+
+    def forget(self, key: str, call: asyncio.Future) -> None:
+        if self.calls.get(key) is call:
+            del self.calls[key]
@@ -1,60 +1,70 @@
+import functools
 from uuid import UUID
 
 from fastapi import BackgroundTasks, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core import constants, models, repositories, schemas, services
-from core.services.base import BaseObjectService
+from core.services.base import (
+    BaseObjectService,
+    add_item,
+    change_counts,
+    remove_item,
+    replace_item,
+    update_fields,
+)
+from core.services.cache_policy import CachePolicy, get_policy
+from core.services.cached import (
+    build_entity_key,
+    cached,
+    generate_entity_key,
+    get_pages_namespace,
+)
+from core.services.pagination import Page
+from core.settings import settings
 
 
 class SubmenusService(BaseObjectService):
-    @staticmethod
-    def gen_key(menu_id: UUID | str, submenu_id: UUID | str = '*', many=False) -> str:
-        """Generate a key of cache for submenu and a list of submenus"""
-        return f'submenu_{menu_id}_{"list" if many else submenu_id}'
+    entity: str = constants.SUBMENU
+
+    async def gen_key(self, menu_id: UUID, submenu_id: UUID | None = None, many=False) -> str:
+        """Generate a key of cache for submenu and a list of submenus
 
-    async def get_submenu_list(self, db: AsyncSession, menu_id: UUID) -> list[schemas.ResponseSubmenuSchema]:
-        """Get a list of submenus in menu."""
+        The key contains generation of the menu's namespace.
+        """
+        return await generate_entity_key(self.entity, many=many, menu_id=menu_id, submenu_id=submenu_id)
 
-        submenu_list_key: str = self.gen_key(menu_id=menu_id, many=True)
-        submenu_list_cache: list[schemas.ResponseSubmenuSchema] = await services.redis_service.get(submenu_list_key)
-        if submenu_list_cache is not None:
-            return submenu_list_cache
+    @staticmethod
+    def build_key(menu_id: UUID, menu_generation: int, submenu_id: UUID | None = None, many=False) -> str:
+        """Build a key of cache for submenu and a list of submenus by known generation"""
+        return build_entity_key(
+            constants.SUBMENU, (menu_generation,), {'menu_id': menu_id, 'submenu_id': submenu_id}, many=many
+        )
 
+    @cached(constants.SUBMENU, response_type=list[schemas.ResponseSubmenuSchema], many=True)
+    async def get_submenu_list(
+        self, db: AsyncSession, menu_id: UUID, page: Page = Page()
+    ) -> list[schemas.ResponseSubmenuSchema]:
+        """Get a list or a page of submenus in menu ordered by IDs."""
         await services.menus_service.get_menu_by_id_or_404(db=db, menu_id=menu_id)
         submenu_list: list[models.SubmenuDBModel] = await self.repository.get_mul_by_fields(
-            db=db, fields={'menu_id': menu_id}
+            db=db, fields={'menu_id': menu_id}, after=page.after, limit=page.limit
         )
-        response_submenu_list: list[schemas.ResponseSubmenuSchema] = [
-            schemas.ResponseSubmenuSchema(**obj.to_dict()) for obj in submenu_list
-        ]
-        await services.redis_service.set(submenu_list_key, response_submenu_list)
-
-        return response_submenu_list
+        return [schemas.ResponseSubmenuSchema(**obj.to_dict()) for obj in submenu_list]
 
+    @cached(constants.SUBMENU, response_type=schemas.ResponseSubmenuWithCountSchema)
     async def get_submenu(
         self, db: AsyncSession, menu_id: UUID, submenu_id: UUID
     ) -> schemas.ResponseSubmenuWithCountSchema:
-        """Get submenu data by IDs of menu and submenu."""
-
-        submenu_key: str = self.gen_key(menu_id=menu_id, submenu_id=submenu_id)
-        cache_submenu: schemas.ResponseSubmenuWithCountSchema = await services.redis_service.get(submenu_key)
-        if cache_submenu is not None:
-            return cache_submenu
-
-        submenu: tuple[models.SubmenuDBModel, int] | None = await self.repository.get_submenu_with_dish_count(
+        """Get submenu data with a count of dishes by IDs of menu and submenu."""
+        submenu: models.SubmenuDBModel | None = await self.repository.get_submenu_with_dish_count(
             db=db, submenu_id=submenu_id, menu_id=menu_id
         )
 
         if submenu is None:
             raise HTTPException(status_code=404, detail='submenu not found')
 
-        response_submenu: schemas.ResponseSubmenuWithCountSchema = schemas.ResponseSubmenuWithCountSchema(
-            **submenu[0].to_dict(), dishes_count=submenu[1] if submenu[1] is not None else 0
-        )
-        await services.redis_service.set(submenu_key, response_submenu)
-
-        return response_submenu
+        return schemas.ResponseSubmenuWithCountSchema.model_validate(submenu)
 
     async def get_submenu_by_id_or_404(
         self, db: AsyncSession, menu_id: UUID, submenu_id: UUID
@@ -77,17 +87,27 @@ class SubmenusService(BaseObjectService):
         self, db: AsyncSession, menu_id: UUID, data: schemas.SubmenuSchema, bgtask: BackgroundTasks
     ) -> schemas.ResponseSubmenuSchema:
         """Create submenu in menu."""
-        await services.menus_service.get_menu_by_id_or_404(db=db, menu_id=menu_id)
         obj_in: schemas.SubmenuWithMenuIdSchema = schemas.SubmenuWithMenuIdSchema(**data.model_dump(), menu_id=menu_id)
-        submenu: models.SubmenuDBModel = await self.repository.create(db=db, obj_in=obj_in)
+        await self.record_invalidation(db, operation=constants.CREATE, menu_id=menu_id, submenu_id=None)
+        submenu: models.SubmenuDBModel | None = await self.repository.create_in_menu(
+            db=db, obj_in=obj_in, menu_id=menu_id
+        )
+
+        if submenu is None:
+            raise HTTPException(status_code=404, detail='menu not found')
+
+        await db.commit()
+        created_submenu: schemas.ResponseSubmenuSchema = schemas.ResponseSubmenuSchema(**submenu.to_dict())
 
         bgtask.add_task(
             self.clearing_cache_process,
             operation=constants.CREATE,
             menu_id=menu_id,
+            submenu_id=submenu.id,
+            submenu=created_submenu,
         )
 
-        return schemas.ResponseSubmenuSchema(**submenu.to_dict())
+        return created_submenu
 
     async def update_submenu(
         self,
@@ -98,27 +118,35 @@ class SubmenusService(BaseObjectService):
         bgtask: BackgroundTasks
     ) -> schemas.ResponseSubmenuSchema:
         """Update submenu data."""
-        sub_menu: models.SubmenuDBModel = await self.get_submenu_by_id_or_404(
-            db=db, menu_id=menu_id, submenu_id=submenu_id
+        await self.record_invalidation(db, operation=constants.UPDATE, menu_id=menu_id, submenu_id=submenu_id)
+        updated_submenu: models.SubmenuDBModel | None = await self.repository.update(
+            db=db, obj_id=submenu_id, obj_in=data, fields={'menu_id': menu_id}
         )
-        updated_submenu: models.SubmenuDBModel = await self.repository.update(db=db, db_obj=sub_menu, obj_in=data)
+
+        if updated_submenu is None:
+            raise HTTPException(status_code=404, detail='submenu not found')
+
+        await db.commit()
+        response_submenu: schemas.ResponseSubmenuSchema = schemas.ResponseSubmenuSchema(**updated_submenu.to_dict())
 
         bgtask.add_task(
             self.clearing_cache_process,
             operation=constants.UPDATE,
             menu_id=menu_id,
             submenu_id=submenu_id,
+            submenu=response_submenu,
         )
 
-        return schemas.ResponseSubmenuSchema(**updated_submenu.to_dict())
+        return response_submenu
 
     async def delete_submenu(self, db: AsyncSession, menu_id: UUID, submenu_id: UUID, bgtask: BackgroundTasks):
         """Delete submenu by IDs of menu adn submenu."""
-        sub_menu: models.SubmenuDBModel = await self.get_submenu_by_id_or_404(
-            db=db, menu_id=menu_id, submenu_id=submenu_id
-        )
+        await self.record_invalidation(db, operation=constants.DELETE, menu_id=menu_id, submenu_id=submenu_id)
+
+        if not await self.repository.delete_by_id(db=db, obj_id=submenu_id, fields={'menu_id': menu_id}):
+            raise HTTPException(status_code=404, detail='submenu not found')
 
-        await self.repository.delete_by_id(db=db, obj_id=sub_menu.id)
+        await db.commit()
 
         bgtask.add_task(
             self.clearing_cache_process,
@@ -127,38 +155,108 @@ class SubmenusService(BaseObjectService):
             submenu_id=submenu_id,
         )
 
-    async def clearing_cache_process(self, operation: str, menu_id: UUID, submenu_id: UUID | None = None) -> None:
-        """Clear cache after create, update, delete."""
-        patterns: list[str] = await self.clearing_cache_patterns(
-            operation=operation, menu_id=menu_id, submenu_id=submenu_id)
-        await services.redis_service.del_by_pattens(*patterns)
-
-    async def clearing_cache_patterns(self, operation: str, menu_id: UUID, submenu_id: UUID | None) -> list[str]:
-        """Generate patterns for key by operation type (create, update, delete)"""
-        if operation == constants.CREATE:
-            return [
-                services.menus_service.gen_key(menu_id=menu_id),
-                self.gen_key(menu_id=menu_id, many=True),
-            ]
-
-        if submenu_id is None:
-            return []
-
-        if operation == constants.UPDATE:
-            return [
-                self.gen_key(menu_id=menu_id, many=True),
-                self.gen_key(menu_id=menu_id, submenu_id=submenu_id),
-            ]
-
-        if operation == constants.DELETE:
-            return [
-                services.menus_service.gen_key(menu_id=menu_id),
-                self.gen_key(menu_id=menu_id, many=True),
-                self.gen_key(menu_id=menu_id, submenu_id=submenu_id),
-                services.dishes_service.gen_key(menu_id=menu_id, submenu_id=submenu_id)
+    async def clearing_cache_process(
+        self,
+        operation: str,
+        menu_id: UUID,
+        submenu_id: UUID | None = None,
+        submenu: schemas.ResponseSubmenuSchema | None = None,
+    ) -> None:
+        """Clear cache after create, update, delete.
+
+        With the hash layout of lists the written object is set to its cached list.
+        In write-through mode cached entries are updated by the written submenu instead.
+        With the outbox keys are recorded with the changes, so the outbox is drained.
+        The read model refreshes the subtree of the menu.
+        With change capture all of it is done by the listener of database changes.
+        """
+        if settings.CACHE_CHANGE_CAPTURE:
+            return
+        await services.read_model.notify(menu_id)
+        if settings.CACHE_OUTBOX_ENABLED:
+            await services.outbox_dispatcher.dispatch()
+            return
+        if settings.CACHE_WRITE_THROUGH:
+            keys: list[str] = [
+                *await self.write_through(
+                    operation=operation, menu_id=menu_id, submenu_id=submenu_id, submenu=submenu
+                ),
+                get_pages_namespace(self.entity, {'menu_id': menu_id}),
             ]
-
-        return []
+        else:
+            keys = await self.write_list_item(
+                await self.clearing_cache_patterns(operation=operation, menu_id=menu_id, submenu_id=submenu_id),
+                operation,
+                submenu,
+                menu_id=menu_id,
+                submenu_id=submenu_id,
+            )
+        await services.cache_service.invalidate(*keys)
+
+    async def write_through(
+        self, operation: str, menu_id: UUID, submenu_id: UUID | None, submenu: schemas.ResponseSubmenuSchema | None
+    ) -> list[str]:
+        """Write the submenu to cached entries and return keys which still have to be invalidated
+
+        Counts of the menu are changed only when submenus of the menu change.
+        """
+        await self.fence_writes()
+        list_key: str = await self.gen_key(menu_id=menu_id, many=True)
+        menu_key: str = services.menus_service.gen_key(menu_id=menu_id)
+        # the fragment of the menu and the whole rendered tree
+        tree_keys: list[str] = [
+            services.menus_service.gen_tree_key(menu_id=menu_id), services.menus_service.gen_tree_key()
+        ]
+        policy: CachePolicy = get_policy(constants.SUBMENU)
+        list_policy: CachePolicy = get_policy(constants.SUBMENU, many=True)
+
+        if operation == constants.CREATE and submenu is not None:
+            await services.cache_service.replace(
+                await self.gen_key(menu_id=menu_id, submenu_id=submenu.id),
+                schemas.ResponseSubmenuWithCountSchema(**submenu.model_dump(), dishes_count=0),
+                policy=policy,
+            )
+            await services.cache_service.replace(
+                await services.dishes_service.gen_key(menu_id=menu_id, submenu_id=submenu.id, many=True),
+                [],
+                policy=get_policy(constants.DISH, many=True),
+            )
+            await self.patch_cache(list_key, functools.partial(add_item, obj=submenu), list_policy)
+            await self.patch_cache(menu_key, change_counts(submenus_count=1), get_policy(constants.MENU))
+            return tree_keys
+
+        if operation == constants.UPDATE and submenu is not None:
+            await self.patch_cache(
+                await self.gen_key(menu_id=menu_id, submenu_id=submenu.id),
+                update_fields(submenu),
+                policy,
+            )
+            await self.patch_cache(
+                list_key, functools.partial(replace_item, obj=submenu), list_policy
+            )
+            return tree_keys
+
+        if operation == constants.DELETE and submenu_id is not None:
+            keys: list[str] = await self.clearing_cache_patterns(
+                operation=operation, menu_id=menu_id, submenu_id=submenu_id
+            )
+            await self.patch_cache(
+                list_key, functools.partial(remove_item, obj_id=submenu_id), list_policy
+            )
+            deleted: schemas.ResponseSubmenuWithCountSchema | None = await services.cache_service.get(
+                await self.gen_key(menu_id=menu_id, submenu_id=submenu_id)
+            )
+            if not isinstance(deleted, schemas.ResponseSubmenuWithCountSchema):
+                # dishes of the submenu are unknown, the menu is loaded again
+                return [key for key in keys if key != list_key]
+            await self.patch_cache(
+                menu_key,
+                change_counts(submenus_count=-1, dishes_count=-deleted.dishes_count),
+                get_policy(constants.MENU),
+            )
+            return [key for key in keys if key not in (list_key, menu_key)]
+
+        return await self.clearing_cache_patterns(operation=operation, menu_id=menu_id, submenu_id=submenu_id)
 
 
 submenus_service: SubmenusService = SubmenusService(repositories.submenus)
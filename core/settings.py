@@ -10,6 +10,10 @@ class Settings(BaseSettings):
     CONTACT_EMAIL: str = 'fisheriusby@gmail.com'
     SUMMARY: str = 'This is project as a result of YLab`s intensive course'
 
+    # pages of lists requested by limit or cursor, without them the whole list is returned
+    API_PAGE_SIZE_DEFAULT: int = 50
+    API_PAGE_SIZE_MAX: int = 500
+
     SQLALCHEMY_DATABASE_URL: str
 
     SQLALCHEMY_SYNC_DATABASE_URL: str
@@ -20,12 +24,108 @@ class Settings(BaseSettings):
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
 
+    # pool of database connections of the process: size + max overflow connections at most
+    DB_POOL_SIZE: int = 10
+    DB_POOL_MAX_OVERFLOW: int = 20
+    # seconds to wait for a free connection before the request fails
+    DB_POOL_TIMEOUT: float = 10
+    # seconds after which connections are reopened, -1 keeps them open
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # prepared statements cached per connection, 0 disables the cache (e.g. behind pgbouncer)
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_CONNECT_TIMEOUT: float = 10
+    DB_COMMAND_TIMEOUT: float = 30
+
     REDIS_CACHE_PASSWORD: str
     REDIS_CACHE_HOST: str
     REDIS_CACHE_PORT: int
 
     CACHE_LIFETIME: int = 60 * 5
 
+    # serializer of cached values: json or pickle
+    CACHE_SERIALIZER: str = 'json'
+    # increase it to drop cached values when schemas change
+    CACHE_SCHEMA_VERSION: int = 2
+
+    # seconds to cache not found objects, 0 disables it
+    CACHE_NOT_FOUND_LIFETIME: int = 0
+
+    # ETags and 304 Not Modified of read endpoints
+    HTTP_ETAG_ENABLED: bool = True
+    # Cache-Control header of read endpoints, empty to omit it
+    HTTP_CACHE_CONTROL: str = 'no-cache'
+
+    # update cached entries by written objects instead of deleting them
+    CACHE_WRITE_THROUGH: bool = False
+
+    # record keys to invalidate in the outbox table in the same transaction as changes of objects,
+    # the outbox is drained after responses and periodically by the worker, write-through is not used with it
+    CACHE_OUTBOX_ENABLED: bool = False
+    CACHE_OUTBOX_BATCH_SIZE: int = 500
+    CACHE_OUTBOX_DISPATCH_PERIODIC: int = 5
+
+    # write cache entries of menus, submenus and dishes after sync with the admin data source
+    CACHE_WARM_UP_AFTER_SYNC: bool = False
+
+    # layout of cached lists in redis: 'blob' of the serialized list or 'hash' with a field per object,
+    # with the hash layout changed objects are set to their lists instead of invalidating the lists
+    CACHE_LIST_LAYOUT: str = 'blob'
+
+    # cache JSON bodies of responses and return them without validation
+    CACHE_RESPONSE_BYTES: bool = False
+    # encodings of cached bodies in order of preference: 'br' (requires brotli) and 'gzip',
+    # bodies are compressed once per filling of cache and returned by Accept-Encoding as is
+    CACHE_RESPONSE_ENCODINGS: list[str] = []
+    # bodies smaller than it are not compressed
+    CACHE_RESPONSE_COMPRESS_MIN_SIZE: int = 1024
+    # keep uncompressed bodies alongside compressed ones, otherwise they are decompressed on request
+    CACHE_RESPONSE_KEEP_IDENTITY: bool = True
+
+    # backend of cache: 'redis' or 'memory' for single-process deployments without redis,
+    # invalidations of the memory backend do not reach other processes, e.g. the sync worker
+    CACHE_BACKEND: str = 'redis'
+    CACHE_MEMORY_MAX_SIZE: int = 100_000
+
+    # in-process cache in front of redis
+    CACHE_LOCAL_ENABLED: bool = False
+    CACHE_LOCAL_MAX_SIZE: int = 1024
+    CACHE_LOCAL_LIFETIME: int = 10
+    CACHE_INVALIDATION_CHANNEL: str = 'cache_invalidation'
+
+    # cache in shared memory of the host in front of redis for all worker processes,
+    # it takes precedence over the in-process cache, values larger than a slot are kept only in redis
+    CACHE_SHARED_ENABLED: bool = False
+    CACHE_SHARED_PATH: str = '/dev/shm/restaurant_menu_cache'
+    # sets of 8 slots, the least recently used slot of the set is replaced
+    CACHE_SHARED_SETS: int = 1024
+    CACHE_SHARED_SLOT_SIZE: int = 16 * 1024
+    CACHE_SHARED_LIFETIME: int = 10
+
+    # invalidation of cache by changes captured by triggers in database instead of invalidation after responses
+    CACHE_CHANGE_CAPTURE: bool = False
+    # changes received within the delay are coalesced, in seconds
+    CACHE_CHANGE_COALESCE_DELAY: float = 0.05
+    # changes are applied by the process which claimed them first, claims are kept for the lifetime in seconds
+    CACHE_CLAIM_LIFETIME: int = 60
+
+    # materialized tree of menus in memory of every process, reads are served from it without cache and database
+    READ_MODEL_ENABLED: bool = False
+    READ_MODEL_CHANNEL: str = 'read_model_changes'
+
+    # coalescing of cache misses between processes
+    CACHE_DISTRIBUTED_LOCK: bool = False
+    CACHE_LOCK_TIMEOUT: float = 5
+
+    # policies of cached values by entity and key type, e.g. {"dish_list": {"lifetime": 60, "max_size": 65536}},
+    # names are entities with '_list' for lists and 'all_in_one' for the tree,
+    # fields: lifetime, jitter, stale_lifetime, max_size of the serialized value in bytes,
+    # during stale lifetime after lifetime the stale value is returned and refreshed in background
+    CACHE_POLICIES: dict[str, dict[str, int]] = {}
+    # defaults of policies: random seconds added to lifetime and max serialized size, 0 disables it
+    CACHE_LIFETIME_JITTER: int = 30
+    CACHE_MAX_VALUE_SIZE: int = 1024 * 1024
+
     RABBITMQ_DEFAULT_USER: str
     RABBITMQ_DEFAULT_PASS: str
     RABBITMQ_HOST: str
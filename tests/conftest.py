@@ -63,6 +63,13 @@ async def async_session(mock_redis) -> AsyncGenerator[AsyncSession, None]:
         yield s
 
 
+@pytest_asyncio.fixture(scope='function')
+async def async_session_with_cache() -> AsyncGenerator[AsyncSession, None]:
+    """Generator for database sessions with real cache services."""
+    async with async_session_generator() as s:
+        yield s
+
+
 @pytest_asyncio.fixture
 async def async_session_without_clear() -> AsyncGenerator[AsyncGenerator, None]:
     async with async_session_generator(clear_db=False) as s:
@@ -129,11 +136,16 @@ async def mock_redis(monkeypatch) -> list:
         call_lst.append(('get', kwargs))
         return None
 
+    async def get_many_(self, *keys, **kwargs):
+        call_lst.append(('get_many', kwargs))
+        return [None] * len(keys)
+
     async def del_(*args, **kwargs):
         call_lst.append(('delete', kwargs))
 
     monkeypatch.setattr('core.services.redis.RadisCacheService.set', set_)
     monkeypatch.setattr('core.services.redis.RadisCacheService.get', get_)
+    monkeypatch.setattr('core.services.redis.RadisCacheService.get_many', get_many_)
     monkeypatch.setattr('core.services.redis.RadisCacheService.delete', del_)
 
     return call_lst
@@ -0,0 +1,1348 @@
+import asyncio
+import functools
+import gzip
+import json
+import time
+from pathlib import Path
+from typing import Any
+from uuid import UUID, uuid4
+
+import asyncpg
+import pytest
+from fastapi import BackgroundTasks, HTTPException, Response
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.datastructures import MutableHeaders
+
+from core import constants, repositories, schemas, services
+from core.models import change_capture
+from core.services import base, encodings, serializers
+from core.services.admin_xls import XLSAdminService
+from core.services.base import BaseObjectService
+from core.services.cache_policy import CachePolicy, get_policy
+from core.services.cached import build_entity_key, cached
+from core.services.change_capture import ChangeListener
+from core.services.local_cache import LocalCacheService
+from core.services.memory import MemoryCacheService
+from core.services.pagination import (
+    NEXT_CURSOR_HEADER,
+    Page,
+    decode_cursor,
+    encode_cursor,
+    page_headers,
+    paginate,
+)
+from core.services.read_model import MenuNode, ReadModel, SubmenuNode
+from core.services.shared_memory import SharedMemoryCacheService, SharedMemorySegment
+from core.services.single_flight import SingleFlight
+from core.settings import settings
+
+
+class TestCacheNamespaces:
+    @pytest.mark.asyncio
+    async def test_delete_menu_invalidates_subtree(self):
+        """Testing deleting of menu makes keys of its submenus and dishes unreachable."""
+        menu_id, submenu_id, dish_id = uuid4(), uuid4(), uuid4()
+        submenu_key: str = await services.submenus_service.gen_key(menu_id=menu_id, submenu_id=submenu_id)
+        dish_key: str = await services.dishes_service.gen_key(menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id)
+
+        keys: list[str] = await services.menus_service.clearing_cache_patterns(constants.DELETE, menu_id=menu_id)
+        await services.cache_service.invalidate(*keys)
+
+        assert await services.submenus_service.gen_key(menu_id=menu_id, submenu_id=submenu_id) != submenu_key
+        assert await services.dishes_service.gen_key(
+            menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id
+        ) != dish_key
+
+    @pytest.mark.asyncio
+    async def test_generations_not_expired(self):
+        """Testing counters of namespaces are kept without expiry, so generations are never reused."""
+        namespace: str = services.redis_service.namespace_key(constants.MENU, uuid4())
+
+        await services.redis_service.invalidate(namespace)
+
+        assert await services.redis_service.client.ttl(namespace) == -1
+        assert await services.redis_service.get_generations(namespace) == [1]
+        await services.redis_service.client.delete(namespace)
+
+    @pytest.mark.asyncio
+    async def test_delete_submenu_keeps_other_submenus(self):
+        """Testing deleting of submenu invalidates only its dishes."""
+        menu_id, submenu_id, other_submenu_id = uuid4(), uuid4(), uuid4()
+        keys_before: list[str] = [
+            await services.dishes_service.gen_key(menu_id=menu_id, submenu_id=obj_id, many=True)
+            for obj_id in (submenu_id, other_submenu_id)
+        ]
+
+        keys: list[str] = await services.submenus_service.clearing_cache_patterns(
+            constants.DELETE, menu_id=menu_id, submenu_id=submenu_id
+        )
+        await services.cache_service.invalidate(*keys)
+
+        assert await services.dishes_service.gen_key(
+            menu_id=menu_id, submenu_id=submenu_id, many=True
+        ) != keys_before[0]
+        assert await services.dishes_service.gen_key(
+            menu_id=menu_id, submenu_id=other_submenu_id, many=True
+        ) == keys_before[1]
+
+    @pytest.mark.asyncio
+    async def test_invalidate_deletes_values(self):
+        """Testing invalidation deletes values by keys."""
+        menu_id: UUID = uuid4()
+        menu_key: str = services.menus_service.gen_key(menu_id=menu_id)
+        await services.cache_service.set(menu_key, {'id': str(menu_id)})
+        assert await services.cache_service.get(menu_key) == {'id': str(menu_id)}
+
+        await services.cache_service.invalidate(menu_key)
+
+        assert await services.cache_service.get(menu_key) is None
+
+
+class TestCachedReads:
+    class NumbersService(BaseObjectService):
+        entity: str = constants.DISH
+
+        def __init__(self):
+            super().__init__(repository=None)
+            self.calls: int = 0
+
+        @cached(constants.DISH, response_type=list[int], many=True)
+        async def get_numbers(self, db: AsyncSession | None, menu_id: UUID, submenu_id: UUID) -> list[int]:
+            self.calls += 1
+            return [1, 2, 3]
+
+    def test_keys_built_from_parents(self):
+        """Testing keys contain IDs with generations of parents of the entity."""
+        menu_id, submenu_id, dish_id = uuid4(), uuid4(), uuid4()
+        ids: dict[str, UUID] = {'menu_id': menu_id, 'submenu_id': submenu_id, 'dish_id': dish_id}
+
+        assert build_entity_key(constants.MENU, (), ids, many=True) == 'menu_list'
+        assert build_entity_key(constants.SUBMENU, (1,), ids) == f'submenu_{menu_id}.1_{submenu_id}'
+        assert build_entity_key(constants.DISH, (1, 2), ids) == f'dish_{menu_id}.1_{submenu_id}.2_{dish_id}'
+
+    @pytest.mark.asyncio
+    async def test_invalidation_derived_from_relationship(self):
+        """Testing keys to invalidate are derived from parents and children of the entity."""
+        menu_id, submenu_id, dish_id = uuid4(), uuid4(), uuid4()
+        tree_key: str = services.menus_service.gen_tree_key(menu_id=menu_id)
+
+        assert sorted(await services.dishes_service.clearing_cache_patterns(
+            constants.DELETE, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id
+        )) == sorted([
+            await services.dishes_service.gen_key(menu_id=menu_id, submenu_id=submenu_id, many=True),
+            services.cache_service.namespace_key(f'{constants.DISH}_{constants.LIST}', submenu_id),
+            await services.dishes_service.gen_key(menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id),
+            await services.submenus_service.gen_key(menu_id=menu_id, submenu_id=submenu_id),
+            services.menus_service.gen_key(menu_id=menu_id),
+            tree_key,
+            constants.ALL_IN_ONE,
+        ])
+        assert sorted(await services.submenus_service.clearing_cache_patterns(
+            constants.UPDATE, menu_id=menu_id, submenu_id=submenu_id
+        )) == sorted([
+            await services.submenus_service.gen_key(menu_id=menu_id, many=True),
+            services.cache_service.namespace_key(f'{constants.SUBMENU}_{constants.LIST}', menu_id),
+            await services.submenus_service.gen_key(menu_id=menu_id, submenu_id=submenu_id),
+            tree_key,
+            constants.ALL_IN_ONE,
+        ])
+        assert services.cache_service.namespace_key(constants.SUBMENU, submenu_id) in (
+            await services.submenus_service.clearing_cache_patterns(
+                constants.DELETE, menu_id=menu_id, submenu_id=submenu_id
+            )
+        )
+        assert await services.menus_service.clearing_cache_patterns(constants.CREATE, menu_id=None) == [
+            services.menus_service.gen_key(many=True),
+            services.cache_service.namespace_key(f'{constants.MENU}_{constants.LIST}', constants.LIST),
+            services.menus_service.gen_tree_key(many=True),
+            services.menus_service.gen_tree_key(),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_cached_read_invalidated_by_entity(self, monkeypatch):
+        """Testing the decorated loader is cached and invalidated by changes of the entity."""
+        monkeypatch.setattr(settings, 'HTTP_ETAG_ENABLED', False)
+        monkeypatch.setattr(settings, 'CACHE_RESPONSE_BYTES', False)
+        service = self.NumbersService()
+        ids: dict[str, UUID] = {'menu_id': uuid4(), 'submenu_id': uuid4()}
+
+        assert await service.get_numbers(None, **ids) == [1, 2, 3]
+        assert await service.get_numbers(None, **ids) == [1, 2, 3]
+        assert service.calls == 1
+
+        await services.cache_service.invalidate(
+            *await service.clearing_cache_patterns(constants.CREATE, **ids, dish_id=None)
+        )
+        assert await service.get_numbers(None, **ids) == [1, 2, 3]
+        assert service.calls == 2
+
+
+class TestLocalCache:
+    @staticmethod
+    def local_cache(channel: str, max_size: int = 10) -> LocalCacheService:
+        return LocalCacheService(backend=services.redis_service, max_size=max_size, lifetime=60, channel=channel)
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction(self):
+        """Testing local storage keeps only the most recently used values."""
+        cache: LocalCacheService = self.local_cache(channel=str(uuid4()), max_size=2)
+        cache.set_local('a', 1)
+        cache.set_local('b', 2)
+        assert cache.get_local('a') == 1
+        cache.set_local('c', 3)
+
+        assert cache.get_local('b') is None
+        assert cache.get_local('a') == 1
+        assert cache.get_local('c') == 3
+
+    @pytest.mark.asyncio
+    async def test_invalidation_evicts_other_processes(self):
+        """Testing invalidation is broadcast to local caches of other processes."""
+        channel: str = str(uuid4())
+        first: LocalCacheService = self.local_cache(channel=channel)
+        second: LocalCacheService = self.local_cache(channel=channel)
+        await second.startup()
+        try:
+            while await services.redis_service.client.pubsub_numsub(channel) == [(channel.encode(), 0)]:
+                await asyncio.sleep(0.01)
+
+            key: str = f'test_{uuid4()}'
+            await first.set(key, 'value')
+            assert await second.get(key) == 'value'
+            assert second.get_local(key) == 'value'
+
+            await first.invalidate(key)
+            for _ in range(100):
+                if second.get_local(key) is None:
+                    break
+                await asyncio.sleep(0.01)
+            assert second.get_local(key) is None
+        finally:
+            await second.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_values_rejected_by_redis_not_kept(self):
+        """Testing values of many not admitted to redis by their policies are not kept locally."""
+        cache: LocalCacheService = self.local_cache(channel=str(uuid4()))
+        small, large = f'test_{uuid4()}', f'test_{uuid4()}'
+        policy: CachePolicy = CachePolicy(lifetime=60, max_size=64)
+
+        assert await cache.set_many((small, 'small', policy), (large, 'x' * 100, policy)) == [small]
+
+        assert cache.get_local(small) == 'small'
+        assert cache.get_local(large) is None
+        await cache.delete(small)
+
+
+class TestSharedMemoryCache:
+    @staticmethod
+    def segment(path: Path, sets: int = 4, slot_size: int = 256) -> SharedMemorySegment:
+        return SharedMemorySegment(path=str(path / 'cache'), sets=sets, slot_size=slot_size)
+
+    @staticmethod
+    def shared_cache(path: Path) -> SharedMemoryCacheService:
+        return SharedMemoryCacheService(
+            backend=services.redis_service,
+            path=str(path / 'cache'),
+            sets=4,
+            slot_size=256,
+            lifetime=60,
+            channel=str(uuid4()),
+        )
+
+    def test_get_set_delete(self, tmp_path: Path):
+        """Testing values are read from the segment until deleted or expired."""
+        segment: SharedMemorySegment = self.segment(tmp_path)
+        assert segment.set('key', b'value', lifetime=60)
+        assert segment.set('expired', b'value', lifetime=-1)
+        assert segment.get('key') == b'value'
+        assert segment.get('expired') is None
+
+        segment.delete('key')
+        assert segment.get('key') is None
+
+    def test_lru_eviction(self, tmp_path: Path):
+        """Testing the least recently used slot of the set is replaced."""
+        segment: SharedMemorySegment = self.segment(tmp_path, sets=1)
+        keys: list[str] = [f'key_{i}' for i in range(segment.ways)]
+        for key in keys:
+            segment.set(key, key.encode(), lifetime=60)
+        for key in keys[1:]:
+            assert segment.get(key) == key.encode()
+        segment.set('new', b'new', lifetime=60)
+
+        assert segment.get(keys[0]) is None
+        assert segment.get('new') == b'new'
+        assert all(segment.get(key) == key.encode() for key in keys[1:])
+
+    def test_oversized_value_not_admitted(self, tmp_path: Path):
+        """Testing values larger than a slot are not kept."""
+        segment: SharedMemorySegment = self.segment(tmp_path)
+        assert not segment.set('key', b'x' * segment.slot_size, lifetime=60)
+        assert segment.get('key') is None
+
+    def test_shared_between_processes(self, tmp_path: Path):
+        """Testing segments mapped from the same file see writes and deletes of each other."""
+        first: SharedMemorySegment = self.segment(tmp_path)
+        second: SharedMemorySegment = self.segment(tmp_path)
+        first.set('key', b'value', lifetime=60)
+        assert second.get('key') == b'value'
+
+        second.delete('key')
+        assert first.get('key') is None
+
+    def test_slot_being_written_is_missed(self, tmp_path: Path):
+        """Testing readers do not return the slot while its sequence is odd."""
+        segment: SharedMemorySegment = self.segment(tmp_path, sets=1)
+        segment.set('key', b'value', lifetime=60)
+        offset: int = segment.offsets(segment.hash(b'key'))[0]
+        sequence: int = segment.sequence.unpack_from(segment.buffer, offset)[0]
+        segment.sequence.pack_into(segment.buffer, offset, sequence + 1)
+
+        assert segment.get('key') is None
+
+    def test_other_layout_replaced(self, tmp_path: Path):
+        """Testing the file of another layout is replaced while processes which map it keep it."""
+        old: SharedMemorySegment = self.segment(tmp_path, sets=2)
+        old.set('key', b'value', lifetime=60)
+
+        new: SharedMemorySegment = self.segment(tmp_path, sets=4)
+        new.set('key', b'new', lifetime=60)
+
+        assert old.get('key') == b'value'
+        assert new.get('key') == b'new'
+        assert self.segment(tmp_path, sets=4).get('key') == b'new'
+        assert sorted(path.name for path in tmp_path.iterdir()) == ['cache']
+
+    @pytest.mark.asyncio
+    async def test_served_without_redis(self, tmp_path: Path):
+        """Testing values and generations are served from the segment after the first read."""
+        cache: SharedMemoryCacheService = self.shared_cache(tmp_path)
+        await cache.startup()
+        try:
+            key: str = f'test_{uuid4()}'
+            namespace: str = cache.namespace_key('test', uuid4())
+            await cache.set(key, {'value': 1})
+            generations: list[int] = await cache.get_generations(namespace)
+            await services.redis_service.client.delete(key)
+
+            assert await cache.get(key) == {'value': 1}
+            assert await cache.get_generations(namespace) == generations
+
+            await cache.invalidate(key)
+            assert await cache.get(key) is None
+        finally:
+            await cache.shutdown()
+
+    def test_segment_mapped_on_startup(self, tmp_path: Path):
+        """Testing the file of the segment is not created before startup."""
+        cache: SharedMemoryCacheService = self.shared_cache(tmp_path)
+        cache.set_local('key', 'value')
+
+        assert cache.get_local('key') is None
+        assert not list(tmp_path.iterdir())
+
+    def test_cleared_once_after_lost_subscription(self, tmp_path: Path):
+        """Testing subscriptions keep the segment, which is cleared once by processes which lost them."""
+        first: SharedMemorySegment = self.segment(tmp_path)
+        cache: SharedMemoryCacheService = self.shared_cache(tmp_path)
+        cache.segment = self.segment(tmp_path)
+        first.set('key', b'value', lifetime=60)
+        cache.clear_local()
+        assert first.get('key') == b'value'
+
+        lost_at: float = time.time()
+        cache.clear_local(lost_at)
+        assert first.get('key') is None
+
+        first.set('key', b'value', lifetime=60)
+        cache.clear_local(lost_at)
+        assert first.get('key') == b'value'
+
+
+class TestMemoryCache:
+    @pytest.mark.asyncio
+    async def test_lru_eviction(self):
+        """Testing the least recently used value is evicted."""
+        cache: MemoryCacheService = MemoryCacheService(max_size=2)
+        await cache.set('first', 1)
+        await cache.set('second', 2)
+        assert await cache.get('first') == 1
+        await cache.set('third', 3)
+
+        assert await cache.get_many('first', 'second', 'third') == [1, None, 3]
+
+    @pytest.mark.asyncio
+    async def test_expired_value_dropped(self):
+        """Testing values are dropped after lifetime and stale lifetime."""
+        cache: MemoryCacheService = MemoryCacheService(max_size=10)
+        await cache.set('expired', 1, policy=CachePolicy(lifetime=0))
+        await cache.set('stale', 2, policy=CachePolicy(lifetime=0, stale_lifetime=60))
+
+        assert await cache.get('expired') is None
+        assert await cache.get('stale') == 2
+
+    @pytest.mark.asyncio
+    async def test_invalidate(self):
+        """Testing invalidation deletes values and increments namespaces."""
+        cache: MemoryCacheService = MemoryCacheService(max_size=10)
+        namespace: str = cache.namespace_key(constants.MENU, uuid4())
+        await cache.set('menu', 1)
+        await cache.set(cache.response_key('menu'), b'1')
+
+        await cache.invalidate('menu', namespace)
+
+        assert await cache.get_many('menu', cache.response_key('menu')) == [None, None]
+        assert await cache.get_generations(namespace) == [1]
+
+    @pytest.mark.asyncio
+    async def test_del_by_patterns(self):
+        """Testing deleting of values by patterns of keys."""
+        cache: MemoryCacheService = MemoryCacheService(max_size=10)
+        policy: CachePolicy = CachePolicy(lifetime=60)
+        await cache.set_many(('dish_1_list', 1, policy), ('dish_1_2', 2, policy), ('menu_1', 3, policy))
+
+        assert sorted(await cache.find_keys('dish_1_*')) == ['dish_1_2', 'dish_1_list']
+        await cache.del_by_pattens('dish_*')
+
+        assert await cache.find_keys('*') == ['menu_1']
+
+    @pytest.mark.asyncio
+    async def test_generations_bounded(self):
+        """Testing generations are evicted without reviving values of evicted namespaces."""
+        cache: MemoryCacheService = MemoryCacheService(max_size=2)
+        first, second, third = (cache.namespace_key(constants.MENU, uuid4()) for _ in range(3))
+        stale_generations: list[int] = await cache.get_generations(first)
+        await cache.invalidate(first)
+        generations: list[int] = await cache.get_generations(first)
+
+        await cache.invalidate(second, third)
+
+        assert len(cache.generations) == 2
+        assert await cache.get_generations(first) == generations != stale_generations
+
+
+class TestCachePolicy:
+    def test_lifetime_with_jitter(self):
+        """Testing lifetime of values is spread by random jitter."""
+        policy: CachePolicy = CachePolicy(lifetime=60, jitter=30)
+        lifetimes: set[int] = {policy.ttl() for _ in range(100)}
+
+        assert min(lifetimes) >= 60 and max(lifetimes) <= 90
+        assert len(lifetimes) > 1
+
+    def test_policy_overridden_by_settings(self, monkeypatch):
+        """Testing fields of the policy are overridden by entity and key type, the rest are defaults."""
+        monkeypatch.setattr(settings, 'CACHE_POLICIES', {'dish_list': {'lifetime': 60, 'max_size': 1024}})
+
+        assert get_policy(constants.DISH, many=True) == CachePolicy(
+            lifetime=60, jitter=settings.CACHE_LIFETIME_JITTER, max_size=1024
+        )
+        assert get_policy(constants.DISH).lifetime == settings.CACHE_LIFETIME
+
+    @pytest.mark.asyncio
+    async def test_large_value_not_cached(self):
+        """Testing values larger than max size are not cached and replacing by them deletes the old value."""
+        key: str = f'test_{uuid4()}'
+        policy: CachePolicy = CachePolicy(lifetime=60, max_size=64)
+
+        assert not await services.redis_service.set(key, 'x' * 100, policy=policy)
+        assert await services.redis_service.get(key) is None
+
+        await services.redis_service.set(key, 'small', policy=policy)
+        await services.redis_service.replace(key, 'x' * 100, policy=policy)
+        assert await services.redis_service.get(key) is None
+
+        assert await services.redis_service.set_many((key, 'x' * 100, policy)) == []
+        assert await services.redis_service.get(key) is None
+
+    @pytest.mark.asyncio
+    async def test_expiry_with_jitter_in_redis(self):
+        """Testing expiry of the value in redis includes jitter and stale lifetime."""
+        key: str = f'test_{uuid4()}'
+        await services.redis_service.set(key, 'value', policy=CachePolicy(lifetime=60, jitter=30, stale_lifetime=10))
+
+        assert 60 < await services.redis_service.client.ttl(key) <= 100
+        await services.redis_service.delete(key)
+
+    @pytest.mark.asyncio
+    async def test_value_without_lifetime_not_cached(self):
+        """Testing values of the policy without lifetime are not cached and negative lifetimes are rejected."""
+        key: str = f'test_{uuid4()}'
+
+        assert not await services.redis_service.set(key, 'value', policy=CachePolicy(lifetime=0))
+        await services.redis_service.set_many((key, 'value', CachePolicy(lifetime=0)))
+        assert await services.redis_service.get(key) is None
+        with pytest.raises(ValueError):
+            CachePolicy(lifetime=-1)
+
+
+class TestSingleFlight:
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_coalesced(self):
+        """Testing concurrent calls with the same key run a single call."""
+        single_flight: SingleFlight = SingleFlight()
+        calls: list[str] = []
+
+        async def load() -> str:
+            calls.append('load')
+            await asyncio.sleep(0.01)
+            return 'value'
+
+        results: list[str] = await asyncio.gather(*(single_flight.do('key', load) for _ in range(10)))
+
+        assert results == ['value'] * 10
+        assert calls == ['load']
+        assert not single_flight.calls
+
+    @pytest.mark.asyncio
+    async def test_exception_shared(self):
+        """Testing callers waiting for the call get its exception."""
+        single_flight: SingleFlight = SingleFlight()
+
+        async def load() -> str:
+            await asyncio.sleep(0.01)
+            raise ValueError('not found')
+
+        results: list = await asyncio.gather(
+            *(single_flight.do('key', load) for _ in range(3)), return_exceptions=True
+        )
+
+        assert all(isinstance(result, ValueError) for result in results)
+
+    @pytest.mark.asyncio
+    async def test_shared_load_outlives_cancelled_caller(self):
+        """Testing the shared load uses its own session and waiters get the value if the first caller is cancelled."""
+        key: str = f'test_{uuid4()}'
+        sessions: list[AsyncSession] = []
+
+        async def loader(db: AsyncSession) -> str:
+            sessions.append(db)
+            await asyncio.sleep(0.05)
+            await db.execute(text('SELECT 1'))
+            return 'value'
+
+        first = asyncio.create_task(services.menus_service.get_or_load(key=key, loader=loader))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(services.menus_service.get_or_load(key=key, loader=loader))
+        await asyncio.sleep(0.01)
+        first.cancel()
+
+        assert await waiter == 'value'
+        assert len(sessions) == 1 and isinstance(sessions[0], AsyncSession)
+        await services.cache_service.delete(key)
+
+
+class TestStaleWhileRevalidate:
+    @pytest.mark.asyncio
+    async def test_stale_value_refreshed_in_background(self):
+        """Testing a stale value is returned and the refresh is scheduled once."""
+        key: str = f'test_{uuid4()}'
+        await services.redis_service.set(key, 'stale', policy=CachePolicy(lifetime=0, stale_lifetime=60))
+        calls: list[str] = []
+
+        async def refresh() -> None:
+            calls.append(key)
+
+        assert await services.redis_service.get(key, refresh=refresh) == 'stale'
+        assert await services.redis_service.get(key, refresh=refresh) == 'stale'
+        await asyncio.sleep(0.01)
+
+        assert calls == [key]
+
+    @pytest.mark.asyncio
+    async def test_fresh_value_not_refreshed(self):
+        """Testing a fresh value does not schedule the refresh."""
+        key: str = f'test_{uuid4()}'
+        await services.redis_service.set(key, 'fresh', policy=CachePolicy(lifetime=60, stale_lifetime=60))
+
+        async def refresh() -> None:
+            raise AssertionError('fresh value must not be refreshed')
+
+        assert await services.redis_service.get(key, refresh=refresh) == 'fresh'
+        assert key not in services.redis_service.refreshing
+
+
+class TestNegativeCache:
+    @pytest.mark.asyncio
+    async def test_not_found_cached_until_create(self, monkeypatch):
+        """Testing not found object is loaded once and creating of the object clears the result."""
+        monkeypatch.setattr(settings, 'CACHE_NOT_FOUND_LIFETIME', 5)
+        menu_id: UUID = uuid4()
+        menu_key: str = services.menus_service.gen_key(menu_id=menu_id)
+        calls: list[UUID] = []
+
+        async def not_found(db) -> None:
+            calls.append(menu_id)
+            raise HTTPException(status_code=404, detail='menu not found')
+
+        async def found(db) -> dict[str, str]:
+            return {'id': str(menu_id)}
+
+        for _ in range(2):
+            with pytest.raises(HTTPException) as e:
+                await services.menus_service.get_or_load(key=menu_key, loader=not_found)
+            assert e.value.status_code == 404
+            assert e.value.detail == 'menu not found'
+        assert calls == [menu_id]
+
+        keys: list[str] = await services.menus_service.clearing_cache_patterns(constants.CREATE, menu_id=menu_id)
+        await services.cache_service.invalidate(*keys)
+
+        assert await services.menus_service.get_or_load(key=menu_key, loader=found) == {'id': str(menu_id)}
+
+
+class TestWriteThrough:
+    @staticmethod
+    def make_dish(submenu_id: UUID, title: str, dish_id: UUID | None = None) -> schemas.ResponseDishSchema:
+        return schemas.ResponseDishSchema(
+            id=dish_id or uuid4(), submenu_id=submenu_id, title=title, description='Description', price='11.11'
+        )
+
+    @pytest.mark.asyncio
+    async def test_dish_written_to_entries(self, monkeypatch):
+        """Testing create, update and delete of dish patch cached lists and counts of parents."""
+        monkeypatch.setattr(settings, 'CACHE_WRITE_THROUGH', True)
+        monkeypatch.setattr(settings, 'CACHE_OUTBOX_ENABLED', False)
+        monkeypatch.setattr(settings, 'CACHE_CHANGE_CAPTURE', False)
+        menu_id, submenu_id = uuid4(), uuid4()
+        dish: schemas.ResponseDishSchema = self.make_dish(submenu_id, 'Dish')
+        menu_key: str = services.menus_service.gen_key(menu_id=menu_id)
+        submenu_key: str = await services.submenus_service.gen_key(menu_id=menu_id, submenu_id=submenu_id)
+        list_key: str = await services.dishes_service.gen_key(menu_id=menu_id, submenu_id=submenu_id, many=True)
+        await services.cache_service.set(menu_key, schemas.ResponseMenuWithCountSchema(
+            id=menu_id, title='Menu', description='Menu', submenus_count=1, dishes_count=1
+        ))
+        await services.cache_service.set(submenu_key, schemas.ResponseSubmenuWithCountSchema(
+            id=submenu_id, menu_id=menu_id, title='Submenu', description='Submenu', dishes_count=1
+        ))
+        await services.cache_service.set(list_key, [dish])
+
+        created: schemas.ResponseDishSchema = self.make_dish(submenu_id, 'Created')
+        await services.dishes_service.clearing_cache_process(
+            constants.CREATE, menu_id=menu_id, submenu_id=submenu_id, dish_id=created.id, dish=created
+        )
+        assert await services.cache_service.get(list_key) == sorted([dish, created], key=lambda obj: obj.id)
+        assert (await services.cache_service.get(menu_key)).dishes_count == 2
+        assert (await services.cache_service.get(submenu_key)).dishes_count == 2
+
+        updated: schemas.ResponseDishSchema = self.make_dish(submenu_id, 'Updated', dish_id=created.id)
+        await services.dishes_service.clearing_cache_process(
+            constants.UPDATE, menu_id=menu_id, submenu_id=submenu_id, dish_id=created.id, dish=updated
+        )
+        assert await services.cache_service.get(list_key) == sorted([dish, updated], key=lambda obj: obj.id)
+        assert await services.cache_service.get(
+            await services.dishes_service.gen_key(menu_id=menu_id, submenu_id=submenu_id, dish_id=created.id)
+        ) == updated
+
+        await services.dishes_service.clearing_cache_process(
+            constants.DELETE, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish.id
+        )
+        assert await services.cache_service.get(list_key) == [updated]
+        assert (await services.cache_service.get(menu_key)).dishes_count == 1
+        assert (await services.cache_service.get(submenu_key)).dishes_count == 1
+
+    @pytest.mark.asyncio
+    async def test_value_loaded_before_write_dropped(self, monkeypatch):
+        """Testing the value loaded while a write patched the cache is not set over the written one."""
+        monkeypatch.setattr(settings, 'CACHE_WRITE_THROUGH', True)
+        monkeypatch.setattr(settings, 'CACHE_OUTBOX_ENABLED', False)
+        monkeypatch.setattr(settings, 'CACHE_CHANGE_CAPTURE', False)
+        menu_id: UUID = uuid4()
+        menu_key: str = services.menus_service.gen_key(menu_id=menu_id)
+        written: schemas.ResponseMenuSchema = schemas.ResponseMenuSchema(
+            id=menu_id, title='Updated', description='Menu'
+        )
+
+        async def loader(db: AsyncSession) -> schemas.ResponseMenuWithCountSchema:
+            menu: schemas.ResponseMenuWithCountSchema = schemas.ResponseMenuWithCountSchema(
+                id=menu_id, title='Menu', description='Menu', submenus_count=0, dishes_count=0
+            )
+            await services.menus_service.clearing_cache_process(constants.UPDATE, menu_id=menu_id, menu=written)
+            return menu
+
+        loaded: schemas.ResponseMenuWithCountSchema = await services.menus_service.get_or_load(
+            key=menu_key, loader=loader
+        )
+
+        assert loaded.title == 'Menu'
+        assert await services.cache_service.get(menu_key) is None
+
+
+class TestHashLists:
+    @staticmethod
+    def make_dish(submenu_id: UUID, title: str, dish_id: UUID | None = None) -> schemas.ResponseDishSchema:
+        return TestWriteThrough.make_dish(submenu_id, title, dish_id=dish_id)
+
+    @pytest.mark.asyncio
+    async def test_items_set_and_deleted(self, monkeypatch):
+        """Testing the list stored as a hash keeps order of items by IDs while they are changed one by one."""
+        monkeypatch.setattr(settings, 'CACHE_LIST_LAYOUT', 'hash')
+        submenu_id: UUID = uuid4()
+        key: str = f'{constants.DISH}_{uuid4()}_{constants.LIST}'
+        first, second = sorted(
+            (self.make_dish(submenu_id, 'First'), self.make_dish(submenu_id, 'Second')), key=lambda obj: obj.id
+        )
+        assert await services.redis_service.set(key, [first, second])
+        kind: bytes = await services.redis_service.client.type(key)
+        assert kind == b'hash'
+        assert await services.redis_service.get(key) == [first, second]
+        await services.redis_service.client.set(services.redis_service.response_key(key), b'body')
+
+        created: schemas.ResponseDishSchema = self.make_dish(submenu_id, 'Created')
+        updated: schemas.ResponseDishSchema = self.make_dish(submenu_id, 'Updated', dish_id=first.id)
+        await services.redis_service.set_list_item(key, created)
+        await services.redis_service.set_list_item(key, updated)
+        assert await services.redis_service.get(key) == sorted([updated, second, created], key=lambda obj: obj.id)
+        assert await services.redis_service.client.get(services.redis_service.response_key(key)) is None
+
+        await services.redis_service.delete_list_item(key, second.id)
+        assert await services.redis_service.get_many(key) == [sorted([updated, created], key=lambda obj: obj.id)]
+
+    @pytest.mark.asyncio
+    async def test_missing_list_left_for_loading(self, monkeypatch):
+        """Testing items are not set to a list which is not cached, and an empty list is cached."""
+        monkeypatch.setattr(settings, 'CACHE_LIST_LAYOUT', 'hash')
+        key: str = f'{constants.DISH}_{uuid4()}_{constants.LIST}'
+        await services.redis_service.set_list_item(key, self.make_dish(uuid4(), 'Dish'))
+        assert await services.redis_service.get(key) is None
+        assert await services.redis_service.set(key, [])
+        assert await services.redis_service.get(key) == []
+
+    @pytest.mark.asyncio
+    async def test_service_sets_written_dish(self, monkeypatch):
+        """Testing the changed dish is set to its cached list instead of invalidating the list."""
+        monkeypatch.setattr(settings, 'CACHE_LIST_LAYOUT', 'hash')
+        monkeypatch.setattr(settings, 'CACHE_WRITE_THROUGH', False)
+        monkeypatch.setattr(settings, 'CACHE_OUTBOX_ENABLED', False)
+        monkeypatch.setattr(settings, 'CACHE_CHANGE_CAPTURE', False)
+        menu_id, submenu_id = uuid4(), uuid4()
+        dish: schemas.ResponseDishSchema = self.make_dish(submenu_id, 'Dish')
+        list_key: str = await services.dishes_service.gen_key(menu_id=menu_id, submenu_id=submenu_id, many=True)
+        await services.cache_service.set(list_key, [dish])
+
+        created: schemas.ResponseDishSchema = self.make_dish(submenu_id, 'Created')
+        await services.dishes_service.clearing_cache_process(
+            constants.CREATE, menu_id=menu_id, submenu_id=submenu_id, dish_id=created.id, dish=created
+        )
+        assert await services.cache_service.get(list_key) == sorted([dish, created], key=lambda obj: obj.id)
+
+        await services.dishes_service.clearing_cache_process(
+            constants.DELETE, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish.id
+        )
+        assert await services.cache_service.get(list_key) == [created]
+
+
+class TestPages:
+    @pytest.mark.parametrize('response_bytes', (False, True), ids=('Rendered', 'Cached body'))
+    @pytest.mark.asyncio
+    async def test_page_cached_until_list_changes(self, response_bytes: bool, monkeypatch):
+        """Testing the page is cached by its own key with the cursor of the next page and invalidated by changes."""
+        monkeypatch.setattr(settings, 'CACHE_RESPONSE_BYTES', response_bytes)
+        menu_id, submenu_id = uuid4(), uuid4()
+        dishes: list[schemas.ResponseDishSchema] = sorted(
+            (TestWriteThrough.make_dish(submenu_id, f'Dish {number}') for number in range(3)), key=lambda obj: obj.id
+        )
+        calls: list[Page] = []
+
+        async def load(service, db, menu_id: UUID, submenu_id: UUID, page: Page = Page()):
+            calls.append(page)
+            return paginate(dishes, page)
+
+        get_dishes = cached(constants.DISH, response_type=list[schemas.ResponseDishSchema], many=True)(load)
+        first_page: Page = Page(limit=2)
+
+        async def get_page(page: Page) -> tuple[Any, MutableHeaders]:
+            response: Response = Response()
+            value: Any = await get_dishes(
+                services.dishes_service, db=None, menu_id=menu_id, submenu_id=submenu_id, page=page, response=response
+            )
+            if isinstance(value, Response):
+                return json.loads(value.body), value.headers
+            return [json.loads(dish.model_dump_json()) for dish in value], response.headers
+
+        for _ in range(2):
+            body, headers = await get_page(first_page)
+            assert body == [json.loads(dish.model_dump_json()) for dish in dishes[:2]]
+        assert calls == [first_page]
+        cursor: str = headers[NEXT_CURSOR_HEADER]
+        assert decode_cursor(cursor) == dishes[1].id
+
+        last_page: Page = Page(limit=2, after=decode_cursor(cursor))
+        body, headers = await get_page(last_page)
+        assert body == [json.loads(dishes[2].model_dump_json())]
+        assert NEXT_CURSOR_HEADER not in headers
+
+        keys: list[str] = await services.dishes_service.clearing_cache_patterns(
+            constants.UPDATE, menu_id=menu_id, submenu_id=submenu_id, dish_id=dishes[0].id
+        )
+        await services.cache_service.invalidate(*keys)
+        await get_dishes(services.dishes_service, db=None, menu_id=menu_id, submenu_id=submenu_id, page=first_page)
+        assert calls == [first_page, last_page, first_page]
+
+    def test_read_model_pages(self):
+        """Testing pages of the read model follow IDs of the cursor."""
+        menu_id: UUID = uuid4()
+        submenus: tuple[SubmenuNode, ...] = tuple(sorted(
+            (SubmenuNode(id=uuid4(), menu_id=menu_id, title='', description='', dishes=()) for _ in range(5)),
+            key=lambda node: node.id,
+        ))
+        read_model: ReadModel = ReadModel(repository=None, backend=None, channel='')
+        read_model.add(MenuNode(id=menu_id, title='', description='', submenus=submenus))
+
+        page: list[schemas.ResponseSubmenuSchema] = read_model.get_submenu_list(menu_id, page=Page(limit=2))
+        assert [submenu.id for submenu in page] == [submenu.id for submenu in submenus[:2]]
+        assert page_headers(page, Page(limit=2)) == {NEXT_CURSOR_HEADER: encode_cursor(submenus[1].id)}
+        page = read_model.get_submenu_list(menu_id, page=Page(limit=2, after=submenus[3].id))
+        assert [submenu.id for submenu in page] == [submenus[4].id]
+        assert page_headers(page, Page(limit=2)) == {}
+
+
+class TestCacheOutbox:
+    @pytest.mark.asyncio
+    async def test_keys_recorded_with_changes(self, async_session_with_cache: AsyncSession, monkeypatch):
+        """Testing keys are committed to the outbox with changes and dispatched once without duplicates."""
+        monkeypatch.setattr(settings, 'CACHE_OUTBOX_ENABLED', True)
+        invalidated: list[tuple[str, ...]] = []
+
+        async def invalidate(*keys: str) -> None:
+            invalidated.append(keys)
+
+        monkeypatch.setattr(services.cache_service, 'invalidate', invalidate)
+        db: AsyncSession = async_session_with_cache
+        menu: schemas.ResponseMenuSchema = await services.menus_service.create_menu(
+            db=db, data=schemas.MenuSchema(title='Menu', description='Menu'), bgtask=BackgroundTasks()
+        )
+        await services.menus_service.update_menu(
+            db=db, menu_id=menu.id, data=schemas.UpdateMenuSchema(title='Updated'), bgtask=BackgroundTasks()
+        )
+        keys: list[str] = [
+            *await services.menus_service.clearing_cache_patterns(constants.CREATE, menu_id=None),
+            *await services.menus_service.clearing_cache_patterns(constants.UPDATE, menu_id=menu.id),
+        ]
+
+        assert sorted(event.key for event in await repositories.cache_outbox.get_all(db=db)) == sorted(keys)
+        assert await services.outbox_dispatcher.dispatch() == len(keys)
+        assert len(invalidated) == 1
+        assert sorted(invalidated[0]) == sorted(set(keys))
+        assert await repositories.cache_outbox.get_all(db=db) == []
+
+    @pytest.mark.asyncio
+    async def test_keys_discarded_with_rolled_back_changes(self, async_session_with_cache: AsyncSession):
+        """Testing keys are not recorded if changes are rolled back."""
+        db: AsyncSession = async_session_with_cache
+        repositories.cache_outbox.add_keys(db, [services.menus_service.gen_key(many=True)])
+        await db.rollback()
+
+        assert await repositories.cache_outbox.get_all(db=db) == []
+
+    @pytest.mark.asyncio
+    async def test_events_kept_on_failure(self, async_session_with_cache: AsyncSession, monkeypatch):
+        """Testing events are dispatched again if invalidation fails."""
+        db: AsyncSession = async_session_with_cache
+        repositories.cache_outbox.add_keys(db, [services.menus_service.gen_key(many=True)])
+        await db.commit()
+
+        async def invalidate(*keys: str) -> None:
+            raise ConnectionError('cache is unavailable')
+
+        monkeypatch.setattr(services.cache_service, 'invalidate', invalidate)
+        with pytest.raises(ConnectionError):
+            await services.outbox_dispatcher.dispatch()
+
+        assert len(await repositories.cache_outbox.get_all(db=db)) == 1
+        monkeypatch.undo()
+        assert await services.outbox_dispatcher.dispatch() == 1
+
+
+class TestSerializers:
+    dishes: list[schemas.ResponseDishSchema] = [
+        schemas.ResponseDishSchema(
+            id=uuid4(), submenu_id=uuid4(), title=f'Dish {i}', description='Description', price='11.11'
+        )
+        for i in range(3)
+    ]
+
+    @pytest.mark.parametrize('serializer_name', ('json', 'pickle'))
+    @pytest.mark.parametrize(
+        'value',
+        (
+            pytest.param(dishes[0], id='Schema'),
+            pytest.param(dishes, id='List of schemas'),
+            pytest.param([], id='Empty list'),
+            pytest.param({'title': 'Dish'}, id='Plain value'),
+        ),
+    )
+    def test_dumps_loads(self, serializer_name: str, value):
+        """Testing values are loaded equal to dumped ones."""
+        data: bytes = serializers.serializers[serializer_name].dumps(value)
+        assert serializers.loads(data) == value
+
+    def test_other_schema_version_not_loaded(self, monkeypatch):
+        """Testing entries of another version of schemas are dropped."""
+        data: bytes = serializers.serializers['json'].dumps(self.dishes)
+        monkeypatch.setattr(settings, 'CACHE_SCHEMA_VERSION', settings.CACHE_SCHEMA_VERSION + 1)
+        assert serializers.loads(data) is None
+
+
+class TestResponseBytes:
+    @pytest.mark.asyncio
+    async def test_cached_body_returned(self, monkeypatch):
+        """Testing the rendered body is cached and returned without loading of the value."""
+        monkeypatch.setattr(settings, 'CACHE_RESPONSE_BYTES', True)
+        key: str = f'test_{uuid4()}'
+        dishes: list[schemas.ResponseDishSchema] = TestSerializers.dishes
+        calls: list[str] = []
+
+        async def loader(db) -> list[schemas.ResponseDishSchema]:
+            calls.append(key)
+            return dishes
+
+        for _ in range(2):
+            response = await services.dishes_service.get_or_render(
+                key=key, loader=loader, response_type=list[schemas.ResponseDishSchema]
+            )
+            assert response.media_type == 'application/json'
+            assert [schemas.ResponseDishSchema.model_validate(dish) for dish in json.loads(response.body)] == dishes
+
+        assert calls == [key]
+
+    @pytest.mark.asyncio
+    async def test_stale_body_refreshed(self, monkeypatch):
+        """Testing the stale body is returned once and rendered again from the refreshed value."""
+        monkeypatch.setattr(settings, 'CACHE_RESPONSE_BYTES', True)
+        key: str = f'test_{uuid4()}'
+        dishes: list[list[schemas.ResponseDishSchema]] = [TestSerializers.dishes]
+
+        async def loader(db) -> list[schemas.ResponseDishSchema]:
+            return dishes[-1]
+
+        async def get_body() -> bytes:
+            response = await services.dishes_service.get_or_render(
+                key=key,
+                loader=loader,
+                response_type=list[schemas.ResponseDishSchema],
+                policy=CachePolicy(lifetime=0, stale_lifetime=60),
+            )
+            return response.body
+
+        first: bytes = await get_body()
+        dishes.append(TestSerializers.dishes[:1])
+        assert await get_body() == first
+        for _ in range(100):
+            if not services.redis_service.refreshing:
+                break
+            await asyncio.sleep(0.01)
+
+        body: bytes = await get_body()
+        assert [schemas.ResponseDishSchema.model_validate(dish) for dish in json.loads(body)] == dishes[-1]
+
+    @pytest.mark.asyncio
+    async def test_not_modified_without_rendering(self, monkeypatch):
+        """Testing the cached ETag is compared before the value is got and rendered."""
+        monkeypatch.setattr(settings, 'CACHE_RESPONSE_BYTES', False)
+        key: str = f'test_{uuid4()}'
+        calls: list[str] = []
+
+        async def loader(db) -> list[schemas.ResponseDishSchema]:
+            calls.append(key)
+            return TestSerializers.dishes
+
+        response: Response = Response()
+        value: Any = await services.dishes_service.get_or_render(
+            key=key, loader=loader, response_type=list[schemas.ResponseDishSchema], response=response
+        )
+        assert value == TestSerializers.dishes
+        etag: str = response.headers['ETag']
+
+        await services.cache_service.delete(key)
+        monkeypatch.setattr(base, 'response_adapter', None)
+        not_modified: Response = await services.dishes_service.get_or_render(
+            key=key, loader=loader, response_type=list[schemas.ResponseDishSchema], if_none_match=etag
+        )
+
+        assert not_modified.status_code == 304
+        assert not_modified.headers['ETag'] == etag
+        assert calls == [key]
+
+    @pytest.mark.asyncio
+    async def test_invalidate_deletes_body(self):
+        """Testing invalidation of the key deletes the rendered body of its value."""
+        key: str = f'test_{uuid4()}'
+        await services.cache_service.set(services.cache_service.response_key(key), b'[]')
+
+        await services.cache_service.invalidate(key)
+
+        assert await services.cache_service.get(services.cache_service.response_key(key)) is None
+
+
+class TestCompressedResponses:
+    @staticmethod
+    async def render(key: str, calls: list[str], **kwargs: Any) -> Any:
+        async def loader(db) -> list[schemas.ResponseDishSchema]:
+            calls.append(key)
+            return TestSerializers.dishes
+
+        return await services.dishes_service.get_or_render(
+            key=key, loader=loader, response_type=list[schemas.ResponseDishSchema], **kwargs
+        )
+
+    @pytest.mark.asyncio
+    async def test_body_by_accept_encoding(self, monkeypatch):
+        """Testing bodies are compressed once and returned by Accept-Encoding with own ETags."""
+        monkeypatch.setattr(settings, 'CACHE_RESPONSE_BYTES', True)
+        monkeypatch.setattr(settings, 'CACHE_RESPONSE_ENCODINGS', ['br', 'gzip'])
+        monkeypatch.setattr(settings, 'CACHE_RESPONSE_COMPRESS_MIN_SIZE', 0)
+        key: str = f'test_{uuid4()}'
+        calls: list[str] = []
+
+        compressed = await self.render(key, calls, accept_encoding='gzip;q=0.5, deflate')
+        plain = await self.render(key, calls)
+
+        assert calls == [key]
+        assert compressed.headers['Content-Encoding'] == 'gzip'
+        assert compressed.headers['Vary'] == plain.headers['Vary'] == 'Accept-Encoding'
+        assert 'Content-Encoding' not in plain.headers
+        assert gzip.decompress(compressed.body) == plain.body
+        etag: str = plain.headers['ETag'].strip('"')
+        assert compressed.headers['ETag'] == f'"{etag}-gzip"'
+        not_modified = await self.render(
+            key, calls, accept_encoding='gzip', if_none_match=compressed.headers['ETag']
+        )
+        assert not_modified.status_code == 304
+
+    @pytest.mark.asyncio
+    async def test_identity_decompressed_if_not_kept(self, monkeypatch):
+        """Testing clients without compression get the decompressed body if only compressed ones are cached."""
+        monkeypatch.setattr(settings, 'CACHE_RESPONSE_BYTES', True)
+        monkeypatch.setattr(settings, 'CACHE_RESPONSE_ENCODINGS', ['gzip'])
+        monkeypatch.setattr(settings, 'CACHE_RESPONSE_COMPRESS_MIN_SIZE', 0)
+        monkeypatch.setattr(settings, 'CACHE_RESPONSE_KEEP_IDENTITY', False)
+        key: str = f'test_{uuid4()}'
+        calls: list[str] = []
+
+        await self.render(key, calls, accept_encoding='gzip')
+        data: bytes = await services.cache_service.get(services.cache_service.response_key(key))
+        plain = await self.render(key, calls, accept_encoding='gzip;q=0')
+
+        assert list(encodings.unpack(data)[1]) == ['gzip']
+        assert 'Content-Encoding' not in plain.headers
+        assert [schemas.ResponseDishSchema.model_validate(dish) for dish in json.loads(plain.body)] == (
+            TestSerializers.dishes
+        )
+
+    def test_choose_encoding(self):
+        """Testing the most preferred encoding acceptable by the client is chosen."""
+        assert encodings.choose_encoding('gzip, br', ['br', 'gzip']) == 'br'
+        assert encodings.choose_encoding('br;q=0, *', ['br', 'gzip']) == 'gzip'
+        assert encodings.choose_encoding('deflate', ['br', 'gzip']) == encodings.IDENTITY
+        assert encodings.choose_encoding(None, ['gzip']) == encodings.IDENTITY
+
+
+class TestAllInOneCache:
+    @pytest.mark.asyncio
+    async def test_change_rebuilds_own_fragment(self, monkeypatch):
+        """Testing a change of dish rebuilds only the fragment of its menu."""
+        menu_ids: list[UUID] = sorted(uuid4() for _ in range(3))
+        loaded: list[list[UUID] | None] = []
+
+        async def get_all_ids(db) -> list[UUID]:
+            return menu_ids
+
+        async def load_all_in_one(db, menu_ids=None) -> list[schemas.ResponseMenuWitSubmenusSchema]:
+            loaded.append(menu_ids)
+            return [
+                schemas.ResponseMenuWitSubmenusSchema(id=menu_id, title='Menu', description='Menu', submenus=[])
+                for menu_id in menu_ids
+            ]
+
+        monkeypatch.setattr(services.menus_service.repository, 'get_all_ids', get_all_ids)
+        monkeypatch.setattr(services.menus_service, 'load_all_in_one', load_all_in_one)
+        await services.cache_service.invalidate(services.menus_service.gen_tree_key(many=True))
+
+        tree = await services.menus_service.get_all_in_one(db=None)
+        assert [menu.id for menu in tree] == menu_ids
+
+        keys: list[str] = await services.dishes_service.clearing_cache_patterns(
+            constants.UPDATE, menu_id=menu_ids[1], submenu_id=uuid4(), dish_id=uuid4()
+        )
+        await services.cache_service.invalidate(*keys)
+
+        assert await services.menus_service.get_all_in_one(db=None) == tree
+        assert loaded == [menu_ids, [menu_ids[1]]]
+
+
+class TestCacheWarmUp:
+    source: str = str(Path(__file__).parents[1] / 'admin' / 'Menu.xlsx')
+
+    @pytest.mark.asyncio
+    async def test_entries_equal_to_db(self, monkeypatch, async_session_with_cache: AsyncSession):
+        """Testing entries written after sync are equal to data loaded from DB."""
+        monkeypatch.setattr(settings, 'CACHE_WARM_UP_AFTER_SYNC', True)
+        db: AsyncSession = async_session_with_cache
+        assert await XLSAdminService(source=self.source).run()
+        # loaders of cached reads without cache
+        load_menu = functools.partial(services.menus_service.get_menu.__wrapped__, services.menus_service)
+        load_submenu = functools.partial(services.submenus_service.get_submenu.__wrapped__, services.submenus_service)
+
+        tree: list[schemas.ResponseMenuWitSubmenusSchema] = await services.menus_service.load_all_in_one(db=db)
+        assert tree
+        assert await services.cache_service.get(services.menus_service.gen_tree_key(many=True)) == [
+            str(menu.id) for menu in tree
+        ]
+        for menu in tree:
+            assert await services.cache_service.get(
+                services.menus_service.gen_key(menu_id=menu.id)
+            ) == await load_menu(db=db, menu_id=menu.id)
+            for submenu in menu.submenus:
+                assert await services.cache_service.get(
+                    await services.submenus_service.gen_key(menu_id=menu.id, submenu_id=submenu.id)
+                ) == await load_submenu(db=db, menu_id=menu.id, submenu_id=submenu.id)
+                for dish in submenu.dishes:
+                    assert await services.cache_service.get(
+                        await services.dishes_service.gen_key(menu_id=menu.id, submenu_id=submenu.id, dish_id=dish.id)
+                    ) == dish
+
+        assert await services.menus_service.get_all_in_one(db=db) == tree
+
+        # other tests expect the global lists to be loaded from their DB
+        await services.cache_service.invalidate(
+            services.menus_service.gen_key(many=True),
+            services.menus_service.gen_tree_key(many=True),
+            *(services.menus_service.gen_key(menu_id=menu.id) for menu in tree),
+            *(services.menus_service.gen_tree_key(menu_id=menu.id) for menu in tree),
+            *(services.cache_service.namespace_key(constants.MENU, menu.id) for menu in tree),
+        )
+
+
+class TestReadModel:
+    source: str = str(Path(__file__).parents[1] / 'admin' / 'Menu.xlsx')
+
+    @staticmethod
+    def read_model() -> ReadModel:
+        return ReadModel(repository=repositories.menus, backend=services.redis_service, channel=str(uuid4()))
+
+    @pytest.mark.asyncio
+    async def test_reads_equal_to_db(self, monkeypatch, async_session_with_cache: AsyncSession):
+        """Testing the loaded tree gives the same data as loaders from DB."""
+        monkeypatch.setattr(settings, 'CACHE_WARM_UP_AFTER_SYNC', False)
+        db: AsyncSession = async_session_with_cache
+        assert await XLSAdminService(source=self.source).run()
+        read_model: ReadModel = self.read_model()
+        await read_model.refresh()
+
+        tree: list[schemas.ResponseMenuWitSubmenusSchema] = await services.menus_service.load_all_in_one(db=db)
+        assert tree
+        assert read_model.get_all_in_one() == tree
+        assert read_model.get(constants.MENU, many=True) == [
+            schemas.ResponseMenuSchema(**menu.model_dump()) for menu in tree
+        ]
+        for menu in tree:
+            assert read_model.get(constants.MENU, menu_id=menu.id) == await services.menus_service.get_menu.__wrapped__(
+                services.menus_service, db=db, menu_id=menu.id
+            )
+            for submenu in menu.submenus:
+                assert read_model.get(
+                    constants.SUBMENU, menu_id=menu.id, submenu_id=submenu.id
+                ) == await services.submenus_service.get_submenu.__wrapped__(
+                    services.submenus_service, db=db, menu_id=menu.id, submenu_id=submenu.id
+                )
+                assert read_model.get(
+                    constants.DISH, many=True, menu_id=menu.id, submenu_id=submenu.id
+                ) == submenu.dishes
+
+    @pytest.mark.asyncio
+    async def test_refresh_changed_menu(self, async_session_with_cache: AsyncSession):
+        """Testing refresh by menu changes only the subtree of the menu."""
+        db: AsyncSession = async_session_with_cache
+        first = await repositories.menus.create(db=db, obj_in={'title': 'First', 'description': 'First'})
+        second = await repositories.menus.create(db=db, obj_in={'title': 'Second', 'description': 'Second'})
+        submenu = await repositories.submenus.create(
+            db=db, obj_in={'title': 'Submenu', 'description': 'Submenu', 'menu_id': first.id}
+        )
+        await db.commit()
+        read_model: ReadModel = self.read_model()
+        await read_model.refresh()
+        assert read_model.get_menu(menu_id=first.id).submenus_count == 1
+
+        await repositories.dishes.create(
+            db=db, obj_in={'title': 'Dish', 'description': 'Dish', 'price': '10.50', 'submenu_id': submenu.id}
+        )
+        await repositories.menus.update(db=db, obj_id=second.id, obj_in={'title': 'Changed'})
+        await db.commit()
+        await read_model.refresh(first.id)
+
+        assert read_model.get_menu(menu_id=first.id).dishes_count == 1
+        assert read_model.get_menu(menu_id=second.id).title == 'Second'
+
+        await repositories.menus.delete_by_id(db=db, obj_id=first.id)
+        await db.commit()
+        await read_model.refresh(first.id)
+
+        with pytest.raises(HTTPException):
+            read_model.get_menu(menu_id=first.id)
+        assert read_model.get_dish_list(menu_id=first.id, submenu_id=submenu.id) == []
+        assert not read_model.submenus and not read_model.dishes
+
+    @pytest.mark.asyncio
+    async def test_reads_served_without_db(self, monkeypatch):
+        """Testing cached reads of services are served by the loaded read model."""
+        monkeypatch.setattr(settings, 'READ_MODEL_ENABLED', True)
+        monkeypatch.setattr(settings, 'HTTP_ETAG_ENABLED', False)
+        read_model: ReadModel = self.read_model()
+        menu_id: UUID = uuid4()
+        read_model.add(MenuNode(
+            id=menu_id,
+            title='Menu',
+            description='Menu',
+            submenus=(SubmenuNode(id=uuid4(), menu_id=menu_id, title='Submenu', description='Submenu', dishes=()),),
+        ))
+        read_model.loaded = True
+        monkeypatch.setattr(services, 'read_model', read_model)
+
+        menu: schemas.ResponseMenuWithCountSchema = await services.menus_service.get_menu(db=None, menu_id=menu_id)
+        assert (menu.submenus_count, menu.dishes_count) == (1, 0)
+        assert await services.menus_service.get_all_in_one(db=None) == read_model.get_all_in_one()
+        with pytest.raises(HTTPException):
+            await services.submenus_service.get_submenu(db=None, menu_id=menu_id, submenu_id=uuid4())
+
+    def test_etags_of_bodies(self, monkeypatch):
+        """Testing ETags are made from bodies, so they are equal in processes with the same tree."""
+        monkeypatch.setattr(settings, 'HTTP_ETAG_ENABLED', True)
+        menu: MenuNode = MenuNode(id=uuid4(), title='Menu', description='Menu', submenus=())
+        first, second = self.read_model(), self.read_model()
+        first.add(menu)
+        second.add(menu)
+        response_type: Any = schemas.ResponseMenuWithCountSchema
+        response: Response = Response()
+
+        first.render(constants.MENU, response_type, response=response, menu_id=menu.id)
+        etag: str = response.headers['ETag']
+        assert etag == f'"{base.make_etag(base.response_adapter(response_type).dump_json(first.get_menu(menu.id)))}"'
+        not_modified: Response = second.render(constants.MENU, response_type, if_none_match=etag, menu_id=menu.id)
+        assert not_modified.status_code == 304
+
+
+class TestChangeCapture:
+    @staticmethod
+    async def install_triggers(db: AsyncSession) -> None:
+        """Create triggers by SQL of the migration, tables of tests are created without migrations"""
+        await db.execute(text(change_capture.NOTIFY_FUNCTION))
+        for table in change_capture.TABLES:
+            await db.execute(text(change_capture.DROP_TRIGGER.format(table=table)))
+            await db.execute(text(change_capture.CREATE_TRIGGER.format(table=table)))
+        await db.commit()
+
+    @staticmethod
+    def listener() -> ChangeListener:
+        return ChangeListener(
+            dsn=settings.SQLALCHEMY_SYNC_DATABASE_URL, channel=constants.CHANGE_CAPTURE_CHANNEL, delay=0
+        )
+
+    @pytest.mark.asyncio
+    async def test_triggers_notify_changes(self, async_session_with_cache: AsyncSession):
+        """Testing changes of rows are notified with IDs of the entity and its parents."""
+        db: AsyncSession = async_session_with_cache
+        await self.install_triggers(db)
+        listener: ChangeListener = self.listener()
+        connection: asyncpg.Connection = await asyncpg.connect(listener.dsn)
+        await connection.add_listener(listener.channel, listener.receive)
+        try:
+            menu = await repositories.menus.create(db=db, obj_in={'title': 'Menu', 'description': 'Menu'})
+            submenu = await repositories.submenus.create(
+                db=db, obj_in={'title': 'Submenu', 'description': 'Submenu', 'menu_id': menu.id}
+            )
+            dish = await repositories.dishes.create(
+                db=db, obj_in={'title': 'Dish', 'description': 'Dish', 'price': '10.50', 'submenu_id': submenu.id}
+            )
+            await repositories.discount.create(db=db, obj_in={'dish_id': dish.id, 'value': 10})
+            await db.commit()
+            await repositories.menus.delete_by_id(db=db, obj_id=menu.id)
+            await db.commit()
+
+            changes: list[tuple[str, str, dict[str, UUID]] | None] = []
+            while len(changes) < 8:
+                changes.append(listener.parse(await asyncio.wait_for(listener.queue.get(), timeout=5)))
+        finally:
+            await connection.close()
+
+        ids = {'menu_id': menu.id, 'submenu_id': submenu.id, 'dish_id': dish.id}
+        assert changes[:6] == [
+            (constants.MENU, constants.CREATE, {'menu_id': menu.id}),
+            (constants.SUBMENU, constants.CREATE, {'menu_id': menu.id, 'submenu_id': submenu.id}),
+            (constants.DISH, constants.CREATE, ids),
+            (constants.DISH, constants.UPDATE, ids),
+            (constants.MENU, constants.DELETE, {'menu_id': menu.id}),
+            (constants.SUBMENU, constants.DELETE, {'menu_id': menu.id, 'submenu_id': submenu.id}),
+        ]
+        # rows deleted by cascade without parents are covered by the deleted menu
+        assert changes[6:] == [None, None]
+
+    @pytest.mark.asyncio
+    async def test_apply_coalesced_changes(self):
+        """Testing keys of all received changes are invalidated at once."""
+        menu_id: UUID = uuid4()
+        keys: list[str] = [
+            key for key in await services.menus_service.clearing_cache_patterns(constants.UPDATE, menu_id=menu_id)
+            if not services.cache_service.is_namespace_key(key)
+        ]
+        for key in keys:
+            await services.cache_service.set(key, 'value')
+        payload: str = json.dumps(
+            {'e': constants.MENU, 'o': constants.UPDATE, 'm': str(menu_id), 's': None, 'd': None, 'x': 1}
+        )
+        cascade: str = json.dumps(
+            {'e': constants.DISH, 'o': constants.DELETE, 'm': None, 's': None, 'd': str(uuid4()), 'x': 1}
+        )
+
+        listener: ChangeListener = self.listener()
+        for change in (payload, payload, cascade):
+            listener.receive(None, 0, listener.channel, change)
+        consumer: asyncio.Task = asyncio.create_task(listener.consume())
+        try:
+            for _ in range(100):
+                if listener.queue.empty():
+                    break
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.05)
+        finally:
+            consumer.cancel()
+
+        assert await services.cache_service.get_many(*keys) == [None] * len(keys)
+
+    @pytest.mark.asyncio
+    async def test_claimed_change_applied_once(self):
+        """Testing the change is applied to the shared cache only by the first process which claimed it."""
+        menu_id: UUID = uuid4()
+        key: str = services.menus_service.gen_key(menu_id=menu_id)
+        payload: str = json.dumps(
+            {'e': constants.MENU, 'o': constants.UPDATE, 'm': str(menu_id), 's': None, 'd': None, 'x': 1}
+        )
+
+        await self.listener().apply({payload})
+        await services.cache_service.set(key, 'value')
+        await self.listener().apply({payload})
+
+        assert await services.cache_service.get(key) == 'value'
+
+    @pytest.mark.asyncio
+    async def test_reset_invalidates_menus(self, async_session_with_cache: AsyncSession):
+        """Testing values of menus and their descendants are invalidated on reconnection."""
+        db: AsyncSession = async_session_with_cache
+        menu = await repositories.menus.create(db=db, obj_in={'title': 'Menu', 'description': 'Menu'})
+        await db.commit()
+        submenu_id: UUID = uuid4()
+        submenu_key: str = await services.submenus_service.gen_key(menu_id=menu.id, submenu_id=submenu_id)
+        keys: list[str] = [
+            services.menus_service.gen_key(menu_id=menu.id),
+            services.menus_service.gen_key(many=True),
+            services.menus_service.gen_tree_key(menu_id=menu.id),
+        ]
+        for key in (*keys, submenu_key):
+            await services.cache_service.set(key, 'value')
+
+        await self.listener().reset()
+
+        assert await services.cache_service.get_many(*keys) == [None] * len(keys)
+        assert await services.submenus_service.gen_key(menu_id=menu.id, submenu_id=submenu_id) != submenu_key
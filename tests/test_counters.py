@@ -0,0 +1,79 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core import constants, repositories, services
+from core.services.counters import counters_checker
+
+
+class TestCounters:
+    @staticmethod
+    async def create_menu(db: AsyncSession):
+        menu = await repositories.menus.create(db=db, obj_in={'title': 'Menu', 'description': 'Menu'})
+        submenus = [
+            await repositories.submenus.create(
+                db=db, obj_in={'title': f'Submenu {i}', 'description': 'Submenu', 'menu_id': menu.id}
+            )
+            for i in range(2)
+        ]
+        dishes = [
+            await repositories.dishes.create(
+                db=db,
+                obj_in={'title': f'Dish {i}', 'description': 'Dish', 'price': '10.50', 'submenu_id': submenus[0].id},
+            )
+            for i in range(3)
+        ]
+        await db.commit()
+        return menu, submenus, dishes
+
+    @staticmethod
+    async def get_counts(db: AsyncSession, menu, submenu) -> tuple[int, int, int]:
+        menu = await repositories.menus.get_menu_with_counts(db=db, menu_id=menu.id)
+        submenu = await repositories.submenus.get_submenu_with_dish_count(
+            db=db, submenu_id=submenu.id, menu_id=menu.id
+        )
+        return menu.submenus_count, menu.dishes_count, submenu.dishes_count
+
+    @pytest.mark.asyncio
+    async def test_counts_follow_changes(self, async_session: AsyncSession):
+        """Testing counts are kept by inserts, moves and cascade deletes."""
+        db: AsyncSession = async_session
+        menu, submenus, dishes = await self.create_menu(db)
+        assert await self.get_counts(db, menu, submenus[0]) == (2, 3, 3)
+
+        await repositories.dishes.update(db=db, obj_id=dishes[0].id, obj_in={'submenu_id': submenus[1].id})
+        assert await self.get_counts(db, menu, submenus[0]) == (2, 3, 2)
+        assert await self.get_counts(db, menu, submenus[1]) == (2, 3, 1)
+
+        await repositories.submenus.delete_by_id(db=db, obj_id=submenus[0].id)
+        assert await self.get_counts(db, menu, submenus[1]) == (1, 1, 1)
+
+        await repositories.dishes.delete_by_id(db=db, obj_id=dishes[0].id)
+        await db.commit()
+        assert await self.get_counts(db, menu, submenus[1]) == (1, 0, 0)
+        assert await counters_checker.check() == {constants.MENU: [], constants.SUBMENU: []}
+
+    @pytest.mark.asyncio
+    async def test_repair_counts(self, async_session_with_cache: AsyncSession):
+        """Testing counts which differ from actual ones are found, repaired and their cache is invalidated."""
+        db: AsyncSession = async_session_with_cache
+        menu, submenus, _ = await self.create_menu(db)
+        await db.execute(text('UPDATE menus SET dishes_count = 7'))
+        await db.execute(text('UPDATE submenus SET dishes_count = 5'))
+        await db.commit()
+        menu_key: str = services.menus_service.gen_key(menu_id=menu.id)
+        await services.cache_service.set(menu_key, 'value')
+
+        assert await counters_checker.check() == {
+            constants.MENU: [(menu.id, 2, 7, 2, 3)],
+            constants.SUBMENU: sorted(
+                [(submenus[0].id, 5, 3), (submenus[1].id, 5, 0)], key=lambda row: row[0]
+            ),
+        }
+        repaired = await counters_checker.repair()
+        assert repaired[constants.MENU] == [menu.id]
+        assert sorted(repaired[constants.SUBMENU]) == sorted(submenu.id for submenu in submenus)
+
+        assert await counters_checker.check() == {constants.MENU: [], constants.SUBMENU: []}
+        assert await self.get_counts(db, menu, submenus[0]) == (2, 3, 3)
+        assert await services.cache_service.get(menu_key) is None
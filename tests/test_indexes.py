@@ -0,0 +1,138 @@
+from typing import Any, Awaitable, Callable
+from uuid import UUID
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core import repositories
+from core.db import async_engine
+
+SEED: tuple[str, ...] = (
+    "INSERT INTO menus (id, title, description) SELECT gen_random_uuid(), 'Menu', '' FROM generate_series(1, 200)",
+    """
+    INSERT INTO submenus (id, title, description, menu_id)
+    SELECT gen_random_uuid(), 'Submenu', '', menus.id FROM menus, generate_series(1, 20)
+    """,
+    """
+    INSERT INTO dishes (id, title, description, price, submenu_id)
+    SELECT gen_random_uuid(), 'Dish', '', 10, submenus.id FROM submenus, generate_series(1, 10)
+    """,
+    'INSERT INTO dishes_discount (id, value, dish_id) SELECT gen_random_uuid(), 10, id FROM dishes',
+    """
+    INSERT INTO cache_outbox (id, key, created_at)
+    SELECT gen_random_uuid(), 'key', now() - make_interval(secs => i) FROM generate_series(1, 5000) AS i
+    """,
+    'ANALYZE',
+)
+
+TABLES: set[str] = {'menus', 'submenus', 'dishes', 'dishes_discount', 'cache_outbox'}
+
+
+class TestIndexes:
+    @staticmethod
+    def scans(plan: dict[str, Any]) -> list[tuple[str, str | None, str | None]]:
+        """Get node types, relations and indexes of scans of tables in the plan.
+
+        Bitmap index scans are children of heap scans, they have the index only.
+        """
+        scans: list[tuple[str, str | None, str | None]] = []
+        if plan.get('Relation Name') in TABLES or 'Index Name' in plan:
+            scans.append((plan['Node Type'], plan.get('Relation Name'), plan.get('Index Name')))
+        for child in plan.get('Plans', []):
+            scans.extend(TestIndexes.scans(child))
+        return scans
+
+    @staticmethod
+    async def explain(
+        db: AsyncSession, call: Callable[[], Awaitable[Any]]
+    ) -> list[list[tuple[str, str | None, str | None]]]:
+        """Make the call of repository and get scans of plans of its statements"""
+        statements: list[tuple[str, Any]] = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        event.listen(async_engine.sync_engine, 'before_cursor_execute', capture)
+        try:
+            await call()
+        finally:
+            event.remove(async_engine.sync_engine, 'before_cursor_execute', capture)
+
+        connection = await db.connection()
+        plans: list[list[tuple[str, str | None, str | None]]] = []
+        for statement, parameters in statements:
+            result = await connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {statement}', parameters)
+            plans.append(TestIndexes.scans(result.scalar()[0]['Plan']))
+        return plans
+
+    @pytest.mark.asyncio
+    async def test_repository_queries_use_indexes(self, async_session: AsyncSession):
+        """Testing queries of repositories scan indexes instead of tables on the large dataset."""
+        db: AsyncSession = async_session
+        for statement in SEED:
+            await db.execute(text(statement))
+        await db.commit()
+        menu_id, submenu_id, dish_id = (
+            await db.execute(text(
+                'SELECT submenus.menu_id, submenus.id, dishes.id '
+                'FROM dishes JOIN submenus ON submenus.id = dishes.submenu_id LIMIT 1'
+            ))
+        ).one()
+        after: UUID = UUID(int=2 ** 127)
+
+        calls: dict[str, tuple[Callable[[], Awaitable[Any]], list[set[str]]]] = {
+            'menus page': (
+                lambda: repositories.menus.get_all(db=db, after=after, limit=50), [{'menus_pkey'}]
+            ),
+            'menu with counts': (
+                lambda: repositories.menus.get_menu_with_counts(db=db, menu_id=menu_id), [{'menus_pkey'}]
+            ),
+            'tree of menu': (
+                lambda: repositories.menus.get_all_in_one(db=db, menu_ids=[menu_id]),
+                [
+                    {'menus_pkey', 'ix_submenus_menu_id_id', 'ix_dishes_submenu_id_id'},
+                    {'dishes_discount_dish_id_key'},
+                ],
+            ),
+            'submenus page': (
+                lambda: repositories.submenus.get_mul_by_fields(
+                    db=db, fields={'menu_id': menu_id}, after=after, limit=10
+                ),
+                [{'ix_submenus_menu_id_id'}],
+            ),
+            'submenu with count': (
+                lambda: repositories.submenus.get_submenu_with_dish_count(
+                    db=db, submenu_id=submenu_id, menu_id=menu_id
+                ),
+                [{'submenus_pkey', 'ix_submenus_menu_id_id'}],
+            ),
+            'submenu': (
+                lambda: repositories.submenus.get_one_by_fields(
+                    db=db, fields={'id': submenu_id, 'menu_id': menu_id}
+                ),
+                [{'submenus_pkey', 'ix_submenus_menu_id_id'}],
+            ),
+            'dishes page': (
+                lambda: repositories.dishes.get_dish_list_by_submenu_id(
+                    db=db, submenu_id=submenu_id, after=after, limit=5
+                ),
+                [{'ix_dishes_submenu_id_id'}, {'dishes_discount_dish_id_key'}],
+            ),
+            'dish': (
+                lambda: repositories.dishes.get_dish(db=db, dish_id=dish_id, submenu_id=submenu_id),
+                [{'dishes_pkey', 'ix_dishes_submenu_id_id'}, {'dishes_discount_dish_id_key'}],
+            ),
+            'outbox batch': (
+                lambda: repositories.cache_outbox.lock_batch(db, limit=100), [{'ix_cache_outbox_created_at'}]
+            ),
+        }
+        # statements of the call scan tables only by allowed indexes
+        for name, (call, indexes) in calls.items():
+            plans = await self.explain(db, call)
+            assert len(plans) == len(indexes), name
+            for scans, allowed in zip(plans, indexes):
+                assert all(node != 'Seq Scan' for node, _, _ in scans), (name, scans)
+                used: set[str] = {index for _, _, index in scans if index is not None}
+                assert used and used <= allowed, (name, scans)
+            await db.rollback()
@@ -1,8 +1,10 @@
 import pytest
 from httpx import AsyncClient, Response
-from sqlalchemy import select
+from sqlalchemy import event, select
 
 from core import models
+from core.db import async_engine
+from core.settings import settings
 from tests.base import BaseTestCase
 from tests.utils import CRUDDataBase, reverse, uuid_or_none
 
@@ -44,6 +46,68 @@ class TestMenus(BaseTestCase):
         assert len(resp_json) == menu_count > 0
         await self.assert_equal_response_list_db_objects(resp_json, async_crud_with_data)
 
+    @pytest.mark.parametrize('etag_enabled', (True, False), ids=('ETag', 'Without ETag'))
+    @pytest.mark.asyncio
+    async def test_get_list_menus_by_pages(
+        self, etag_enabled: bool, monkeypatch, async_client: AsyncClient, async_crud_with_data: CRUDDataBase
+    ):
+        """Testing pages of menus follow each other by cursors and cover the whole list ordered by IDs."""
+        monkeypatch.setattr(settings, 'HTTP_ETAG_ENABLED', etag_enabled)
+        url: str = reverse('get_menu_list')
+        menus: list[dict[str, str]] = (await async_client.get(url=url)).json()
+        assert [menu['id'] for menu in menus] == sorted(menu['id'] for menu in menus)
+
+        pages: list[list[dict[str, str]]] = []
+        params: dict[str, str | int] = {'limit': 2}
+        while True:
+            response: Response = await async_client.get(url=url, params=params)
+            assert response.status_code == 200
+            pages.append(response.json())
+            if 'x-next-cursor' not in response.headers:
+                break
+            params = {'limit': 2, 'cursor': response.headers['x-next-cursor']}
+
+        assert all(len(page) == 2 for page in pages[:-1])
+        assert [menu for page in pages for menu in page] == menus
+
+    @pytest.mark.parametrize(
+        'params',
+        (
+            pytest.param({'cursor': 'not a cursor'}, id='Invalid cursor'),
+            pytest.param({'limit': 0}, id='Zero limit'),
+            pytest.param({'limit': settings.API_PAGE_SIZE_MAX + 1}, id='Limit over maximum'),
+        ),
+    )
+    @pytest.mark.asyncio
+    async def test_get_list_menus_invalid_page(
+        self, params: dict[str, str | int], async_client: AsyncClient, async_crud: CRUDDataBase
+    ):
+        """Testing invalid pages of menus are rejected."""
+        response: Response = await async_client.get(url=reverse('get_menu_list'), params=params)
+        assert response.status_code == 422
+
+    @pytest.mark.parametrize('response_bytes', (False, True), ids=('Rendered', 'Cached body'))
+    @pytest.mark.asyncio
+    async def test_get_list_menus_not_modified(
+        self, response_bytes: bool, monkeypatch, async_client: AsyncClient, async_crud_with_data: CRUDDataBase
+    ):
+        """Testing 304 Not Modified for the list of menus with the same ETag."""
+        monkeypatch.setattr(settings, 'CACHE_RESPONSE_BYTES', response_bytes)
+        url: str = reverse('get_menu_list')
+        response: Response = await async_client.get(url=url)
+        assert response.status_code == 200
+        assert response.headers['cache-control'] == settings.HTTP_CACHE_CONTROL
+        etag: str = response.headers['etag']
+
+        not_modified: Response = await async_client.get(url=url, headers={'If-None-Match': etag})
+        assert not_modified.status_code == 304
+        assert not_modified.headers['etag'] == etag
+        assert not_modified.content == b''
+
+        modified: Response = await async_client.get(url=url, headers={'If-None-Match': '"other"'})
+        assert modified.status_code == 200
+        assert modified.json() == response.json()
+
     @pytest.mark.parametrize(
         'created_data,expected_status_code',
         (
@@ -324,3 +388,40 @@ class TestMenus(BaseTestCase):
 
         after_dishes_count = await async_crud_with_data.get_count_exist_ids(models.DishDBModel, dishes_ids)
         assert after_dishes_count == 0
+
+    @pytest.mark.parametrize(
+        'method,url_name,payload,expected_statement',
+        (
+            pytest.param('PATCH', 'update_menu', {'title': 'Menu update'}, 'UPDATE menus', id='Update'),
+            pytest.param('DELETE', 'delete_menu', None, 'DELETE FROM menus', id='Delete'),
+        ),
+    )
+    @pytest.mark.asyncio
+    async def test_write_menu_by_single_statement(
+        self,
+        method: str,
+        url_name: str,
+        payload: dict[str, str] | None,
+        expected_statement: str,
+        async_client: AsyncClient,
+        async_crud_with_data: CRUDDataBase,
+    ):
+        """Testing menu is written by a single statement without selecting it before."""
+        statements: list[str] = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        url: str = reverse(url_name, args=['9ea7362e-bab3-4bfc-bab7-71cf9e06f58b'])
+        event.listen(async_engine.sync_engine, 'before_cursor_execute', capture)
+        try:
+            kwargs: dict = {} if payload is None else {'json': payload}
+            response: Response = await async_client.request(method, url=url, **kwargs)
+        finally:
+            event.remove(async_engine.sync_engine, 'before_cursor_execute', capture)
+        assert response.status_code == 200
+
+        # keys of the outbox are recorded in the same transaction
+        statements = [statement for statement in statements if 'cache_outbox' not in statement]
+        assert statements[0].startswith(expected_statement)
+        assert 'RETURNING' in statements[0]
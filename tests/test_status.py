@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient, Response
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+
+from core import db
+from core.settings import settings
+from tests.utils import reverse
+
+
+class TestDBPool:
+    @pytest.mark.asyncio
+    async def test_checked_out_connection(self, async_client: AsyncClient):
+        """Testing statistics of the pool show the connection held by a session."""
+        async with db.session_generator() as session:
+            await session.execute(text('SELECT 1'))
+            response: Response = await async_client.get(url=reverse('get_db_pool_stats'))
+        assert response.status_code == 200
+        stats: dict[str, int] = response.json()
+        assert stats['checked_out'] == 1
+        assert stats['size'] == settings.DB_POOL_SIZE
+        assert stats['max_overflow'] == settings.DB_POOL_MAX_OVERFLOW
+        assert db.get_pool_stats()['checked_out'] == 0
+        await db.async_engine.dispose()
+
+    @pytest.mark.asyncio
+    async def test_waiting_and_timeouts(self):
+        """Testing requests waiting for a connection of the exhausted pool are counted until they time out."""
+        engine: AsyncEngine = create_async_engine(
+            settings.SQLALCHEMY_DATABASE_URL, poolclass=db.MonitoredQueuePool, pool_size=1, max_overflow=0,
+            pool_timeout=0.2,
+        )
+        pool: db.MonitoredQueuePool = engine.pool  # type: ignore[assignment]
+
+        async def query() -> None:
+            async with AsyncSession(engine) as session:
+                await session.execute(text('SELECT 1'))
+
+        async with engine.connect() as connection:
+            await connection.execute(text('SELECT 1'))
+            waiting: asyncio.Task = asyncio.create_task(query())
+            await asyncio.sleep(0.05)
+            assert pool.waiting == 1
+            with pytest.raises(PoolTimeoutError):
+                await waiting
+        assert pool.waiting == 0
+        assert pool.timeouts == 1
+        await query()
+        await engine.dispose()
@@ -5,6 +5,7 @@ from httpx import AsyncClient, Response
 from sqlalchemy import select
 
 from core import models
+from core.settings import settings
 from tests.base import BaseTestCase
 from tests.utils import CRUDDataBase, reverse, uuid_or_none
 
@@ -70,6 +71,48 @@ class TestSubmenus(BaseTestCase):
         for resp_obj in resp_json:
             self.assert_resp_and_db_obj(resp_obj, db_objs_dict[resp_obj['id']])
 
+    @pytest.mark.parametrize('response_bytes', (False, True), ids=('Rendered', 'Cached body'))
+    @pytest.mark.parametrize(
+        'name,args',
+        (
+            pytest.param('get_submenu_list', ['9ea7362e-bab3-4bfc-bab7-71cf9e06f58b'], id='List'),
+            pytest.param(
+                'get_submenu',
+                [
+                    '9ea7362e-bab3-4bfc-bab7-71cf9e06f58b',
+                    'c0861bf3-311d-4db7-8677-d7ee5052adc9',
+                ],
+                id='Detail',
+            ),
+        ),
+    )
+    @pytest.mark.asyncio
+    async def test_get_submenus_not_modified(
+        self,
+        name: str,
+        args: list[str],
+        response_bytes: bool,
+        monkeypatch,
+        async_client: AsyncClient,
+        async_crud_with_data: CRUDDataBase,
+    ):
+        """Testing 304 Not Modified for the list and the detail of submenus with the same ETag."""
+        monkeypatch.setattr(settings, 'CACHE_RESPONSE_BYTES', response_bytes)
+        url: str = reverse(name, args=args)
+        response: Response = await async_client.get(url=url)
+        assert response.status_code == 200
+        etag: str = response.headers['etag']
+
+        not_modified: Response = await async_client.get(url=url, headers={'If-None-Match': etag})
+        assert not_modified.status_code == 304
+        assert not_modified.headers['etag'] == etag
+        assert not_modified.content == b''
+
+        modified: Response = await async_client.get(url=url, headers={'If-None-Match': '"other"'})
+        assert modified.status_code == 200
+        assert modified.headers['etag'] == etag
+        assert modified.json() == response.json()
+
     @pytest.mark.parametrize(
         'menu_id,created_data,expected_status_code,expected_response',
         (
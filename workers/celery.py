@@ -3,7 +3,9 @@ from functools import wraps
 
 from celery import Celery
 
+from core import services
 from core.services.admin_xls import XLSAdminService
+from core.services.counters import counters_checker
 from core.settings import settings
 
 broker_url = (
@@ -26,6 +28,12 @@ celery.conf.beat_schedule = {
     },
 }
 
+if settings.CACHE_OUTBOX_ENABLED:
+    celery.conf.beat_schedule['dispatch_cache_outbox'] = {
+        'task': 'dispatch_cache_outbox',
+        'schedule': settings.CACHE_OUTBOX_DISPATCH_PERIODIC,
+    }
+
 
 def async_as_sync(async_func):
     @wraps(async_func)
@@ -47,3 +55,16 @@ def ping_task() -> str:
 async def update_menu_from_file(source):
     xls_service = XLSAdminService(source=source)
     return await xls_service.run()
+
+
+@celery.task(name='dispatch_cache_outbox')
+@async_as_sync
+async def dispatch_cache_outbox() -> int:
+    return await services.outbox_dispatcher.dispatch()
+
+
+@celery.task(name='repair_counters')
+@async_as_sync
+async def repair_counters() -> dict[str, list[str]]:
+    repaired = await counters_checker.repair()
+    return {entity: [str(obj_id) for obj_id in obj_ids] for entity, obj_ids in repaired.items()}